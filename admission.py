@@ -0,0 +1,229 @@
+"""
+Admission control and per-user rate limiting for chat requests.
+
+Protects the Databricks endpoint quota and the worker from overload:
+- A global concurrency budget caps how many requests run at once
+- A per-user/per-thread token bucket limits how often one client can ask
+- Requests over budget wait in a bounded FIFO queue; requests whose
+  deadline passes while queued, or that find the queue full, are shed
+  immediately so the user gets a fast "busy" reply instead of a timeout
+"""
+
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from utils import setup_logger
+
+logger = setup_logger("admission")
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "5"))
+# Upper bound on tracked buckets; least recently used keys are forgotten
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted.
+
+    Attributes:
+        reason (str): One of "rate_limited", "queue_full" or "deadline"
+        retry_after (float): Suggested seconds to wait before retrying
+    """
+
+    def __init__(self, reason: str, retry_after: float = 0.0) -> None:
+        super().__init__(f"Request rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a fixed rate.
+
+    Attributes:
+        rate (float): Tokens added per second
+        capacity (float): Maximum tokens (burst size)
+        tokens (float): Tokens currently available
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        """Take one token if available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_token(self) -> float:
+        """Return the seconds until the next token is available."""
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Global concurrency budget with a bounded wait queue and per-key rate limits.
+
+    Attributes:
+        max_concurrency (int): Requests allowed to run at once
+        max_queue (int): Requests allowed to wait for a slot
+        queue_timeout (float): Maximum seconds a request may wait in the queue
+        active (int): Requests currently running
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        rate_per_minute: float = RATE_LIMIT_PER_MINUTE,
+        burst: float = RATE_LIMIT_BURST,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.active = 0
+        self._waiters: Deque["asyncio.Future"] = deque()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.counters: Dict[str, int] = {
+            "admitted": 0,
+            "queued": 0,
+            "rate_limited": 0,
+            "queue_full": 0,
+            "deadline": 0,
+        }
+
+    def queued(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _reject(self, reason: str, key: Optional[str], retry_after: float = 0.0) -> AdmissionRejected:
+        self.counters[reason] += 1
+        logger.warning("Admission rejected (%s) for key=%s", reason, key)
+        return AdmissionRejected(reason, retry_after)
+
+    async def acquire(self, key: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        """
+        Acquire an execution slot.
+
+        Args:
+            key (Optional[str]): Rate-limit key (user or thread id); None skips rate limiting
+            timeout (Optional[float]): Queue deadline in seconds. Defaults to queue_timeout
+
+        Raises:
+            AdmissionRejected: If rate limited, the queue is full, or the deadline passes
+        """
+        if key is not None and self.rate > 0:
+            bucket = self._bucket(key)
+            if not bucket.try_take():
+                raise self._reject("rate_limited", key, bucket.seconds_until_token())
+
+        if self.active < self.max_concurrency and not self.queued():
+            self.active += 1
+            self.counters["admitted"] += 1
+            return
+
+        if self.queued() >= self.max_queue:
+            raise self._reject("queue_full", key, self.queue_timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter),
+                timeout=self.queue_timeout if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the deadline passed
+                self.counters["admitted"] += 1
+                return
+            waiter.cancel()
+            raise self._reject("deadline", key, self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            waiter.cancel()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        self.counters["admitted"] += 1
+
+    def release(self) -> None:
+        """Release a slot, handing it to the oldest waiter still within its deadline."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes directly to the waiter; active stays unchanged
+                waiter.set_result(None)
+                return
+        self.active = max(0, self.active - 1)
+
+    @asynccontextmanager
+    async def admit(self, key: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Context manager holding an execution slot for the duration of a request.
+
+        Args:
+            key (Optional[str]): Rate-limit key (user or thread id)
+
+        Raises:
+            AdmissionRejected: If the request is not admitted
+        """
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return admission counters and current load."""
+        return {
+            **self.counters,
+            "active": self.active,
+            "waiting": self.queued(),
+            "tracked_keys": len(self._buckets),
+        }
+
+
+admission_controller = AdmissionController()
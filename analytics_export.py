@@ -0,0 +1,430 @@
+"""
+Incremental analytics export from the Cosmos DB change feed.
+
+Reporting queries against the conversations and threads containers
+compete with live chat traffic for request units. This exporter instead
+follows each container's change feed, flattens the changed documents into
+tables and appends them to columnar files partitioned by date:
+
+    <ANALYTICS_EXPORT_DIR>/<table>/date=YYYY-MM-DD/part-<batch>.parquet
+
+Tables:
+- messages: one row per conversation turn (from the conversations container)
+- threads: one row per Chainlit thread
+- thread_feedback: one row per feedback entry stored on a thread
+
+The change feed reports the latest version of a changed document, so a
+conversation that gains a turn or a feedback vote is exported again. Each
+row carries the document's _ts; readers keep the row with the highest
+_ts per key (messages: message_id, threads: thread_id,
+thread_feedback: thread_id + message_id).
+
+Progress is checkpointed per container after every batch. Files are named
+after the continuation they were read from, so a batch re-read after a
+crash overwrites its own file instead of duplicating it.
+
+Parquet files need the optional requirements-analytics.txt (pyarrow);
+without it, gzipped JSON Lines files are written instead.
+
+    python analytics_export.py              # export everything new once
+    python analytics_export.py --follow     # keep exporting every ANALYTICS_EXPORT_INTERVAL_SECONDS
+
+Configuration:
+    ANALYTICS_EXPORT_DIR: Output directory (default "analytics")
+    ANALYTICS_CHECKPOINT_PATH: Checkpoint file (default "<dir>/_checkpoint.json")
+    ANALYTICS_EXPORT_BATCH_SIZE: Documents per change feed page (default 500)
+    ANALYTICS_EXPORT_PRIORITY: Cosmos DB priority of the reads, "Low" (default) or "High";
+        "" to not send one. Low priority needs priority-based execution on the account
+    ANALYTICS_EXPORT_INTERVAL_SECONDS: Pause between passes with --follow (default 300)
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import argparse
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from utils import setup_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+load_dotenv()
+
+logger = setup_logger("analytics_export")
+
+ANALYTICS_EXPORT_DIR = os.getenv("ANALYTICS_EXPORT_DIR", "analytics")
+ANALYTICS_CHECKPOINT_PATH = os.getenv(
+    "ANALYTICS_CHECKPOINT_PATH", os.path.join(ANALYTICS_EXPORT_DIR, "_checkpoint.json")
+)
+ANALYTICS_EXPORT_BATCH_SIZE = int(os.getenv("ANALYTICS_EXPORT_BATCH_SIZE", "500"))
+ANALYTICS_EXPORT_PRIORITY = os.getenv("ANALYTICS_EXPORT_PRIORITY", "Low")
+ANALYTICS_EXPORT_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_EXPORT_INTERVAL_SECONDS", "300"))
+
+# Column names and Arrow types per table
+SCHEMAS: Dict[str, List[Tuple[str, str]]] = {
+    "messages": [
+        ("chat_id", "string"),
+        ("message_id", "string"),
+        ("timestamp", "string"),
+        ("databricks_request_id", "string"),
+        ("user_message", "string"),
+        ("rephrased_message", "string"),
+        ("check_query", "string"),
+        ("ai_answer", "string"),
+        ("context", "string"),
+        # Set instead of context for turns saved by reference (context_store.py)
+        ("context_ref", "string"),
+        ("feedback_vote", "int64"),
+        ("feedback_text", "string"),
+        ("language", "string"),
+        ("_ts", "int64"),
+    ],
+    "threads": [
+        ("thread_id", "string"),
+        ("name", "string"),
+        ("user_id", "string"),
+        ("user_identifier", "string"),
+        ("created_at", "string"),
+        ("tags", "string"),
+        ("feedback_count", "int64"),
+        ("_ts", "int64"),
+    ],
+    "thread_feedback": [
+        ("thread_id", "string"),
+        ("message_id", "string"),
+        ("timestamp", "string"),
+        ("value", "int64"),
+        ("comment", "string"),
+        ("user_message", "string"),
+        ("_ts", "int64"),
+    ],
+}
+
+Rows = Dict[str, List[Dict[str, Any]]]
+
+
+def _date_of(timestamp: Optional[str], ts: Optional[int]) -> str:
+    """Return the YYYY-MM-DD partition of an ISO timestamp, falling back to the document _ts."""
+    if timestamp:
+        return timestamp[:10]
+    if ts:
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+    return "unknown"
+
+
+def flatten_conversation(document: Dict[str, Any]) -> Rows:
+    """
+    Flatten a conversation document into messages rows.
+
+    Args:
+        document (Dict[str, Any]): Conversation document from the change feed
+
+    Returns:
+        Rows: Rows per table
+    """
+    rows: Rows = defaultdict(list)
+    ts = document.get("_ts")
+    for message in document.get("conversation", []):
+        translation = message.get("translation") or {}
+        rows["messages"].append({
+            "chat_id": document.get("id"),
+            "message_id": message.get("message_id"),
+            "timestamp": message.get("timestamp"),
+            "databricks_request_id": message.get("databricks_request_id"),
+            "user_message": message.get("user_message"),
+            "rephrased_message": message.get("rephrased_message"),
+            "check_query": message.get("check_query"),
+            "ai_answer": message.get("ai_answer"),
+            "context": message.get("context"),
+            "context_ref": message.get("context_ref"),
+            "feedback_vote": int(message.get("feedback_vote") or 0),
+            "feedback_text": message.get("feedback_text"),
+            "language": translation.get("language"),
+            "_ts": ts,
+        })
+    return rows
+
+
+def flatten_thread(document: Dict[str, Any]) -> Rows:
+    """
+    Flatten a thread document into threads and thread_feedback rows.
+
+    Args:
+        document (Dict[str, Any]): Thread document from the change feed
+
+    Returns:
+        Rows: Rows per table
+    """
+    rows: Rows = defaultdict(list)
+    ts = document.get("_ts")
+    feedback = document.get("feedback") or []
+    rows["threads"].append({
+        "thread_id": document.get("id"),
+        "name": document.get("name"),
+        "user_id": document.get("userId"),
+        "user_identifier": document.get("userIdentifier"),
+        "created_at": document.get("createdAt"),
+        "tags": json.dumps(document.get("tags") or []),
+        "feedback_count": len(feedback),
+        "_ts": ts,
+    })
+    for entry in feedback:
+        rows["thread_feedback"].append({
+            "thread_id": document.get("id"),
+            "message_id": entry.get("message_id"),
+            "timestamp": entry.get("timestamp"),
+            "value": entry.get("value"),
+            "comment": entry.get("comment"),
+            "user_message": entry.get("user_message"),
+            "_ts": ts,
+        })
+    return rows
+
+
+# Timestamp column used to partition each table by date
+_DATE_COLUMNS = {"messages": "timestamp", "threads": "created_at", "thread_feedback": "timestamp"}
+
+
+class PartitionedWriter:
+    """
+    Writes table rows to date-partitioned Parquet files (JSON Lines without pyarrow).
+
+    Attributes:
+        root (str): Output directory
+        format (str): "parquet" or "jsonl.gz"
+    """
+
+    def __init__(self, root: str = ANALYTICS_EXPORT_DIR, use_parquet: Optional[bool] = None) -> None:
+        self.root = root
+        if use_parquet is None:
+            use_parquet = pa is not None
+        if use_parquet and pa is None:
+            raise ImportError("pyarrow is required for Parquet output (requirements-analytics.txt)")
+        self.format = "parquet" if use_parquet else "jsonl.gz"
+
+    def write(self, table: str, rows: List[Dict[str, Any]], batch_id: str) -> List[str]:
+        """
+        Write rows of a table, one file per date partition.
+
+        Args:
+            table (str): Table name in SCHEMAS
+            rows (List[Dict[str, Any]]): Rows to write
+            batch_id (str): Batch identifier used in the file names
+
+        Returns:
+            List[str]: Written file paths
+        """
+        by_date: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_date[_date_of(row.get(_DATE_COLUMNS[table]), row.get("_ts"))].append(row)
+
+        paths = []
+        for date, date_rows in sorted(by_date.items()):
+            directory = os.path.join(self.root, table, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{batch_id}.{self.format}")
+            tmp_path = f"{path}.tmp"
+            if self.format == "parquet":
+                schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in SCHEMAS[table]])
+                pq.write_table(
+                    pa.Table.from_pylist(date_rows, schema=schema), tmp_path, compression="zstd"
+                )
+            else:
+                with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                    for row in date_rows:
+                        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, path)
+            paths.append(path)
+        return paths
+
+
+class Checkpoint:
+    """
+    Change feed continuation per source, persisted as JSON.
+
+    Attributes:
+        path (str): Checkpoint file
+    """
+
+    def __init__(self, path: str = ANALYTICS_CHECKPOINT_PATH) -> None:
+        self.path = path
+        self._state: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._state = json.load(f)
+
+    def get(self, source: str) -> Optional[str]:
+        """Return the continuation of a source, or None to start from the beginning."""
+        return self._state.get(source, {}).get("continuation")
+
+    def set(self, source: str, continuation: Optional[str], exported: int) -> None:
+        """Record a source's continuation and save the checkpoint atomically."""
+        entry = self._state.setdefault(source, {"documents": 0})
+        entry["continuation"] = continuation
+        entry["documents"] += exported
+        entry["updated_at"] = datetime.now(timezone.utc).isoformat()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def read_changes(
+    container: Any,
+    continuation: Optional[str],
+    batch_size: int = ANALYTICS_EXPORT_BATCH_SIZE,
+    priority: Optional[str] = ANALYTICS_EXPORT_PRIORITY,
+) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+    """
+    Read a container's change feed page by page.
+
+    Args:
+        container: Cosmos DB container (or a stand-in with the same change feed API)
+        continuation (Optional[str]): Where to resume, or None for the beginning
+        batch_size (int): Documents per page
+        priority (Optional[str]): Cosmos DB priority level, or None
+
+    Yields:
+        Tuple[List[Dict[str, Any]], Optional[str]]: A page of documents and the
+        continuation after it
+    """
+    while True:
+        kwargs: Dict[str, Any] = {"max_item_count": batch_size}
+        if priority:
+            kwargs["priority"] = priority
+        if continuation is None:
+            kwargs["start_time"] = "Beginning"
+        else:
+            kwargs["continuation"] = continuation
+        feed = container.query_items_change_feed(**kwargs)
+
+        read_any = False
+        pages = feed.by_page()
+        for page in pages:
+            documents = list(page)
+            # Continuation after this page, from this feed's own iterator rather than
+            # the client-wide response headers, which concurrent requests overwrite
+            continuation = pages.continuation_token
+            if documents:
+                read_any = True
+                yield documents, continuation
+        if not read_any:
+            return
+
+
+def export_container(
+    name: str,
+    container: Any,
+    flatten: Callable[[Dict[str, Any]], Rows],
+    writer: PartitionedWriter,
+    checkpoint: Checkpoint,
+    batch_size: int = ANALYTICS_EXPORT_BATCH_SIZE,
+) -> Dict[str, int]:
+    """
+    Export a container's changes since its checkpoint.
+
+    Args:
+        name (str): Source name in the checkpoint
+        container: Cosmos DB container
+        flatten (Callable[[Dict[str, Any]], Rows]): Document to rows
+        writer (PartitionedWriter): Output writer
+        checkpoint (Checkpoint): Progress store
+        batch_size (int): Documents per page
+
+    Returns:
+        Dict[str, int]: Documents read and rows written per table
+    """
+    counts: Dict[str, int] = defaultdict(int)
+    start_from = checkpoint.get(name)
+    for documents, continuation in read_changes(container, start_from, batch_size):
+        rows: Rows = defaultdict(list)
+        for document in documents:
+            for table, table_rows in flatten(document).items():
+                rows[table].extend(table_rows)
+        # Named after the page's starting point: a replayed page overwrites its files
+        batch_id = hashlib.sha1(f"{name}:{start_from}".encode("utf-8")).hexdigest()[:16]
+        for table, table_rows in rows.items():
+            writer.write(table, table_rows, batch_id)
+            counts[table] += len(table_rows)
+        counts["documents"] += len(documents)
+        checkpoint.set(name, continuation, len(documents))
+        start_from = continuation
+    return dict(counts)
+
+
+def export_once(
+    sources: Dict[str, Tuple[Any, Callable[[Dict[str, Any]], Rows]]],
+    writer: Optional[PartitionedWriter] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Export every source's changes since the last run.
+
+    Args:
+        sources (Dict[str, Tuple[Any, Callable]]): Container and flatten function per source name
+        writer (Optional[PartitionedWriter]): Output writer. Defaults to ANALYTICS_EXPORT_DIR
+        checkpoint (Optional[Checkpoint]): Progress store. Defaults to ANALYTICS_CHECKPOINT_PATH
+
+    Returns:
+        Dict[str, Dict[str, int]]: Counts per source
+    """
+    writer = writer or PartitionedWriter()
+    checkpoint = checkpoint or Checkpoint()
+    results = {}
+    for name, (container, flatten) in sources.items():
+        start = time.perf_counter()
+        results[name] = export_container(name, container, flatten, writer, checkpoint)
+        logger.info(
+            "Exported %s in %.1f ms: %s", name, (time.perf_counter() - start) * 1000, results[name]
+        )
+    return results
+
+
+def cosmos_sources() -> Dict[str, Tuple[Any, Callable[[Dict[str, Any]], Rows]]]:
+    """
+    Connect to the conversations and threads containers configured by environment variables.
+
+    Returns:
+        Dict[str, Tuple[Any, Callable]]: Sources for export_once
+    """
+    from cosmos_db import AzureCosmosClass
+    from data_layer import CosmosThreadStore
+
+    return {
+        "conversations": (AzureCosmosClass().container_object, flatten_conversation),
+        "threads": (CosmosThreadStore.from_env().threads_container, flatten_thread),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export conversations and threads for analytics.")
+    parser.add_argument("--follow", action="store_true", help="Keep exporting new changes")
+    parser.add_argument(
+        "--jsonl", action="store_true", help="Write JSON Lines even if pyarrow is installed"
+    )
+    args = parser.parse_args()
+
+    sources = cosmos_sources()
+    writer = PartitionedWriter(use_parquet=False if args.jsonl else None)
+    checkpoint = Checkpoint()
+    while True:
+        print(json.dumps(export_once(sources, writer, checkpoint)))
+        if not args.follow:
+            break
+        time.sleep(ANALYTICS_EXPORT_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
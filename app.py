@@ -14,24 +14,55 @@ supports both text and voice inputs for user interaction.
 import os
 import json
 import io
+import time
+import asyncio
+import importlib
 import uuid
-import wave
 import logging
 from typing import Optional, Dict, Any
 
-import numpy as np
 import httpx
 import chainlit as cl
 import chainlit.data as cl_data
 from chainlit.types import ThreadDict
 from chainlit.input_widget import Select
+from chainlit.server import app as chainlit_server
 from dotenv import load_dotenv
 
-from speech_recognition import recognize_from_file
 from utils import delete_audio_file, setup_logger
-from data_layer import CustomDataLayer
-from cosmos_db import AzureCosmosClass
-from databricks_utils import call_databricks_endpoint
+from startup import LAZY_STARTUP, LazyDataLayer, lazy_import, warm_up
+from localization import (
+    localize_turn,
+    seed_from_conversation,
+    start_query_localization,
+    translation_cache,
+)
+from singleflight import coalesce, endpoint_flights, normalize_text
+from resilience import endpoint_guard, fallback_answers, static_fallback_response
+from admission import AdmissionRejected, admission_controller
+from tracing import start_span
+from loop_monitor import start_loop_monitor
+from session_state import get_session_state
+from audio_pool import AudioPoolBusy, audio_pool, encode_wav
+from faq_index import FAQ_LOCAL_FOLLOW_UPS, get_faq_index, local_response
+from cache_warmup import CACHE_WARMUP_ENABLED, warm_caches
+from feedback_view import feedback_view, seed as seed_feedback_view
+from lifecycle import lifecycle
+from metrics import (
+    ACTIVE_SESSIONS,
+    AUDIO_BYTES_TOTAL,
+    ENDPOINT_LATENCY,
+    ERRORS_TOTAL,
+    MESSAGES_TOTAL,
+    TURN_LATENCY,
+    mount_metrics_route,
+    register_cache,
+    registry,
+)
+
+# Heavy modules are imported on first use to keep cold start fast
+speech_recognition = lazy_import("speech_recognition")
+databricks_utils = lazy_import("databricks_utils")
 
 # Configure logging
 logger = setup_logger("app")
@@ -56,20 +87,254 @@ if missing_vars:
 CHATBOT_NAME = os.getenv("CHATBOT_NAME")
 WELCOME_MESSAGE = os.getenv("WELCOME_MESSAGE")
 LANGUAGE = os.getenv("LANGUAGE")
+BUSY_MESSAGE = os.getenv(
+    "BUSY_MESSAGE",
+    "I'm handling a lot of questions right now. Please try again in a few seconds."
+)
+
+# Register shared resources; the data layer owns the storage clients
+warm_up.register(
+    "data_layer",
+    lambda: importlib.import_module("data_layer").CustomDataLayer()
+)
+warm_up.register(
+    "conversations",
+    lambda: warm_up.get("data_layer").conversations
+)
+# Count historical votes, so disliked answers are recognised after a restart
+warm_up.register(
+    "feedback_view",
+    lambda: seed_feedback_view(warm_up.get("conversations"))
+)
+if CACHE_WARMUP_ENABLED:
+    # Preload answer caches from the snapshot or from past positively rated answers
+    warm_up.register(
+        "cache_warmup",
+        lambda: warm_caches(warm_up.get("conversations"))
+    )
 
 # Initialize custom data layer
-cl_data._data_layer = CustomDataLayer()
+if LAZY_STARTUP:
+    # Provision Cosmos DB in the background; a Cosmos outage delays
+    # readiness instead of crashing startup
+    cl_data._data_layer = LazyDataLayer(
+        warm_up,
+        "data_layer",
+        lambda: importlib.import_module("data_layer").CustomDataLayer
+    )
+    warm_up.start()
+else:
+    warm_up.run_now()
+    cl_data._data_layer = warm_up.get("data_layer")
+
+
+def register_component_metrics() -> None:
+    """Expose cache, breaker, admission, audio pool and warm-up state on /metrics."""
+    register_cache(
+        "translation", lambda: (translation_cache.hits, translation_cache.misses)
+    )
+    # Local FAQ answers; a "miss" is a question sent on to the endpoint
+    register_cache(
+        "faq_index",
+        lambda: (get_faq_index().hits, get_faq_index().misses) if get_faq_index() else (0, 0)
+    )
+    register_cache(
+        "fallback_answers", lambda: (fallback_answers.hits, fallback_answers.misses)
+    )
+    # A "hit" is a request served by another request's in-flight endpoint call
+    register_cache(
+        "single_flight", lambda: (endpoint_flights.shared_calls, endpoint_flights.leader_calls)
+    )
+    registry.callback(
+        "audio_pool_in_flight",
+        "Audio jobs queued or running in the audio pool",
+        lambda: {(): float(audio_pool.in_flight)}
+    )
+    registry.callback(
+        "circuit_breaker_state",
+        "1 for the current state of each circuit breaker",
+        lambda: {
+            (endpoint_guard.name, state): float(endpoint_guard.breaker.state == state)
+            for state in ("closed", "open", "half_open")
+        },
+        ["endpoint", "state"]
+    )
+    registry.callback(
+        "circuit_breaker_opened_total",
+        "Times the circuit breaker opened",
+        lambda: {(endpoint_guard.name,): endpoint_guard.breaker.open_count},
+        ["endpoint"],
+        type_name="counter"
+    )
+    registry.callback(
+        "endpoint_hedged_requests_total",
+        "Hedged endpoint requests sent and won",
+        lambda: {
+            ("sent",): endpoint_guard.counters["hedges_sent"],
+            ("won",): endpoint_guard.counters["hedges_won"],
+        },
+        ["result"],
+        type_name="counter"
+    )
+    registry.callback(
+        "admission_decisions_total",
+        "Admission controller decisions",
+        lambda: {(key,): value for key, value in admission_controller.counters.items()},
+        ["outcome"],
+        type_name="counter"
+    )
+    registry.callback(
+        "admission_requests",
+        "Requests running or waiting for an execution slot",
+        lambda: {
+            ("active",): admission_controller.active,
+            ("waiting",): admission_controller.queued(),
+        },
+        ["state"]
+    )
+    registry.callback(
+        "warmup_ready",
+        "1 once startup provisioning has completed",
+        lambda: {(): float(warm_up.is_ready())}
+    )
+
+
+register_component_metrics()
+mount_metrics_route(chainlit_server)
+
+
+async def get_conversations_client():
+    """Return the shared conversations client, waiting for provisioning if needed."""
+    return await asyncio.to_thread(warm_up.get, "conversations")
+
+
+def get_session_id() -> str:
+    """Return the Chainlit session id, the key of this session's shared state."""
+    return cl.user_session.get("id")
+
+
+async def remember(key: str, value: Any) -> None:
+    """Set a session value locally and in the shared session state."""
+    cl.user_session.set(key, value)
+    await get_session_state().set_value(get_session_id(), key, value)
+
+
+async def recall(key: str, default: Any = None) -> Any:
+    """
+    Read a session value, falling back to the shared session state.
+
+    The fallback restores values set on another worker, or before this
+    worker restarted.
+    """
+    value = cl.user_session.get(key)
+    if value is None:
+        value = await get_session_state().get_value(get_session_id(), key)
+        if value is not None:
+            cl.user_session.set(key, value)
+    return default if value is None else value
+
+
+async def get_session_language() -> str:
+    """Return the language selected for this session, falling back to LANGUAGE."""
+    return await recall("language") or LANGUAGE
+
+
+def get_admission_key(thread_id: Optional[str] = None) -> str:
+    """Return the rate-limit key: the authenticated user, else the thread or session."""
+    user = cl.user_session.get("user")
+    if user is not None and getattr(user, "identifier", None):
+        return f"user:{user.identifier}"
+    thread_id = thread_id or cl.user_session.get("thread_id")
+    if thread_id:
+        return f"thread:{thread_id}"
+    return f"session:{cl.user_session.get('id')}"
+
+
+async def send_busy_message(rejection: AdmissionRejected) -> None:
+    """Tell the user the request was shed and they should retry shortly."""
+    logger.info("Request shed (%s), retry after %.1fs", rejection.reason, rejection.retry_after)
+    await cl.Message(content=BUSY_MESSAGE, author=CHATBOT_NAME).send()
+
+
+async def fetch_endpoint_response(query: str, chat_history: list) -> Dict[str, Any]:
+    """
+    Get the endpoint response for a turn, falling back when the endpoint is unhealthy.
+
+    Questions the local FAQ index matches confidently are answered without
+    calling the endpoint, unless users voted that answer down. Identical
+    in-flight questions share one upstream call, which runs behind the
+    circuit breaker (with optional hedging). If the call fails or the
+    circuit is open, the last good answer to the same question is served, or
+    a static fallback message if there is none. Only opening questions use
+    stored answers: a follow-up depends on its conversation, so it gets the
+    static fallback.
+
+    Args:
+        query (str): User's input message
+        chat_history (list): Messages sent to the endpoint, ending with the query
+
+    Returns:
+        Dict[str, Any]: Endpoint response; fallbacks carry a "fallback" key
+    """
+    faq_index = get_faq_index()
+    if faq_index is not None and (FAQ_LOCAL_FOLLOW_UPS or len(chat_history) == 1):
+        with start_span("faq_index.match") as span:
+            match = faq_index.match(query)
+            span.set_attribute("faq.hit", match is not None)
+            if match is not None:
+                span.set_attribute("faq.confidence", match["confidence"])
+                disliked = await feedback_view.is_disliked(query)
+                span.set_attribute("faq.disliked", disliked)
+                if not disliked:
+                    return local_response(match)
+
+    # Keyed by the question alone, like the answers preloaded by cache_warmup
+    fallback_key = normalize_text(query) if len(chat_history) == 1 else None
+    with start_span("databricks.call_endpoint", {"chat.history_length": len(chat_history)}) as span:
+        start = time.perf_counter()
+        try:
+            response = await coalesce(
+                chat_history,
+                lambda: endpoint_guard.call(
+                    lambda: databricks_utils.acall_databricks_endpoint(messages=chat_history)
+                )
+            )
+            if not response:
+                raise ValueError("Empty response from Databricks endpoint")
+            ENDPOINT_LATENCY.observe(time.perf_counter() - start, outcome="success")
+            if fallback_key is not None:
+                fallback_answers.put(fallback_key, response)
+            span.set_attribute(
+                "databricks.request_id",
+                response.get("databricks_output", {}).get("databricks_request_id") or ""
+            )
+            return response
+
+        except Exception as e:
+            logger.warning("Endpoint call failed, serving fallback: %s", e)
+            ENDPOINT_LATENCY.observe(time.perf_counter() - start, outcome="failure")
+            ERRORS_TOTAL.inc(stage="endpoint")
+            span.record_exception(e)
+            cached = fallback_answers.get(fallback_key) if fallback_key is not None else None
+            span.set_attribute("fallback", "cached" if cached is not None else "static")
+            if cached is not None:
+                return {**cached, "fallback": "cached"}
+            return static_fallback_response()
 
 
 @cl.step(name="Answer generator...", type="tool")
-async def get_response(chat_id: str, msg_id: str, query: str):
+async def get_response(chat_id: str, msg_id: str, query: str, language: Optional[str] = None):
     """
     Generate AI response for user query using Databricks endpoint.
 
+    When the session language differs from the answer language, the answer
+    is localized and both original and translated texts are stored.
+
     Args:
         chat_id (str): Unique identifier for the chat session
         msg_id (str): Unique identifier for the message
         query (str): User's input message
+        language (Optional[str]): Language to answer in. Defaults to LANGUAGE
 
     Returns:
         Dict[str, Any]: AI response or error message
@@ -77,39 +342,81 @@ async def get_response(chat_id: str, msg_id: str, query: str):
     Raises:
         Exception: For any errors during response generation
     """
+    query_translation = None
     try:
-        # Initialize Cosmos DB client and get chat history
-        conversations_cosmos_client = AzureCosmosClass()
-        chat_history = conversations_cosmos_client.get_chat_history(chat_id=chat_id)
-        chat_history.append({"role": "user", "content": query})
-
-        # Call Databricks endpoint for response
-        response = call_databricks_endpoint(messages=chat_history)
-        if not response:
-            raise ValueError("Empty response from Databricks endpoint")
-
-        answer = response['messages'][0]['content']
-        custom_outputs = response.get("custom_outputs", {})
-        databricks_request_id = response.get("databricks_output", {}).get(
-            "databricks_request_id"
-        )
-
-        # Update conversation in Cosmos DB
-        conversations_cosmos_client.update_conversation(
-            databricks_request_id=databricks_request_id,
-            chat_id=chat_id,
-            message_id=msg_id,
-            user_message=query,
-            rephrased_message=custom_outputs.get("rephrased_query", ""),
-            check_query=custom_outputs.get("check_query", ""),
-            ai_answer=answer,
-            context=custom_outputs["context"],
-            comparison_details=custom_outputs.get("comparison_details", None)
-        )
-        
-        return answer
+        with start_span("get_response", {"chat.id": chat_id, "message.id": msg_id}) as span:
+            language = language or LANGUAGE
+            # Translate the query for storage while the answer is being generated
+            query_translation = start_query_localization(query, language)
+
+            # Get the shared Cosmos DB client and chat history
+            conversations_cosmos_client = await get_conversations_client()
+            session_state = get_session_state()
+            with start_span("cosmos.get_chat_history", {"chat.id": chat_id}) as history_span:
+                # Served from the shared session state when cached, so any worker
+                # can continue the conversation without re-reading it
+                chat_history = await session_state.get_history(chat_id)
+                history_span.set_attribute("cache_hit", chat_history is not None)
+                if chat_history is None:
+                    # The blocking Cosmos SDK call runs in a worker thread so the query
+                    # translation (and other sessions) can progress on the event loop
+                    chat_history = await asyncio.to_thread(
+                        conversations_cosmos_client.get_chat_history, chat_id=chat_id
+                    )
+                    await session_state.set_history(chat_id, chat_history)
+            chat_history.append({"role": "user", "content": query})
+
+            # Call Databricks endpoint for response
+            response = await fetch_endpoint_response(query=query, chat_history=chat_history)
+
+            answer = response['messages'][0]['content']
+            custom_outputs = response.get("custom_outputs", {})
+            databricks_request_id = response.get("databricks_output", {}).get(
+                "databricks_request_id"
+            )
+            if response.get("fallback") == "cached":
+                # The stored answer belongs to an earlier request, not to this turn
+                databricks_request_id = None
+            span.set_attribute("databricks.request_id", databricks_request_id or "")
+
+            with start_span("localization", {"language": language}):
+                translation = await localize_turn(
+                    query=query,
+                    answer=answer,
+                    language=language,
+                    query_task=query_translation
+                )
+
+            if response.get("fallback") == "static":
+                # Nothing to record: the endpoint produced no answer for this turn
+                return translation["ai_answer"] if translation else answer
+
+            # Update conversation in Cosmos DB
+            with start_span("cosmos.update_conversation", {"chat.id": chat_id}):
+                await asyncio.to_thread(
+                    conversations_cosmos_client.update_conversation,
+                    databricks_request_id=databricks_request_id,
+                    chat_id=chat_id,
+                    message_id=msg_id,
+                    user_message=query,
+                    rephrased_message=custom_outputs.get("rephrased_query", ""),
+                    check_query=custom_outputs.get("check_query", ""),
+                    ai_answer=answer,
+                    context=custom_outputs["context"],
+                    comparison_details=custom_outputs.get("comparison_details", None),
+                    translation=translation
+                )
+            await session_state.append_history(chat_id, [
+                {"role": "user", "content": query},
+                {"role": "assistant", "content": answer},
+            ])
+
+            return translation["ai_answer"] if translation else answer
 
     except Exception as e:
+        if query_translation is not None and not query_translation.done():
+            query_translation.cancel()
+        ERRORS_TOTAL.inc(stage="get_response")
         logger.error(f"Error in get_response: {str(e)}", exc_info=True)
         return {
             "error": "Sorry, something went wrong. Please try again later.",
@@ -121,6 +428,11 @@ async def get_response(chat_id: str, msg_id: str, query: str):
 async def on_chat_start():
     """Send a welcome message when the chat starts."""
     try:
+        ACTIVE_SESSIONS.inc()
+        # The monitor needs the server's running loop, so it starts with the first session
+        start_loop_monitor()
+        if not warm_up.is_ready():
+            logger.info("Chat started before warm-up completed; pending: %s", warm_up.pending())
         await cl.Message(content=WELCOME_MESSAGE, author=CHATBOT_NAME).send()
     except Exception as e:
         logger.error(f"Error in on_chat_start: {e}")
@@ -141,26 +453,37 @@ async def on_message(msg: cl.Message) -> None:
         msg_id = msg.id
         chat_id = msg.thread_id
 
-        cl.user_session.set("thread_id", chat_id)
-        logger.info(f"Processing message: msg_id={msg_id}, chat_id={chat_id}")
-
-        response = await get_response(
-            chat_id=chat_id,
-            msg_id=msg_id,
-            query=msg.content
-        )
-        
-        if isinstance(response, dict) and "error" in response:
-            await cl.Message(
-                content="I apologize, but I encountered an error. Please try again.",
-                author=CHATBOT_NAME
-            ).send()
-            return
-
-        await cl.Message(content=response, author=CHATBOT_NAME).send()
-        logger.info(f"Response sent for message: {msg_id}")
+        await remember("thread_id", chat_id)
+        logger.info("Processing message: msg_id=%s, chat_id=%s", msg_id, chat_id)
+        MESSAGES_TOTAL.inc(input="text")
+
+        with start_span("chat_turn", {"chat.id": chat_id, "message.id": msg_id, "input": "text"}), \
+                TURN_LATENCY.time(input="text"):
+            try:
+                async with admission_controller.admit(get_admission_key(chat_id)):
+                    response = await get_response(
+                        chat_id=chat_id,
+                        msg_id=msg_id,
+                        query=msg.content,
+                        language=await get_session_language()
+                    )
+            except AdmissionRejected as e:
+                await send_busy_message(e)
+                return
+
+            if isinstance(response, dict) and "error" in response:
+                await cl.Message(
+                    content="I apologize, but I encountered an error. Please try again.",
+                    author=CHATBOT_NAME
+                ).send()
+                return
+
+            with start_span("chainlit.send"):
+                await cl.Message(content=response, author=CHATBOT_NAME).send()
+            logger.info("Response sent for message: %s", msg_id)
 
     except Exception as e:
+        ERRORS_TOTAL.inc(stage="on_message")
         logger.error(f"Error processing message: {str(e)}", exc_info=True)
         await cl.Message(
             content="An error occurred while processing your message. Please try again."
@@ -182,8 +505,12 @@ async def speech_to_text(audio_file: str) -> str:
         Exception: If speech recognition fails
     """
     try:
-        logger.info(f"Starting speech recognition for file: {audio_file}")
-        transcription = recognize_from_file(filename=audio_file)
+        logger.info("Starting speech recognition for file: %s", audio_file)
+        with start_span("speech.transcribe", {"audio.bytes": os.path.getsize(audio_file)}):
+            # The Speech SDK call blocks until recognition finishes
+            transcription = await asyncio.to_thread(
+                speech_recognition.recognize_from_file, filename=audio_file
+            )
         
         if not transcription:
             raise ValueError("No transcription generated")
@@ -192,6 +519,7 @@ async def speech_to_text(audio_file: str) -> str:
         return transcription
 
     except Exception as e:
+        ERRORS_TOTAL.inc(stage="speech_to_text")
         logger.error(f"Speech recognition failed: {str(e)}", exc_info=True)
         return "I couldn't understand the audio. Please try again."
 
@@ -205,7 +533,7 @@ async def on_audio_start() -> bool:
         bool: True if initialization successful, False otherwise
     """
     try:
-        cl.user_session.set("audio_chunks", [])
+        await get_session_state().clear_audio(get_session_id())
         logger.info("Audio recording session initialized")
         return True
 
@@ -223,12 +551,11 @@ async def on_audio_chunk(chunk: cl.InputAudioChunk) -> None:
         chunk (cl.InputAudioChunk): Raw audio data chunk
     """
     try:
-        audio_chunks = cl.user_session.get("audio_chunks")
-        if audio_chunks is None:
-            raise ValueError("Audio chunks storage not initialized")
-
-        audio_chunk = np.frombuffer(chunk.data, dtype=np.int16)
-        audio_chunks.append(audio_chunk)
+        AUDIO_BYTES_TOTAL.inc(len(chunk.data))
+        # Raw 16-bit PCM is buffered in the shared session state, so the
+        # recording survives a reconnect to another worker
+        if await get_session_state().append_audio(get_session_id(), chunk.data) < 0:
+            logger.warning("Recording exceeds AUDIO_MAX_BYTES; dropping audio chunk")
 
     except Exception as e:
         logger.error(f"Error processing audio chunk: {str(e)}", exc_info=True)
@@ -248,67 +575,77 @@ async def process_audio() -> None:
     Process recorded audio: save, transcribe, and generate response.
     
     Handles the complete workflow of:
-    1. Concatenating audio chunks
+    1. Taking the recorded audio from the session state
     2. Saving to WAV file
     3. Transcribing to text
     4. Generating AI response
     5. Cleaning up temporary files
     """
     try:
-        audio_chunks = cl.user_session.get("audio_chunks")
-        if not audio_chunks:
+        audio = await get_session_state().pop_audio(get_session_id())
+        if not audio:
             await cl.Message(
                 content="No audio recorded. Please try again."
             ).send()
             return
 
-        # Generate unique audio file path
-        audio_id = str(uuid.uuid4())
-        audio_file_path = f"temp_{audio_id}_recorded_audio.wav"
-        
         try:
-            # Save audio to WAV file
-            concatenated = np.concatenate(audio_chunks)
-            with wave.open(audio_file_path, 'wb') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(24000)
-                wav_file.writeframes(concatenated.tobytes())
-
-            # Clear stored audio chunks
-            cl.user_session.set("audio_chunks", [])
-
-            # Process speech to text
-            logger.info("Starting speech-to-text conversion")
-            transcription = await speech_to_text(audio_file_path)
-
-            if not transcription or transcription.startswith("I couldn't understand"):
-                raise ValueError("Speech recognition failed")
-
-            # Send transcription message
-            message_transcription = cl.Message(
-                author="You",
-                type="user_message",
-                content=transcription
-            )
-            await message_transcription.send()
-
-            # Generate AI response
-            answer = await get_response(
-                chat_id=message_transcription.thread_id,
-                msg_id=message_transcription.parent_id,
-                query=transcription
-            )
-            cl.user_session.set("thread_id", message_transcription.thread_id)
-            await cl.Message(content=answer).send()
-            logger.info("Audio processing completed successfully")
+            await admission_controller.acquire(get_admission_key())
+        except AdmissionRejected as e:
+            await send_busy_message(e)
+            return
 
+        audio_file_path = None
+        try:
+            # Generate unique audio file path
+            audio_id = str(uuid.uuid4())
+            audio_file_path = f"temp_{audio_id}_recorded_audio.wav"
+
+            MESSAGES_TOTAL.inc(input="audio")
+            with start_span("voice_turn", {"input": "audio"}), TURN_LATENCY.time(input="audio"):
+                # Save audio to WAV file off the event loop
+                with start_span("audio.encode", {"audio.bytes": len(audio)}):
+                    try:
+                        await audio_pool.run("encode_wav", encode_wav, audio, audio_file_path)
+                    except AudioPoolBusy as e:
+                        await send_busy_message(e)
+                        return
+
+                # Process speech to text
+                logger.info("Starting speech-to-text conversion")
+                transcription = await speech_to_text(audio_file_path)
+
+                if not transcription or transcription.startswith("I couldn't understand"):
+                    raise ValueError("Speech recognition failed")
+
+                # Send transcription message
+                message_transcription = cl.Message(
+                    author="You",
+                    type="user_message",
+                    content=transcription
+                )
+                with start_span("chainlit.send", {"message.type": "transcription"}):
+                    await message_transcription.send()
+
+                # Generate AI response
+                answer = await get_response(
+                    chat_id=message_transcription.thread_id,
+                    msg_id=message_transcription.parent_id,
+                    query=transcription,
+                    language=await get_session_language()
+                )
+                await remember("thread_id", message_transcription.thread_id)
+                with start_span("chainlit.send"):
+                    await cl.Message(content=answer).send()
+                logger.info("Audio processing completed successfully")
         finally:
+            admission_controller.release()
             # Cleanup temporary file
-            if os.path.exists(audio_file_path):
+            if audio_file_path and os.path.exists(audio_file_path):
                 delete_audio_file(audio_file_path=audio_file_path)
 
     except Exception as e:
+        ERRORS_TOTAL.inc(stage="process_audio")
         logger.error(f"Audio processing failed: {str(e)}", exc_info=True)
         await cl.Message(
             content="Sorry, I encountered an error processing the audio. Please try again."
@@ -326,10 +663,8 @@ async def on_stop() -> None:
     try:
         logger.info("Task interruption requested by user")
         # Clean up any ongoing operations
-        audio_chunks = cl.user_session.get("audio_chunks")
-        if audio_chunks:
-            cl.user_session.set("audio_chunks", [])
-            logger.info("Cleaned up audio session data")
+        await get_session_state().clear_audio(get_session_id())
+        logger.info("Cleaned up audio session data")
 
         await cl.Message(
             content="Task stopped as requested."
@@ -345,30 +680,29 @@ async def on_chat_end() -> None:
     Handle chat session termination.
 
     Performs cleanup operations when user disconnects:
+    - Applies the lifecycle policy to the thread (see lifecycle.py)
     - Cleans up session data
     - Logs session end
     - Releases any held resources
     """
     try:
-        session_id = cl.user_session.get("id")
-        logger.info(f"Chat session ended: {session_id}")
+        ACTIVE_SESSIONS.dec()
+        session_id = get_session_id()
+        logger.info("Chat session ended: %s", session_id)
 
-        thread_id = cl.user_session.get("thread_id")
-        logger.info(f"Cleaning up session data for thread: {thread_id}")
-        # Clear session data
+        thread_id = await recall("thread_id")
+        logger.info("Cleaning up session data for thread: %s", thread_id)
+        # Expire, archive or delete the thread's data as configured
         if thread_id:
-            # call delete_thread from data_layer
-            await cl_data._data_layer.delete_thread(thread_id=thread_id)
-            logger.info(f"Deleted thread and steps data for thread: {thread_id}")
-
-        # Clean up session resources
-        if hasattr(cl.user_session, "audio_chunks"):
-            cl.user_session.set("audio_chunks", None)
+            await lifecycle.end_session(cl_data._data_layer, thread_id)
 
         # Log session statistics if available
-        if hasattr(cl.user_session, "message_count"):
-            msg_count = cl.user_session.get("message_count", 0)
-            logger.info(f"Session {session_id} processed {msg_count} messages")
+        msg_count = await recall("message_count")
+        if msg_count is not None:
+            logger.info("Session %s processed %s messages", session_id, msg_count)
+
+        # Clean up session resources, including buffered audio on any worker
+        await get_session_state().delete_session(session_id)
 
     except Exception as e:
         logger.error(f"Error during chat end cleanup: {str(e)}", exc_info=True)
@@ -385,12 +719,23 @@ async def on_chat_resume(thread: ThreadDict) -> None:
     Restores chat context and sends welcome back message to user.
     """
     try:
+        ACTIVE_SESSIONS.inc()
+        start_loop_monitor()
         thread_id = thread.get("id", "unknown")
-        logger.info(f"Resuming chat session: {thread_id}")
+        logger.info("Resuming chat session: %s", thread_id)
 
         # Initialize session data
-        cl.user_session.set("thread_id", thread_id)
-        cl.user_session.set("message_count", len(thread.get("messages", [])))
+        await remember("thread_id", thread_id)
+        await remember("message_count", len(thread.get("messages", [])))
+        # Resumed within the grace period: the thread keeps its full lifetime
+        await lifecycle.resume(cl_data._data_layer, thread_id)
+
+        # Reuse translations stored with earlier turns instead of re-translating
+        conversations_cosmos_client = await get_conversations_client()
+        conversation = await asyncio.to_thread(conversations_cosmos_client.get_data, thread_id)
+        if conversation:
+            seeded = seed_from_conversation(conversation.get("conversation", []))
+            logger.info("Seeded %s cached translations for thread: %s", seeded, thread_id)
 
         # Send welcome back message
         await cl.Message(
@@ -398,7 +743,7 @@ async def on_chat_resume(thread: ThreadDict) -> None:
             author=CHATBOT_NAME
         ).send()
 
-        logger.info(f"Successfully resumed session: {thread_id}")
+        logger.info("Successfully resumed session: %s", thread_id)
 
     except Exception as e:
         logger.error(f"Error resuming chat session: {str(e)}", exc_info=True)
@@ -426,14 +771,14 @@ async def setup_agent(settings: Dict[str, Any]) -> None:
 
         # Apply language settings if present
         if "language" in settings:
-            cl.user_session.set("language", settings["language"])
-            logger.info(f"Language updated to: {settings['language']}")
+            await remember("language", settings["language"])
+            logger.info("Language updated to: %s", settings['language'])
 
         # Apply other custom settings
         for key, value in settings.items():
             if key != "language":
-                cl.user_session.set(f"setting_{key}", value)
-                logger.info(f"Updated setting {key}: {value}")
+                await remember(f"setting_{key}", value)
+                logger.info("Updated setting %s: %s", key, value)
 
         await cl.Message(
             content="Settings updated successfully.",
@@ -463,10 +808,13 @@ def cleanup_resources() -> None:
             if file.endswith("_recorded_audio.wav"):
                 try:
                     os.remove(os.path.join(temp_dir, file))
-                    logger.info(f"Removed temporary file: {file}")
+                    logger.info("Removed temporary file: %s", file)
                 except OSError as e:
                     logger.warning(f"Failed to remove file {file}: {str(e)}")
 
+        # Stop the audio pool's workers
+        audio_pool.shutdown(wait=False)
+
         # Close any open connections
         # Add any additional cleanup needed
 
@@ -0,0 +1,212 @@
+"""
+Bounded executor for CPU-bound audio processing.
+
+Encoding recorded audio (and any future resampling, VAD or compression)
+must not run on the event loop: a long recording would stall every other
+session on the worker. AudioPool runs those steps in a thread or process
+pool and applies backpressure:
+- At most AUDIO_POOL_MAX_PENDING jobs are queued or running at once
+- A job that cannot get a slot within AUDIO_POOL_QUEUE_TIMEOUT_SECONDS is
+  rejected with AudioPoolBusy, so the user gets a fast "busy" reply
+
+Jobs are plain module-level functions taking bytes and paths, so they can
+be pickled to a process pool. Threads suit the stdlib wave encoder (which
+releases the GIL on file I/O); use processes for numpy-heavy DSP that
+should scale across cores.
+
+Configuration:
+    AUDIO_POOL_KIND: "thread" (default) or "process"
+    AUDIO_POOL_WORKERS: Pool size (default: CPU count)
+    AUDIO_POOL_MAX_PENDING: Jobs queued or running before callers wait (default: 4 x workers)
+    AUDIO_POOL_QUEUE_TIMEOUT_SECONDS: Seconds to wait for a slot (default 5)
+"""
+
+import os
+import time
+import wave
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from utils import setup_logger
+from metrics import registry
+from admission import AdmissionRejected
+
+logger = setup_logger("audio_pool")
+
+AUDIO_POOL_KIND = os.getenv("AUDIO_POOL_KIND", "thread").lower()
+AUDIO_POOL_WORKERS = int(os.getenv("AUDIO_POOL_WORKERS", str(os.cpu_count() or 2)))
+AUDIO_POOL_MAX_PENDING = int(os.getenv("AUDIO_POOL_MAX_PENDING", str(AUDIO_POOL_WORKERS * 4)))
+AUDIO_POOL_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AUDIO_POOL_QUEUE_TIMEOUT_SECONDS", "5"))
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "24000"))
+
+AUDIO_POOL_JOBS = registry.counter(
+    "audio_pool_jobs_total",
+    "Audio jobs by operation and outcome (ok, error, rejected)",
+    ["op", "outcome"],
+)
+AUDIO_POOL_JOB_SECONDS = registry.histogram(
+    "audio_pool_job_seconds",
+    "Time audio jobs spend running in the pool",
+    ["op"],
+)
+AUDIO_POOL_WAIT_SECONDS = registry.histogram(
+    "audio_pool_wait_seconds",
+    "Time audio jobs wait for a pool slot",
+    ["op"],
+)
+
+
+class AudioPoolBusy(AdmissionRejected):
+    """Raised when no audio pool slot frees up within the queue timeout."""
+
+    def __init__(self, retry_after: float = 0.0) -> None:
+        super().__init__("audio_pool_busy", retry_after)
+
+
+def encode_wav(
+    audio: bytes,
+    path: str,
+    sample_rate: int = AUDIO_SAMPLE_RATE,
+    channels: int = 1,
+    sample_width: int = 2,
+) -> int:
+    """
+    Write raw PCM audio to a WAV file.
+
+    Args:
+        audio (bytes): Raw little-endian PCM samples
+        path (str): Destination file path
+        sample_rate (int): Samples per second
+        channels (int): Number of channels
+        sample_width (int): Bytes per sample
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(audio)
+    return os.path.getsize(path)
+
+
+class AudioPool:
+    """
+    Thread or process pool for audio jobs with a bounded number of pending jobs.
+
+    Attributes:
+        kind (str): "thread" or "process"
+        workers (int): Pool size
+        max_pending (int): Jobs queued or running before callers wait
+        queue_timeout (float): Seconds a caller waits for a slot before AudioPoolBusy
+        in_flight (int): Jobs currently holding a slot
+        completed (int): Jobs finished, successfully or not
+        rejected (int): Jobs rejected because the pool was busy
+    """
+
+    def __init__(
+        self,
+        kind: str = AUDIO_POOL_KIND,
+        workers: int = AUDIO_POOL_WORKERS,
+        max_pending: int = AUDIO_POOL_MAX_PENDING,
+        queue_timeout: float = AUDIO_POOL_QUEUE_TIMEOUT_SECONDS,
+    ) -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown AUDIO_POOL_KIND: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+        # Created on first use, inside the running loop
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn: forking a process that runs threads and an event loop is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="audio-pool"
+                )
+            logger.info("Started %s audio pool with %s workers", self.kind, self.workers)
+        return self._executor
+
+    async def run(self, op: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a job in the pool once a slot is free.
+
+        Args:
+            op (str): Operation name for metrics and logs (e.g. "encode_wav")
+            func (Callable[..., Any]): Module-level function to run
+            *args (Any): Picklable arguments
+
+        Returns:
+            Any: The function's result
+
+        Raises:
+            AudioPoolBusy: If no slot frees up within queue_timeout
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        queued = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            AUDIO_POOL_JOBS.inc(op=op, outcome="rejected")
+            logger.warning("Audio pool busy, rejecting %s (%s pending)", op, self.in_flight)
+            raise AudioPoolBusy(retry_after=self.queue_timeout)
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        AUDIO_POOL_WAIT_SECONDS.observe(started - queued, op=op)
+        outcome = "error"
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._get_executor(), func, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool and retry once
+                logger.warning("Audio process pool broken, restarting")
+                self._executor = None
+                result = await loop.run_in_executor(self._get_executor(), func, *args)
+            outcome = "ok"
+            return result
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._slots.release()
+            AUDIO_POOL_JOB_SECONDS.observe(time.perf_counter() - started, op=op)
+            AUDIO_POOL_JOBS.inc(op=op, outcome=outcome)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the pool's workers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool configuration and counters."""
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+audio_pool = AudioPool()
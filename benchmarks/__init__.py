@@ -0,0 +1 @@
+"""Offline benchmarks for the Copilot UI; see load_test.py."""
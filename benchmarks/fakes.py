@@ -0,0 +1,825 @@
+"""
+In-process stand-ins for the paid services used by the Copilot UI.
+
+The fakes mimic the subset of each client API that the application calls,
+with configurable latency and error injection, so the handlers in app.py
+can be exercised offline:
+
+- InMemoryContainer: Cosmos DB ContainerProxy (items, queries, change feed)
+- FakeRegions: Cosmos DB regions for region_routing.RegionHealthMonitor
+- FakeServingEndpoint: DatabricksServingClient (predict / apredict)
+- FakeSpeechService: speech_recognition.recognize_from_file
+- FakeTranslator: translation_helper.AsyncTranslatorClient
+
+Synchronous fakes block the calling thread for their latency, just like the
+real SDK calls they replace, so event-loop stalls show up in benchmarks.
+"""
+
+import re
+import copy
+import json
+import time
+import zlib
+import random
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from azure.cosmos.exceptions import (
+    CosmosBatchOperationError,
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+from serving_client import ServingEndpointError
+
+
+@dataclass
+class LatencyProfile:
+    """
+    Latency and failure model of a fake dependency.
+
+    Attributes:
+        mean_ms (float): Mean latency in milliseconds
+        jitter_ms (float): Standard deviation of the latency in milliseconds
+        error_rate (float): Probability (0-1) that a call fails
+        error_status (int): HTTP status code of injected failures
+    """
+
+    mean_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    rng: random.Random = field(default_factory=random.Random, repr=False)
+
+    def sample_seconds(self) -> float:
+        """Draw one latency sample in seconds."""
+        if self.mean_ms <= 0 and self.jitter_ms <= 0:
+            return 0.0
+        return max(0.0, self.rng.gauss(self.mean_ms, self.jitter_ms)) / 1000
+
+    def should_fail(self) -> bool:
+        """Decide whether this call fails."""
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+    def block(self) -> bool:
+        """Sleep the calling thread; return True if the call should fail."""
+        delay = self.sample_seconds()
+        if delay:
+            time.sleep(delay)
+        return self.should_fail()
+
+    async def wait(self) -> bool:
+        """Sleep without blocking the event loop; return True if the call should fail."""
+        delay = self.sample_seconds()
+        if delay:
+            await asyncio.sleep(delay)
+        return self.should_fail()
+
+
+class CallStats:
+    """Thread-safe call and failure counters per operation."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+
+    def record(self, operation: str, failed: bool = False) -> None:
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            if failed:
+                self.failures[operation] = self.failures.get(operation, 0) + 1
+
+    def as_dict(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {"calls": dict(self.calls), "failures": dict(self.failures)}
+
+
+# ---------------------------------------------------------------------------
+# Cosmos DB
+# ---------------------------------------------------------------------------
+
+_SELECT_RE = re.compile(
+    r"^\s*SELECT\s+(?P<projection>.+?)\s+FROM\s+\w+(?:\s+(?P<alias>\w+))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+    r"(?:\s+OFFSET\s+(?P<offset>\d+)\s+LIMIT\s+(?P<limit>\d+))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ARRAY_CONTAINS_RE = re.compile(
+    r"^ARRAY_CONTAINS\(\s*(?P<path>[\w.]+)\s*,\s*(?P<value>.+?)(?:\s*,\s*(?P<partial>true|false))?\s*\)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_IS_DEFINED_RE = re.compile(r"^IS_DEFINED\(\s*(?P<path>[\w.]+)\s*\)$", re.IGNORECASE)
+_COMPARISON_RE = re.compile(
+    r"^(?P<left>[\w.]+)\s*(?P<op>=|!=|<>|>=|<=|>|<)\s*(?P<right>.+)$", re.DOTALL
+)
+
+
+def _split_conjunction(where: str) -> List[str]:
+    """Split a WHERE clause on top-level AND."""
+    parts, depth, quote, start = [], 0, None, 0
+    i = 0
+    while i < len(where):
+        ch = where[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "({[":
+            depth += 1
+        elif ch in ")}]":
+            depth -= 1
+        elif depth == 0 and where[i:i + 5].upper() == " AND ":
+            parts.append(where[start:i])
+            start = i + 5
+            i += 4
+        i += 1
+    parts.append(where[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+class ChangeFeedPage(list):
+    """
+    Change feed result: iterable like the SDK's ItemPaged, with by_page().
+
+    The page iterator exposes the continuation after the page it returned
+    as continuation_token, like azure.core's PageIterator.
+    """
+
+    def __init__(self, items: List[Dict[str, Any]], continuation: str) -> None:
+        super().__init__(items)
+        self.continuation = continuation
+
+    def by_page(self, continuation_token: Optional[str] = None) -> "_ChangeFeedPages":
+        return _ChangeFeedPages(self)
+
+
+class _ChangeFeedPages:
+    def __init__(self, page: ChangeFeedPage) -> None:
+        self._pages = iter([page])
+        self.continuation_token: Optional[str] = None
+
+    def __iter__(self) -> "_ChangeFeedPages":
+        return self
+
+    def __next__(self) -> List[Dict[str, Any]]:
+        page = next(self._pages)
+        self.continuation_token = page.continuation
+        return list(page)
+
+
+class InMemoryContainer:
+    """
+    Cosmos DB ContainerProxy stand-in backed by a dict.
+
+    Supports point reads and writes, the SQL shapes used by this application
+    (equality and range filters joined by AND, ARRAY_CONTAINS, IS_DEFINED,
+    ORDER BY, OFFSET/LIMIT, SELECT VALUE COUNT(1)) and an incremental change
+    feed. Like Cosmos DB, ORDER BY leaves out items without the sort field.
+    Items are stored per (partition key, id) as in Cosmos DB. Writes report
+    a session token to a per-request raw_response_hook, and reads passing
+    a session_token are counted as "session_token_reads".
+
+    Attributes:
+        id (str): Container name
+        partition_key_path (str): Partition key path, e.g. "/id"
+        latency (LatencyProfile): Latency and failure model per operation
+        stats (CallStats): Operation counters
+    """
+
+    def __init__(
+        self,
+        container_id: str = "container",
+        partition_key_path: str = "/id",
+        latency: Optional[LatencyProfile] = None,
+        feed_ranges: int = 4,
+    ) -> None:
+        self.id = container_id
+        self.feed_ranges = feed_ranges
+        self.partition_key_path = partition_key_path
+        self.latency = latency or LatencyProfile()
+        self.stats = CallStats()
+        self._items: Dict[Tuple[Any, str], Dict[str, Any]] = {}
+        self._lsn = 0
+        self._lock = threading.Lock()
+        # The SDK exposes the change feed continuation through response headers
+        self.client_connection = SimpleNamespace(last_response_headers={})
+
+    # -- helpers -----------------------------------------------------------
+
+    def _call(self, operation: str) -> None:
+        failed = self.latency.block()
+        self.stats.record(operation, failed)
+        if failed:
+            raise CosmosHttpResponseError(
+                status_code=self.latency.error_status,
+                message=f"Injected failure in {self.id}.{operation}",
+            )
+
+    def _partition_value(self, body: Dict[str, Any]) -> Any:
+        return _resolve(body, self.partition_key_path.strip("/").split("/"))
+
+    def _stamp(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self._lsn += 1
+        stored = copy.deepcopy(body)
+        stored["_ts"] = int(time.time())
+        stored["_lsn"] = self._lsn
+        stored["_etag"] = f'"{self._lsn}"'
+        return stored
+
+    def _in_feed_range(self, partition_value: Any, feed_range: Optional[Dict[str, Any]]) -> bool:
+        if feed_range is None:
+            return True
+        index, count = feed_range["fake_range"]
+        return zlib.crc32(json.dumps(partition_value).encode("utf-8")) % count == index
+
+    def _respond(self, method: str, kwargs: Dict[str, Any]) -> None:
+        # Per-request raw_response_hook, e.g. session token capture (see session_tokens.py)
+        hook = kwargs.get("raw_response_hook")
+        if hook is not None:
+            hook(SimpleNamespace(http_response=SimpleNamespace(
+                status_code=200,
+                headers={"x-ms-session-token": f"0:-1#{self._lsn}", "x-ms-request-charge": "1"},
+                request=SimpleNamespace(method=method, url=f"https://localhost/dbs/fake/colls/{self.id}/docs"),
+            )))
+
+    def _read_with_session(self, kwargs: Dict[str, Any]) -> None:
+        if kwargs.get("session_token"):
+            self.stats.record("session_token_reads")
+
+    def _not_found(self, item: str) -> CosmosResourceNotFoundError:
+        return CosmosResourceNotFoundError(
+            status_code=404, message=f"Entity with the specified id does not exist: {item}"
+        )
+
+    # -- item operations ---------------------------------------------------
+
+    def read_item(self, item: str, partition_key: Any, **kwargs: Any) -> Dict[str, Any]:
+        self._call("read_item")
+        self._read_with_session(kwargs)
+        with self._lock:
+            stored = self._items.get((partition_key, item))
+            if stored is None:
+                raise self._not_found(item)
+            return copy.deepcopy(stored)
+
+    def create_item(self, body: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._call("create_item")
+        key = (self._partition_value(body), body["id"])
+        with self._lock:
+            if key in self._items:
+                raise CosmosResourceExistsError(
+                    status_code=409, message=f"Entity with the specified id already exists: {body['id']}"
+                )
+            self._items[key] = self._stamp(body)
+            self._respond("POST", kwargs)
+            return copy.deepcopy(self._items[key])
+
+    def replace_item(self, item: Any, body: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._call("replace_item")
+        item_id = item["id"] if isinstance(item, dict) else item
+        key = (self._partition_value(body), item_id)
+        with self._lock:
+            if key not in self._items:
+                raise self._not_found(item_id)
+            self._items[key] = self._stamp(body)
+            self._respond("PUT", kwargs)
+            return copy.deepcopy(self._items[key])
+
+    def upsert_item(self, body: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._call("upsert_item")
+        key = (self._partition_value(body), body["id"])
+        with self._lock:
+            self._items[key] = self._stamp(body)
+            self._respond("POST", kwargs)
+            return copy.deepcopy(self._items[key])
+
+    def patch_item(
+        self, item: str, partition_key: Any, patch_operations: List[Dict[str, Any]], **kwargs: Any
+    ) -> Dict[str, Any]:
+        self._call("patch_item")
+        with self._lock:
+            stored = self._items.get((partition_key, item))
+            if stored is None:
+                raise self._not_found(item)
+            self._items[(partition_key, item)] = self._stamp(_apply_patch(stored, patch_operations))
+            self._respond("PATCH", kwargs)
+            return copy.deepcopy(self._items[(partition_key, item)])
+
+    def delete_item(self, item: Any, partition_key: Any, **kwargs: Any) -> None:
+        self._call("delete_item")
+        item_id = item["id"] if isinstance(item, dict) else item
+        with self._lock:
+            if self._items.pop((partition_key, item_id), None) is None:
+                raise self._not_found(item_id)
+            self._respond("DELETE", kwargs)
+
+    def execute_item_batch(
+        self, batch_operations: List[Tuple[str, Tuple[Any, ...]]], partition_key: Any, **kwargs: Any
+    ) -> List[Dict[str, Any]]:
+        """Apply "create", "upsert", "patch" and "delete" operations in one partition, all or nothing."""
+        self._call("execute_item_batch")
+        with self._lock:
+            staged = dict(self._items)
+            results = []
+            for index, (operation, args) in enumerate(batch_operations):
+                if operation == "delete":
+                    key, body = (partition_key, args[0]), None
+                elif operation == "patch":
+                    key = (partition_key, args[0])
+                    body = _apply_patch(staged[key], args[1]) if key in staged else None
+                else:
+                    body = args[0]
+                    key = (self._partition_value(body), body["id"])
+                status = 200
+                if key[0] != partition_key:
+                    status = 400
+                elif operation in ("delete", "patch") and key not in staged:
+                    status = 404
+                elif operation == "create" and key in staged:
+                    status = 409
+                if status != 200:
+                    raise CosmosBatchOperationError(
+                        error_index=index,
+                        headers={},
+                        status_code=status,
+                        message=f"Batch operation {index} ({operation}) failed with {status}",
+                        operation_responses=results,
+                    )
+                if body is None:
+                    del staged[key]
+                else:
+                    staged[key] = self._stamp(body)
+                results.append({"statusCode": 204 if body is None else 200 if operation == "patch" else 201})
+            self._items = staged
+            self._respond("POST", kwargs)
+            return results
+
+    def read_all_items(self, **kwargs: Any) -> Iterable[Dict[str, Any]]:
+        self._call("read_all_items")
+        with self._lock:
+            return [copy.deepcopy(stored) for stored in self._items.values()]
+
+    # -- queries -----------------------------------------------------------
+
+    def query_items(
+        self,
+        query: str,
+        parameters: Optional[List[Dict[str, Any]]] = None,
+        partition_key: Any = None,
+        enable_cross_partition_query: Optional[bool] = None,
+        **kwargs: Any,
+    ) -> Iterable[Any]:
+        self._call("query_items")
+        self._read_with_session(kwargs)
+        match = _SELECT_RE.match(query)
+        if match is None:
+            raise ValueError(f"Unsupported query for InMemoryContainer: {query}")
+
+        params = {p["name"]: p["value"] for p in (parameters or [])}
+        alias = match.group("alias")
+        predicates = _split_conjunction(match.group("where") or "")
+
+        with self._lock:
+            candidates = [
+                stored for (pk, _), stored in self._items.items()
+                if partition_key is None or pk == partition_key
+            ]
+            rows = [
+                copy.deepcopy(stored) for stored in candidates
+                if all(_evaluate(pred, stored, alias, params) for pred in predicates)
+            ]
+
+        if match.group("order"):
+            for term in reversed([t.strip() for t in match.group("order").split(",")]):
+                path, _, direction = term.partition(" ")
+                rows = [row for row in rows if _is_defined(path, row, alias)]
+                rows.sort(
+                    key=lambda row: _sort_key(_resolve_ref(path, row, alias)),
+                    reverse=direction.strip().upper() == "DESC",
+                )
+        if match.group("offset") is not None:
+            offset, limit = int(match.group("offset")), int(match.group("limit"))
+            rows = rows[offset:offset + limit]
+
+        projection = match.group("projection").strip()
+        if re.fullmatch(r"VALUE\s+COUNT\(1\)", projection, re.IGNORECASE):
+            return [len(rows)]
+        value = re.fullmatch(r"VALUE\s+([\w.]+)", projection, re.IGNORECASE)
+        if value:
+            return [_resolve_ref(value.group(1), row, alias) for row in rows]
+        return rows
+
+    # -- change feed -------------------------------------------------------
+
+    def read_feed_ranges(self, **kwargs: Any) -> List[Dict[str, Any]]:
+        """Return `feed_ranges` opaque ranges splitting the partition key space."""
+        self._call("read_feed_ranges")
+        return [{"fake_range": [index, self.feed_ranges]} for index in range(self.feed_ranges)]
+
+    def query_items_change_feed(
+        self,
+        is_start_from_beginning: bool = False,
+        continuation: Optional[str] = None,
+        max_item_count: Optional[int] = None,
+        partition_key: Any = None,
+        start_time: Any = None,
+        feed_range: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> ChangeFeedPage:
+        """
+        Return the latest version of items changed after the continuation.
+
+        Like the SDK, the continuation for the next call is the page
+        iterator's continuation_token, and is also published in
+        client_connection.last_response_headers["etag"]. Deletes are not
+        reported (Cosmos DB's latest-version change feed omits them too).
+        """
+        self._call("query_items_change_feed")
+        with self._lock:
+            if continuation is not None:
+                since = int(continuation)
+            elif is_start_from_beginning or start_time == "Beginning":
+                since = 0
+            else:
+                since = self._lsn
+            changed = sorted(
+                (
+                    stored for (pk, _), stored in self._items.items()
+                    if stored["_lsn"] > since
+                    and (partition_key is None or pk == partition_key)
+                    and self._in_feed_range(pk, feed_range)
+                ),
+                key=lambda stored: stored["_lsn"],
+            )
+            if max_item_count:
+                changed = changed[:max_item_count]
+            last = changed[-1]["_lsn"] if changed else since
+            self.client_connection.last_response_headers = {"etag": str(last)}
+            return ChangeFeedPage([copy.deepcopy(stored) for stored in changed], str(last))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def _resolve(document: Any, parts: List[str]) -> Any:
+    for part in parts:
+        if not isinstance(document, dict):
+            return None
+        document = document.get(part)
+    return document
+
+
+def _apply_patch(document: Dict[str, Any], patch_operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    patched = copy.deepcopy(document)
+    for operation in patch_operations:
+        *parents, name = operation["path"].strip("/").split("/")
+        target = _resolve(patched, parents) if parents else patched
+        if operation["op"] == "remove":
+            target.pop(name, None)
+        elif operation["op"] == "incr":
+            target[name] = target.get(name, 0) + operation["value"]
+        else:
+            target[name] = operation["value"]
+    return patched
+
+
+def _resolve_ref(ref: str, document: Dict[str, Any], alias: Optional[str]) -> Any:
+    parts = ref.split(".")
+    if alias and parts[0] == alias:
+        parts = parts[1:]
+    return _resolve(document, parts)
+
+
+def _is_defined(ref: str, document: Dict[str, Any], alias: Optional[str]) -> bool:
+    parts = ref.split(".")
+    if alias and parts[0] == alias:
+        parts = parts[1:]
+    for part in parts:
+        if not isinstance(document, dict) or part not in document:
+            return False
+        document = document[part]
+    return True
+
+
+def _literal(token: str, params: Dict[str, Any]) -> Any:
+    token = token.strip()
+    if token.startswith("@"):
+        return params[token]
+    if token[:1] == "'" and token[-1:] == "'":
+        return token[1:-1]
+    return json.loads(token)
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    # Cosmos DB orders undefined < null < booleans < numbers < strings
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    return (3, str(value))
+
+
+def _evaluate(predicate: str, document: Dict[str, Any], alias: Optional[str], params: Dict[str, Any]) -> bool:
+    if predicate.replace(" ", "") == "1=1":
+        return True
+
+    defined = _IS_DEFINED_RE.match(predicate)
+    if defined:
+        return _is_defined(defined.group("path"), document, alias)
+
+    contains = _ARRAY_CONTAINS_RE.match(predicate)
+    if contains:
+        array = _resolve_ref(contains.group("path"), document, alias) or []
+        value = _literal(contains.group("value"), params)
+        partial = (contains.group("partial") or "false").lower() == "true"
+        for element in array:
+            if partial and isinstance(value, dict) and isinstance(element, dict):
+                if all(element.get(k) == v for k, v in value.items()):
+                    return True
+            elif element == value:
+                return True
+        return False
+
+    comparison = _COMPARISON_RE.match(predicate)
+    if comparison:
+        left = _resolve_ref(comparison.group("left"), document, alias)
+        right = _literal(comparison.group("right"), params)
+        op = comparison.group("op")
+        if op == "=":
+            return left == right
+        if op in ("!=", "<>"):
+            return left != right
+        if left is None or right is None:
+            return False
+        return {
+            ">": left > right, "<": left < right, ">=": left >= right, "<=": left <= right
+        }[op]
+
+    raise ValueError(f"Unsupported predicate for InMemoryContainer: {predicate}")
+
+
+class FakeRegions:
+    """
+    Simulated Cosmos DB regions with their own latency and outages.
+
+    Serves as the probe of a RegionHealthMonitor and, passed as the latency
+    of InMemoryContainers, routes their operations to the region the
+    monitor currently ranks first:
+
+        regions = FakeRegions({"West Europe": LatencyProfile(15), "East US": LatencyProfile(90)})
+        monitor = RegionHealthMonitor(list(regions.regions), probe=regions.probe, interval=0.5)
+        monitor.on_change(regions.route)
+        container = InMemoryContainer("conversations", "/id", latency=regions)
+
+    Attributes:
+        regions (Dict[str, LatencyProfile]): Latency model per region
+        active (str): Region receiving container operations
+        outages (set): Regions currently failing every call
+        error_status (int): HTTP status code of calls to a region in outage
+        stats (CallStats): Probes and operations per region
+    """
+
+    def __init__(self, regions: Dict[str, LatencyProfile], error_status: int = 503) -> None:
+        self.regions = regions
+        self.active = next(iter(regions))
+        self.outages: set = set()
+        self.error_status = error_status
+        self.stats = CallStats()
+
+    def set_outage(self, region: str, down: bool = True) -> None:
+        """Start or end an outage of a region."""
+        if down:
+            self.outages.add(region)
+        else:
+            self.outages.discard(region)
+
+    def route(self, ranking: List[str]) -> None:
+        """Send container operations to the first region of a ranking."""
+        self.active = ranking[0]
+
+    def probe(self, region: str) -> float:
+        """Return the latency of one call to a region, raising if it is down."""
+        start = time.perf_counter()
+        failed = self.regions[region].block() or region in self.outages
+        self.stats.record(f"probe:{region}", failed)
+        if failed:
+            raise ConnectionError(f"Region {region} is unavailable")
+        return time.perf_counter() - start
+
+    def block(self) -> bool:
+        """LatencyProfile interface: sleep for the active region; True if the call fails."""
+        region = self.active
+        failed = self.regions[region].block() or region in self.outages
+        self.stats.record(region, failed)
+        return failed
+
+
+def build_conversations_client(
+    container: InMemoryContainer,
+    partition_key: str = "partition_key",
+    context_container: Optional[InMemoryContainer] = None,
+) -> Any:
+    """
+    Build an AzureCosmosClass bound to an in-memory container.
+
+    Args:
+        container (InMemoryContainer): Container with partition key path "/<partition_key>"
+        partition_key (str): Partition key property name
+        context_container (Optional[InMemoryContainer]): Container with partition key
+            path "/id" to store retrieval context by reference
+
+    Returns:
+        AzureCosmosClass: Conversations client that never touches the network
+    """
+    from cosmos_db import AzureCosmosClass, CosmosContextStore
+
+    client = AzureCosmosClass.__new__(AzureCosmosClass)
+    client.partition_key = partition_key
+    client.container_object = container
+    if context_container is not None:
+        client.context_store = CosmosContextStore(context_container)
+    return client
+
+
+def build_data_layer(
+    threads: InMemoryContainer,
+    steps: InMemoryContainer,
+    conversations: Any,
+    archive: Optional[InMemoryContainer] = None,
+    legacy_steps: Optional[InMemoryContainer] = None,
+) -> Any:
+    """
+    Build a CustomDataLayer bound to in-memory containers.
+
+    Steps are treated as partitioned by thread when the steps container's
+    partition key path is "/threadId".
+
+    Args:
+        threads (InMemoryContainer): Threads container
+        steps (InMemoryContainer): Steps container
+        conversations (Any): Conversation store (see build_conversations_client)
+        archive (Optional[InMemoryContainer]): Archive container for the lifecycle policy
+        legacy_steps (Optional[InMemoryContainer]): Legacy steps container for the "dual" layout
+
+    Returns:
+        CustomDataLayer: Data layer that never touches the network
+    """
+    from data_layer import CosmosThreadStore, CustomDataLayer
+
+    thread_store = CosmosThreadStore(
+        threads,
+        steps,
+        archive,
+        legacy_steps_container=legacy_steps,
+        steps_by_thread=steps.partition_key_path == "/threadId",
+    )
+    return CustomDataLayer(thread_store=thread_store, conversations=conversations)
+
+
+# ---------------------------------------------------------------------------
+# Databricks serving endpoint
+# ---------------------------------------------------------------------------
+
+class FakeServingEndpoint:
+    """
+    DatabricksServingClient stand-in returning canned chat completions.
+
+    Attributes:
+        latency (LatencyProfile): Latency and failure model
+        answer_fn (Callable[[List[Dict[str, str]]], str]): Builds the answer from the messages
+        stats (CallStats): Call counters
+    """
+
+    def __init__(
+        self,
+        latency: Optional[LatencyProfile] = None,
+        answer_fn: Optional[Callable[[List[Dict[str, str]]], str]] = None,
+        context_bytes: int = 0,
+    ) -> None:
+        self.latency = latency or LatencyProfile()
+        self.answer_fn = answer_fn or (lambda messages: f"Answer to: {messages[-1]['content']}")
+        self.context_bytes = context_bytes
+        self.stats = CallStats()
+
+    def _context(self, query: str) -> str:
+        if not self.context_bytes:
+            return "benchmark context"
+        # The same question retrieves the same passages, as with a real retriever
+        passage = f"Passage retrieved for {query}. "
+        return (passage * (self.context_bytes // len(passage) + 1))[:self.context_bytes]
+
+    def _response(self, endpoint: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        messages = inputs["messages"]
+        return {
+            "messages": [{"role": "assistant", "content": self.answer_fn(messages)}],
+            "custom_outputs": {
+                "context": self._context(messages[-1]["content"]),
+                "rephrased_query": messages[-1]["content"],
+                "check_query": "",
+            },
+            "databricks_output": {"databricks_request_id": f"bench-{random.getrandbits(48):012x}"},
+        }
+
+    def _error(self, endpoint: str) -> ServingEndpointError:
+        return ServingEndpointError(
+            f"Injected failure calling serving endpoint '{endpoint}'",
+            status_code=self.latency.error_status,
+        )
+
+    def predict(self, endpoint: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        failed = self.latency.block()
+        self.stats.record("predict", failed)
+        if failed:
+            raise self._error(endpoint)
+        return self._response(endpoint, inputs)
+
+    async def apredict(self, endpoint: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        failed = await self.latency.wait()
+        self.stats.record("apredict", failed)
+        if failed:
+            raise self._error(endpoint)
+        return self._response(endpoint, inputs)
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Speech and translation
+# ---------------------------------------------------------------------------
+
+class FakeSpeechService:
+    """
+    Stand-in for speech_recognition.recognize_from_file.
+
+    Like the real function it blocks the calling thread for the request.
+
+    Attributes:
+        latency (LatencyProfile): Latency and failure model
+        transcripts (List[str]): Transcripts returned in rotation
+    """
+
+    def __init__(self, latency: Optional[LatencyProfile] = None, transcripts: Optional[List[str]] = None) -> None:
+        self.latency = latency or LatencyProfile()
+        self.transcripts = transcripts or ["What are your opening hours?"]
+        self.stats = CallStats()
+        self._next = 0
+
+    def recognize_from_file(self, filename: str) -> str:
+        failed = self.latency.block()
+        self.stats.record("recognize_from_file", failed)
+        if failed:
+            # The real function reports failures as an "Error: ..." string
+            return f"Error: injected failure ({self.latency.error_status})"
+        transcript = self.transcripts[self._next % len(self.transcripts)]
+        self._next += 1
+        return transcript
+
+
+class FakeTranslator:
+    """
+    Stand-in for translation_helper.AsyncTranslatorClient.
+
+    Translations are the source text prefixed with the target language.
+
+    Attributes:
+        latency (LatencyProfile): Latency and failure model per request
+    """
+
+    def __init__(self, latency: Optional[LatencyProfile] = None) -> None:
+        self.latency = latency or LatencyProfile()
+        self.stats = CallStats()
+
+    async def translate_batch(
+        self,
+        texts: List[str],
+        target_languages: List[str],
+        source_language: Optional[str] = "en",
+    ) -> List[Dict[str, str]]:
+        from translation_helper import TranslationError
+
+        failed = await self.latency.wait()
+        self.stats.record("translate_batch", failed)
+        if failed:
+            raise TranslationError(f"Injected translator failure ({self.latency.error_status})")
+        return [{lang: f"[{lang}] {text}" for lang in target_languages} for text in texts]
+
+    async def translate(
+        self, text: str, target_languages: List[str], source_language: Optional[str] = "en"
+    ) -> Dict[str, str]:
+        return (await self.translate_batch([text], target_languages, source_language))[0]
+
+    async def aclose(self) -> None:
+        pass
@@ -0,0 +1,484 @@
+"""
+Offline load test for the Copilot UI chat handlers.
+
+Simulates N concurrent Chainlit sessions sending text and voice turns
+through the real handlers in app.py (on_message, on_audio_* and
+get_response), with Cosmos DB, the Databricks serving endpoint, speech
+recognition and translation replaced by the in-process fakes in
+benchmarks/fakes.py. Reports per-turn latency percentiles, throughput,
+event-loop lag and the state of the admission, breaker and cache layers.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test --sessions 50 --turns 10
+    python -m benchmarks.load_test --audio-ratio 0.3 --endpoint-ms 800 --endpoint-errors 0.05
+    python -m benchmarks.load_test --language es --json results.json
+    python -m benchmarks.load_test --baseline results.json
+    python -m benchmarks.load_test --storage sqlite
+    python -m benchmarks.load_test --faq-entries 10
+    python -m benchmarks.load_test --context-bytes 8000 --context-dedup
+    python -m benchmarks.load_test --regions "West Europe=15,East US=90" --region-outage-after 2
+
+Turn latency is measured around the handler call, so it includes admission
+queueing and everything the handler awaits.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import (  # noqa: E402
+    FakeRegions,
+    FakeServingEndpoint,
+    FakeSpeechService,
+    FakeTranslator,
+    InMemoryContainer,
+    LatencyProfile,
+    build_conversations_client,
+    build_data_layer,
+)
+
+# Placeholders so app.py and data_layer.py pass their environment validation;
+# no request ever reaches these hosts
+BENCHMARK_ENV_DEFAULTS = {
+    "CHATBOT_NAME": "benchmark",
+    "WELCOME_MESSAGE": "Welcome to the benchmark",
+    "LANGUAGE": "en",
+    "SERVING_ENDPOINT_NAME": "benchmark",
+    "COSMOS_DB_HOST": "https://localhost:8081",
+    "COSMOS_DB_KEY": "benchmark",
+    "CHAINLIT_COSMOS_DB_NAME": "benchmark",
+    "CHAINLIT_THREADS_CONTAINER": "threads",
+    "CHAINLIT_STEPS_CONTAINER": "steps",
+    "CHAINLIT_COSMOS_PARTITION_KEY": "/id",
+}
+
+CONVERSATIONS_PARTITION_KEY = "partition_key"
+AUDIO_SAMPLE_RATE = 24000
+AUDIO_CHUNK_MS = 100
+
+QUESTIONS = [
+    "What are your opening hours?",
+    "How do I reset my password?",
+    "Where can I download my invoice?",
+    "How do I change my delivery address?",
+    "Can I cancel my order?",
+    "What payment methods do you accept?",
+    "How long does shipping take?",
+    "How do I contact support?",
+    "Do you ship internationally?",
+    "How do I return a product?",
+]
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of the samples, or None if there are none."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Summarize latency samples (seconds) in milliseconds."""
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "count": len(samples),
+        "p50_ms": ms(percentile(samples, 50)),
+        "p95_ms": ms(percentile(samples, 95)),
+        "p99_ms": ms(percentile(samples, 99)),
+        "max_ms": ms(max(samples) if samples else None),
+    }
+
+
+def install_fakes(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Replace every external dependency of app.py with a fake, then import app.
+
+    Must run before app.py is imported anywhere in the process.
+
+    Args:
+        args (argparse.Namespace): Parsed command line options
+
+    Returns:
+        Dict[str, Any]: The fakes and the imported app module
+    """
+    for key, value in BENCHMARK_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    if args.language:
+        # Localization only runs when a translator is configured
+        os.environ.setdefault("AZURE_TRANSLATE_API_ENDPOINT", "https://localhost")
+        os.environ.setdefault("AZURE_TRANSLATE_API_KEY", "benchmark")
+
+    rng = random.Random(args.seed)
+
+    def profile(mean_ms: float, errors: float) -> LatencyProfile:
+        return LatencyProfile(
+            mean_ms=mean_ms,
+            jitter_ms=mean_ms * args.jitter,
+            error_rate=errors,
+            rng=random.Random(rng.random()),
+        )
+
+    cosmos_latency = profile(args.cosmos_ms, args.cosmos_errors)
+    regions = region_monitor = None
+    if args.regions:
+        # Containers follow the region the monitor ranks first
+        from region_routing import RegionHealthMonitor
+
+        regions = FakeRegions({
+            name.strip(): profile(float(ms), args.cosmos_errors)
+            for name, _, ms in (entry.partition("=") for entry in args.regions.split(","))
+        })
+        region_monitor = RegionHealthMonitor(
+            list(regions.regions), probe=regions.probe, interval=args.region_probe_ms / 1000
+        )
+        region_monitor.on_change(regions.route)
+        cosmos_latency = regions
+    conversations = InMemoryContainer(
+        "conversations", f"/{CONVERSATIONS_PARTITION_KEY}", cosmos_latency
+    )
+    threads = InMemoryContainer("threads", "/id", cosmos_latency)
+    steps = InMemoryContainer(
+        "steps", "/threadId" if args.steps_layout == "thread" else "/id", cosmos_latency
+    )
+    archive = InMemoryContainer("archive", "/id", cosmos_latency)
+    endpoint = FakeServingEndpoint(
+        profile(args.endpoint_ms, args.endpoint_errors), context_bytes=args.context_bytes
+    )
+    speech = FakeSpeechService(profile(args.speech_ms, args.speech_errors), list(QUESTIONS))
+    translator = FakeTranslator(profile(args.translate_ms, args.translate_errors))
+
+    import startup
+    import serving_client
+    import translation_helper
+    import speech_recognition
+
+    containers = {"conversations": conversations, "threads": threads, "steps": steps, "archive": archive}
+    if args.storage == "sqlite":
+        # The embedded backend replaces the Cosmos DB stand-ins entirely
+        from storage import SQLiteContextStore, SQLiteStorage
+        from data_layer import CustomDataLayer
+
+        sqlite_storage = SQLiteStorage(os.path.join(tempfile.mkdtemp(), "benchmark.db"))
+        if args.context_dedup:
+            sqlite_storage.context_store = SQLiteContextStore(sqlite_storage)
+        conversations_client = sqlite_storage
+        data_layer = CustomDataLayer(thread_store=sqlite_storage, conversations=sqlite_storage)
+        containers = {}
+    else:
+        contexts = None
+        if args.context_dedup:
+            contexts = InMemoryContainer("contexts", "/id", cosmos_latency)
+            containers["contexts"] = contexts
+        conversations_client = build_conversations_client(
+            conversations, CONVERSATIONS_PARTITION_KEY, contexts
+        )
+        data_layer = build_data_layer(threads, steps, conversations_client, archive)
+    startup.warm_up.provide("conversations", conversations_client)
+    startup.warm_up.provide("data_layer", data_layer)
+    serving_client._serving_client = endpoint
+    translation_helper._translator = translator
+    speech_recognition.recognize_from_file = speech.recognize_from_file
+
+    import app
+
+    return {
+        "app": app,
+        "containers": containers,
+        "endpoint": endpoint,
+        "speech": speech,
+        "translator": translator,
+        "context_store": conversations_client.context_store,
+        "regions": regions,
+        "region_monitor": region_monitor,
+    }
+
+
+class Recorder:
+    """Collects per-turn latencies by input type."""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {"text": [], "audio": []}
+        self.failures: Dict[str, int] = {"text": 0, "audio": 0}
+
+    def record(self, kind: str, seconds: float, failed: bool = False) -> None:
+        self.latencies[kind].append(seconds)
+        if failed:
+            self.failures[kind] += 1
+
+
+def build_question_pool(distinct: int) -> List[str]:
+    """Build `distinct` different questions from the QUESTIONS templates."""
+    return [
+        QUESTIONS[i % len(QUESTIONS)] + ("" if i < len(QUESTIONS) else f" (#{i})")
+        for i in range(distinct)
+    ]
+
+
+def pick_question(rng: random.Random, pool: List[str]) -> str:
+    """Pick a question with a skewed (Zipf-like) popularity distribution."""
+    return rng.choices(pool, weights=[1 / (rank + 1) for rank in range(len(pool))])[0]
+
+
+async def text_turn(app: Any, question: str) -> None:
+    import chainlit as cl
+
+    await app.on_message(cl.Message(content=question, author="You", type="user_message"))
+
+
+async def audio_turn(app: Any, seconds: float) -> None:
+    import chainlit as cl
+
+    samples_per_chunk = AUDIO_SAMPLE_RATE * AUDIO_CHUNK_MS // 1000
+    chunk = bytes(samples_per_chunk * 2)  # 16-bit mono silence
+    await app.on_audio_start()
+    for index in range(max(1, int(seconds * 1000 / AUDIO_CHUNK_MS))):
+        await app.on_audio_chunk(cl.InputAudioChunk(
+            isStart=index == 0,
+            mimeType="pcm16",
+            elapsedTime=index * AUDIO_CHUNK_MS,
+            data=chunk,
+        ))
+    await app.on_audio_end()
+
+
+async def run_session(
+    index: int, args: argparse.Namespace, app: Any, questions: List[str], recorder: Recorder
+) -> None:
+    """Drive one simulated Chainlit session through its turns."""
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    rng = random.Random(args.seed * 7919 + index)
+    # Each session task gets its own Chainlit context (and user_session)
+    init_http_context(client_type="webapp")
+    await app.on_chat_start()
+    if args.language:
+        cl.user_session.set("language", args.language)
+
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+    for _ in range(args.turns):
+        kind = "audio" if rng.random() < args.audio_ratio else "text"
+        start = time.perf_counter()
+        failed = False
+        try:
+            if kind == "audio":
+                await audio_turn(app, args.audio_seconds)
+            else:
+                await text_turn(app, pick_question(rng, questions))
+        except Exception:
+            failed = True
+        recorder.record(kind, time.perf_counter() - start, failed)
+        if args.think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+    await app.on_chat_end()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the load test and return the report."""
+    fakes = install_fakes(args)
+    app = fakes["app"]
+
+    from admission import admission_controller
+    from resilience import endpoint_guard, fallback_answers
+    from singleflight import endpoint_flights
+    from localization import translation_cache
+    from loop_monitor import LoopMonitor
+    from audio_pool import audio_pool
+    from faq_index import FAQIndex, set_faq_index
+
+    # Samples the lag distribution and, with a threshold, reports where the loop is blocked
+    monitor = LoopMonitor(
+        interval=args.lag_interval_ms / 1000,
+        threshold=args.blocking_threshold_ms / 1000 if args.blocking_threshold_ms else None,
+        keep_samples=True,
+    )
+    monitor.start()
+
+    questions = build_question_pool(args.distinct_questions)
+    faq_index = None
+    if args.faq_entries:
+        # Index the most popular questions with the answers the endpoint would give
+        answer_fn = fakes["endpoint"].answer_fn
+        faq_index = FAQIndex([
+            {"question": question, "answer": answer_fn([{"role": "user", "content": question}])}
+            for question in questions[:args.faq_entries]
+        ])
+    set_faq_index(faq_index)
+    recorder = Recorder()
+    regions, region_monitor = fakes["regions"], fakes["region_monitor"]
+    outage = None
+    if region_monitor is not None:
+        region_monitor.start()
+        if args.region_outage_after is not None:
+            # The first configured region goes down mid-run
+            outage = asyncio.get_running_loop().call_later(
+                args.region_outage_after, regions.set_outage, region_monitor.regions[0]
+            )
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(i, args, app, questions, recorder) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    if region_monitor is not None:
+        if outage is not None:
+            outage.cancel()
+        region_monitor.stop()
+    monitor.stop()
+
+    turns = sum(len(samples) for samples in recorder.latencies.values())
+    return {
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("json", "baseline")
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "turns": turns,
+        "throughput_turns_per_second": round(turns / elapsed, 2) if elapsed else None,
+        "latency": {
+            "all": summarize(recorder.latencies["text"] + recorder.latencies["audio"]),
+            "text": summarize(recorder.latencies["text"]),
+            "audio": summarize(recorder.latencies["audio"]),
+        },
+        "handler_failures": recorder.failures,
+        "event_loop_lag": summarize(monitor.samples),
+        "blocking_calls": monitor.stats() if monitor.threshold is not None else None,
+        "components": {
+            "admission": admission_controller.stats(),
+            "audio_pool": audio_pool.stats(),
+            "faq_index": faq_index.stats() if faq_index is not None else None,
+            "context_store": (
+                fakes["context_store"].stats() if fakes["context_store"] is not None else None
+            ),
+            "endpoint_guard": endpoint_guard.stats(),
+            "single_flight": {
+                "leader_calls": endpoint_flights.leader_calls,
+                "shared_calls": endpoint_flights.shared_calls,
+            },
+            "fallback_answers": {"hits": fallback_answers.hits, "misses": fallback_answers.misses},
+            "translation_cache": {"hits": translation_cache.hits, "misses": translation_cache.misses},
+            "region_monitor": region_monitor.stats() if region_monitor is not None else None,
+        },
+        "fakes": {
+            **{name: c.stats.as_dict() for name, c in fakes["containers"].items()},
+            "endpoint": fakes["endpoint"].stats.as_dict(),
+            "speech": fakes["speech"].stats.as_dict(),
+            "translator": fakes["translator"].stats.as_dict(),
+            **({"regions": regions.stats.as_dict()} if regions is not None else {}),
+        },
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """Print a human-readable summary, with deltas against a baseline if given."""
+    def delta(path: List[str]) -> str:
+        if baseline is None:
+            return ""
+        old, new = baseline, report
+        for key in path:
+            old, new = (old or {}).get(key), (new or {}).get(key)
+        if not old or new is None:
+            return ""
+        return f"  ({(new - old) / old * 100:+.1f}%)"
+
+    print(f"\nTurns: {report['turns']} in {report['elapsed_seconds']}s "
+          f"-> {report['throughput_turns_per_second']} turns/s"
+          f"{delta(['throughput_turns_per_second'])}")
+    print(f"{'latency (ms)':<16}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    rows = [(f"turn/{kind}", ["latency", kind]) for kind in ("all", "text", "audio")]
+    rows.append(("event loop lag", ["event_loop_lag"]))
+    for label, path in rows:
+        stats = report
+        for key in path:
+            stats = stats[key]
+        if not stats["count"]:
+            continue
+        print(f"{label:<16}{stats['count']:>8}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['max_ms']:>10}{delta(path + ['p95_ms'])}")
+    if report.get("blocking_calls"):
+        print(f"\nBlocking call sites: {json.dumps(report['blocking_calls']['call_sites'])}")
+    print("\nComponents:")
+    for name, stats in report["components"].items():
+        print(f"  {name}: {json.dumps(stats, default=str)}")
+    print("Fake dependency calls:")
+    for name, stats in report["fakes"].items():
+        print(f"  {name}: {json.dumps(stats)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test for the chat handlers")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per session")
+    parser.add_argument("--audio-ratio", type=float, default=0.2, help="Fraction of voice turns")
+    parser.add_argument("--audio-seconds", type=float, default=3.0, help="Length of each recording")
+    parser.add_argument("--distinct-questions", type=int, default=50,
+                        help="Size of the question pool (popularity is Zipf-like)")
+    parser.add_argument("--language", default=None,
+                        help="Session language; a non-source language exercises translation")
+    parser.add_argument("--think-ms", type=float, default=200, help="Mean pause between turns")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="Seconds over which sessions start")
+    parser.add_argument("--jitter", type=float, default=0.25,
+                        help="Latency standard deviation as a fraction of the mean")
+    parser.add_argument("--faq-entries", type=int, default=0,
+                        help="Answer this many of the most popular questions from a local FAQ index")
+    parser.add_argument("--context-bytes", type=int, default=0,
+                        help="Size of the retrieved context per answer (0: a short placeholder)")
+    parser.add_argument("--context-dedup", action="store_true",
+                        help="Store retrieved context by reference (see context_store.py)")
+    parser.add_argument("--steps-layout", choices=["legacy", "thread"], default="legacy",
+                        help="Partition steps by step id (legacy) or by thread id")
+    parser.add_argument("--storage", choices=["cosmos", "sqlite"], default="cosmos",
+                        help="Storage backend: in-memory Cosmos DB stand-in or embedded SQLite")
+    parser.add_argument("--cosmos-ms", type=float, default=15)
+    parser.add_argument("--regions", default=None,
+                        help='Simulated Cosmos DB regions as "name=ms,..." in preference order')
+    parser.add_argument("--region-probe-ms", type=float, default=250,
+                        help="Interval between region probes")
+    parser.add_argument("--region-outage-after", type=float, default=None,
+                        help="Take the first region down after this many seconds")
+    parser.add_argument("--cosmos-errors", type=float, default=0.0)
+    parser.add_argument("--endpoint-ms", type=float, default=1500)
+    parser.add_argument("--endpoint-errors", type=float, default=0.0)
+    parser.add_argument("--speech-ms", type=float, default=700)
+    parser.add_argument("--speech-errors", type=float, default=0.0)
+    parser.add_argument("--translate-ms", type=float, default=120)
+    parser.add_argument("--translate-errors", type=float, default=0.0)
+    parser.add_argument("--lag-interval-ms", type=float, default=10)
+    parser.add_argument("--blocking-threshold-ms", type=float, default=50,
+                        help="Report call sites blocking the loop longer than this (0 disables)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING", help="Application log level during the run")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --json report")
+    args = parser.parse_args()
+
+    # The application logs every turn at INFO; keep the benchmark output readable
+    logging.disable(getattr(logging, args.log_level.upper()) - 1)
+
+    report = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
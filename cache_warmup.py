@@ -0,0 +1,231 @@
+"""
+Warm start for the answer caches from historical conversations.
+
+After a deploy the fallback answer cache and the local FAQ index start
+cold, although the conversations container already records every answered
+question with its context and feedback vote. This job scans the
+conversations in parallel (one worker per feed range), picks questions
+that are asked often and whose answers were rated positively, and preloads
+them into:
+- resilience.fallback_answers, served when the endpoint is unavailable
+- the local FAQ index, when FAQ_INDEX_ENABLED is set
+
+The selection is written to a snapshot file. Later restarts load the
+snapshot instead of scanning while it is younger than
+CACHE_WARMUP_MAX_AGE_SECONDS. Refresh it offline with:
+
+    python cache_warmup.py --refresh
+
+Configuration:
+    CACHE_WARMUP_ENABLED: "true" to warm the caches at startup (default "false")
+    CACHE_WARMUP_SNAPSHOT_PATH: Snapshot file (default "cache_snapshot.json")
+    CACHE_WARMUP_MAX_AGE_SECONDS: Snapshot age before a rescan (default 86400)
+    CACHE_WARMUP_MIN_COUNT: Times a question must have been asked (default 2)
+    CACHE_WARMUP_MIN_POSITIVE: Net up votes an answer needs (default 1)
+    CACHE_WARMUP_TOP_N: Maximum number of questions preloaded (default 500)
+    CACHE_WARMUP_WORKERS: Parallel scan workers (default 8)
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from utils import setup_logger
+from singleflight import normalize_text
+from faq_index import FAQ_INDEX_ENABLED, FAQIndex, QuestionTally, get_faq_index, set_faq_index
+
+logger = setup_logger("cache_warmup")
+
+CACHE_WARMUP_ENABLED = os.getenv("CACHE_WARMUP_ENABLED", "false").lower() in ("1", "true", "yes")
+CACHE_WARMUP_SNAPSHOT_PATH = os.getenv("CACHE_WARMUP_SNAPSHOT_PATH", "cache_snapshot.json")
+CACHE_WARMUP_MAX_AGE_SECONDS = float(os.getenv("CACHE_WARMUP_MAX_AGE_SECONDS", "86400"))
+CACHE_WARMUP_MIN_COUNT = int(os.getenv("CACHE_WARMUP_MIN_COUNT", "2"))
+CACHE_WARMUP_MIN_POSITIVE = int(os.getenv("CACHE_WARMUP_MIN_POSITIVE", "1"))
+CACHE_WARMUP_TOP_N = int(os.getenv("CACHE_WARMUP_TOP_N", "500"))
+CACHE_WARMUP_WORKERS = int(os.getenv("CACHE_WARMUP_WORKERS", "8"))
+
+
+def scan_conversations(conversations: Any, workers: int = CACHE_WARMUP_WORKERS) -> QuestionTally:
+    """
+    Tally answered questions across all conversations, one worker per partition.
+
+    Args:
+        conversations (ConversationStore): Store to scan
+        workers (int): Maximum parallel scans
+
+    Returns:
+        QuestionTally: Merged tally
+    """
+    partitions = conversations.conversation_partitions()
+
+    def scan(partition: Any) -> QuestionTally:
+        tally = QuestionTally()
+        for conversation in conversations.iter_conversations(partition):
+            tally.add(conversation)
+        return tally
+
+    start = time.perf_counter()
+    merged = QuestionTally()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(partitions)))) as pool:
+        for tally in pool.map(scan, partitions):
+            merged.merge(tally)
+    logger.info(
+        "Scanned %s partitions in %.1f ms: %s distinct questions",
+        len(partitions), (time.perf_counter() - start) * 1000, len(merged.asked)
+    )
+    return merged
+
+
+def select_entries(
+    tally: QuestionTally,
+    min_count: int = CACHE_WARMUP_MIN_COUNT,
+    min_positive: int = CACHE_WARMUP_MIN_POSITIVE,
+    top_n: int = CACHE_WARMUP_TOP_N,
+) -> List[Dict[str, Any]]:
+    """Pick the frequent, positively rated questions to preload."""
+    return tally.entries(min_count=min_count, min_positive=min_positive, limit=top_n)
+
+
+def resolve_contexts(entries: List[Dict[str, Any]], conversations: Any) -> List[Dict[str, Any]]:
+    """Fetch the context of entries whose turns saved it by reference."""
+    return [conversations.hydrate_message(entry) for entry in entries]
+
+
+def write_snapshot(entries: List[Dict[str, Any]], path: str = CACHE_WARMUP_SNAPSHOT_PATH) -> None:
+    """
+    Write selected entries to the snapshot file atomically.
+
+    Args:
+        entries (List[Dict[str, Any]]): Entries from select_entries
+        path (str): Snapshot file
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": 1, "created_at": datetime.now(timezone.utc).isoformat(), "entries": entries},
+            f, ensure_ascii=False
+        )
+    os.replace(tmp_path, path)
+    logger.info("Wrote cache snapshot with %s entries to %s", len(entries), path)
+
+
+def read_snapshot(
+    path: str = CACHE_WARMUP_SNAPSHOT_PATH, max_age: float = CACHE_WARMUP_MAX_AGE_SECONDS
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Read the snapshot file if it exists and is fresh enough.
+
+    Args:
+        path (str): Snapshot file
+        max_age (float): Maximum age in seconds
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: Snapshot entries, or None to rescan
+    """
+    try:
+        if time.time() - os.path.getmtime(path) > max_age:
+            logger.info("Cache snapshot %s is stale", path)
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["entries"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Ignoring unreadable cache snapshot %s: %s", path, e)
+        return None
+
+
+def endpoint_response(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the endpoint-shaped response stored in the fallback cache for an entry."""
+    return {
+        "messages": [{"role": "assistant", "content": entry["answer"]}],
+        "custom_outputs": {
+            "context": entry.get("context") or "",
+            "rephrased_query": entry.get("rephrased_query", ""),
+        },
+        "databricks_output": {},
+    }
+
+
+def preload(entries: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Load entries into the fallback answer cache and the local FAQ index.
+
+    Entries already in the FAQ index (curated or built offline) keep their answers.
+
+    Args:
+        entries (List[Dict[str, Any]]): Entries from select_entries or a snapshot
+
+    Returns:
+        Dict[str, int]: Number of entries loaded per cache
+    """
+    from resilience import fallback_answers
+
+    # Least asked first, so the most asked questions are the most recently used
+    for entry in reversed(entries):
+        fallback_answers.put(normalize_text(entry["question"]), endpoint_response(entry))
+    loaded = {"fallback_answers": len(entries), "faq_index": 0}
+
+    if FAQ_INDEX_ENABLED:
+        index = get_faq_index()
+        existing = index.entries if index is not None else []
+        known = {normalize_text(entry["question"]) for entry in existing}
+        added = [entry for entry in entries if normalize_text(entry["question"]) not in known]
+        if added:
+            set_faq_index(FAQIndex(existing + added))
+        loaded["faq_index"] = len(added)
+    return loaded
+
+
+def warm_caches(conversations: Any, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Preload the caches from the snapshot, or from a scan when it is missing or stale.
+
+    Failures are logged and reported rather than raised: a cold cache only
+    costs latency.
+
+    Args:
+        conversations (ConversationStore): Store to scan
+        refresh (bool): Scan even if a fresh snapshot exists
+
+    Returns:
+        Dict[str, Any]: Source ("snapshot" or "scan"), entry count, per-cache counts, or "error"
+    """
+    start = time.perf_counter()
+    try:
+        entries = None if refresh else read_snapshot()
+        source = "snapshot"
+        if entries is None:
+            source = "scan"
+            entries = resolve_contexts(select_entries(scan_conversations(conversations)), conversations)
+            try:
+                write_snapshot(entries)
+            except OSError as e:
+                logger.warning("Could not write cache snapshot: %s", e)
+        loaded = preload(entries)
+        logger.info(
+            "Warmed caches from %s in %.1f ms: %s",
+            source, (time.perf_counter() - start) * 1000, loaded
+        )
+        return {"source": source, "entries": len(entries), **loaded}
+    except Exception as e:
+        logger.error("Cache warm-up failed: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the answer cache snapshot from conversations.")
+    parser.add_argument("--refresh", action="store_true", help="Rescan even if the snapshot is fresh")
+    args = parser.parse_args()
+
+    from storage import create_conversation_store
+
+    print(json.dumps(warm_caches(create_conversation_store(), refresh=args.refresh), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Content-addressed storage for retrieval context.
+
+Every saved turn used to embed the endpoint's full retrieved context and
+comparison details, and popular questions retrieve the same chunks over
+and over, so most conversation bytes were copies of a few blobs. With
+CONTEXT_DEDUP_ENABLED, update_conversation stores each value once under
+the SHA-256 of its content and keeps only a reference on the message:
+
+    {"context": "<40 KB>"}  ->  {"context_ref": "sha256:<digest>"}
+
+Conversation reads (chat history, resume) never need the context, so they
+stop paying for it. Readers that do need it (offline jobs, exports) call
+ConversationStore.hydrate_message, which resolves references through an
+LRU of recently used blobs.
+
+Blobs are JSON-serialized and zlib-compressed above a size threshold.
+They are immutable: a reference always resolves to the same content, so
+writes are idempotent and caching needs no invalidation. Unreferenced
+blobs are not collected.
+
+Backends implement _write and _read: cosmos_db.CosmosContextStore (a
+container partitioned by /id, so every lookup is a point read) and
+storage.SQLiteContextStore.
+
+Configuration:
+    CONTEXT_DEDUP_ENABLED: "true" to store context by reference (default "false")
+    CONTEXT_CONTAINER: Cosmos DB container for context blobs (default "context_blobs")
+    CONTEXT_DEDUP_MIN_BYTES: Smaller values stay inline (default 256)
+    CONTEXT_COMPRESSION: "zlib" (default) or "none"
+    CONTEXT_COMPRESSION_MIN_BYTES: Smaller blobs are stored uncompressed (default 1024)
+    CONTEXT_CACHE_SIZE: Blobs kept in memory (default 1024)
+"""
+
+import os
+import json
+import zlib
+import base64
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from utils import setup_logger
+from metrics import registry
+
+logger = setup_logger("context_store")
+
+CONTEXT_DEDUP_ENABLED = os.getenv("CONTEXT_DEDUP_ENABLED", "false").lower() in ("1", "true", "yes")
+CONTEXT_CONTAINER = os.getenv("CONTEXT_CONTAINER", "context_blobs")
+CONTEXT_DEDUP_MIN_BYTES = int(os.getenv("CONTEXT_DEDUP_MIN_BYTES", "256"))
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "zlib").lower()
+CONTEXT_COMPRESSION_MIN_BYTES = int(os.getenv("CONTEXT_COMPRESSION_MIN_BYTES", "1024"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "1024"))
+
+CONTEXT_BLOB_PUTS = registry.counter(
+    "context_blob_puts_total",
+    "Context values saved by reference, by result (written, duplicate)",
+    ["result"],
+)
+
+# Message fields stored by reference, as "<field>_ref"
+CONTEXT_FIELDS = ("context", "comparison_details")
+_REF_PREFIX = "sha256:"
+
+
+def encode_blob(ref: str, serialized: str) -> Dict[str, Any]:
+    """
+    Build the stored document of a blob.
+
+    Args:
+        ref (str): Blob reference
+        serialized (str): JSON-serialized value
+
+    Returns:
+        Dict[str, Any]: Document with "id", "encoding", "data" and "size"
+    """
+    raw = serialized.encode("utf-8")
+    if CONTEXT_COMPRESSION == "zlib" and len(raw) >= CONTEXT_COMPRESSION_MIN_BYTES:
+        data, encoding = base64.b64encode(zlib.compress(raw, 6)).decode("ascii"), "zlib"
+    else:
+        data, encoding = serialized, "plain"
+    return {"id": ref, "encoding": encoding, "data": data, "size": len(raw)}
+
+
+def decode_blob(document: Dict[str, Any]) -> Any:
+    """Return the value stored in a blob document."""
+    if document["encoding"] == "zlib":
+        serialized = zlib.decompress(base64.b64decode(document["data"])).decode("utf-8")
+    else:
+        serialized = document["data"]
+    return json.loads(serialized)
+
+
+class ContextStore(ABC):
+    """
+    Immutable blobs keyed by content hash, with an LRU of recently used values.
+
+    The LRU also records which blobs are known to be stored, so putting a
+    popular context again costs no write.
+
+    Attributes:
+        cache_size (int): Maximum number of cached values
+        writes (int): Blobs written to the backend
+        duplicates (int): Puts of a value that was already stored
+        hits (int): Reads served from the cache
+        misses (int): Reads that went to the backend
+    """
+
+    def __init__(self, cache_size: int = CONTEXT_CACHE_SIZE) -> None:
+        self.cache_size = cache_size
+        self.writes = 0
+        self.duplicates = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _write(self, document: Dict[str, Any]) -> bool:
+        """Store a blob document unless it exists; return False if it already existed."""
+
+    @abstractmethod
+    def _read(self, ref: str) -> Optional[Dict[str, Any]]:
+        """Return a blob document, or None if it does not exist."""
+
+    def _remember(self, ref: str, value: Any) -> None:
+        with self._lock:
+            self._cache[ref] = value
+            self._cache.move_to_end(ref)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def put(self, value: Any) -> str:
+        """
+        Store a value once and return its reference.
+
+        Args:
+            value (Any): JSON-serializable value
+
+        Returns:
+            str: Reference ("sha256:<hex digest>")
+        """
+        serialized = json.dumps(value, ensure_ascii=False, sort_keys=True)
+        ref = _REF_PREFIX + hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+        with self._lock:
+            known = ref in self._cache
+            if known:
+                self._cache.move_to_end(ref)
+        if known or not self._write(encode_blob(ref, serialized)):
+            self.duplicates += 1
+            CONTEXT_BLOB_PUTS.inc(result="duplicate")
+        else:
+            self.writes += 1
+            CONTEXT_BLOB_PUTS.inc(result="written")
+        self._remember(ref, value)
+        return ref
+
+    def get(self, ref: str) -> Any:
+        """
+        Return the value of a reference.
+
+        Args:
+            ref (str): Reference returned by put
+
+        Returns:
+            Any: Stored value
+
+        Raises:
+            KeyError: If the blob does not exist
+        """
+        with self._lock:
+            if ref in self._cache:
+                self._cache.move_to_end(ref)
+                self.hits += 1
+                return self._cache[ref]
+        self.misses += 1
+        document = self._read(ref)
+        if document is None:
+            raise KeyError(ref)
+        value = decode_blob(document)
+        self._remember(ref, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Return write and cache counters."""
+        return {
+            "writes": self.writes,
+            "duplicates": self.duplicates,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cached": len(self._cache),
+        }
+
+
+def externalize(message: Dict[str, Any], store: ContextStore) -> Dict[str, Any]:
+    """
+    Replace large context fields of a message with references, in place.
+
+    Args:
+        message (Dict[str, Any]): Message about to be saved
+        store (ContextStore): Blob store
+
+    Returns:
+        Dict[str, Any]: The same message
+    """
+    for field in CONTEXT_FIELDS:
+        value = message.get(field)
+        if value is None:
+            continue
+        size = len(value.encode("utf-8")) if isinstance(value, str) else len(json.dumps(value))
+        if size >= CONTEXT_DEDUP_MIN_BYTES:
+            message[f"{field}_ref"] = store.put(value)
+            del message[field]
+    return message
+
+
+def hydrate(message: Dict[str, Any], store: Optional[ContextStore]) -> Dict[str, Any]:
+    """
+    Return a copy of a message with referenced context fields resolved.
+
+    Messages saved inline are returned unchanged. A reference that cannot
+    be resolved yields None for its field rather than failing the reader.
+
+    Args:
+        message (Dict[str, Any]): Stored message
+        store (Optional[ContextStore]): Blob store
+
+    Returns:
+        Dict[str, Any]: Message with "context" and "comparison_details"
+    """
+    refs = [field for field in CONTEXT_FIELDS if f"{field}_ref" in message]
+    if not refs:
+        return message
+    hydrated = dict(message)
+    for field in refs:
+        ref = hydrated.pop(f"{field}_ref")
+        try:
+            hydrated[field] = store.get(ref) if store is not None else None
+        except Exception as e:
+            logger.warning("Could not resolve %s %s: %s", field, ref, e)
+            hydrated[field] = None
+    return hydrated
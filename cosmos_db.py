@@ -1,22 +1,96 @@
 import os
 import json
-from typing import List, Dict, Union, Optional
+import threading
+from typing import Any, Iterator, List, Dict, Tuple, Union, Optional
 from dotenv import load_dotenv
-from azure.cosmos import CosmosClient, PartitionKey
-from azure.cosmos.exceptions import CosmosHttpResponseError
+from azure.cosmos import CosmosClient
+from azure.cosmos.exceptions import (
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError
+)
 import logging
 import time
 import uuid
 from datetime import datetime, timezone
 from utils import setup_logger
+from metrics import record_cosmos_response
+from storage import ConversationStore
+from context_store import CONTEXT_CONTAINER, CONTEXT_DEDUP_ENABLED, ContextStore, externalize
+from lifecycle import lifecycle
+from cosmos_schema import blob_spec, conversations_spec, ensure_container
+from session_tokens import consistency_level, session_tokens
+from region_routing import client_options, region_monitor
 
 # Configure logging
 logging.getLogger("azure").setLevel(logging.WARNING)
 logging.getLogger("azure.cosmos").setLevel(logging.WARNING)
 logger = setup_logger("cosmos_db")
 
+_clients: Dict[Tuple[str, str], CosmosClient] = {}
+_clients_lock = threading.Lock()
 
-class AzureCosmosClass:
+
+def get_cosmos_client(host: str, key: str) -> CosmosClient:
+    """
+    Return the process-wide CosmosClient for an account.
+
+    Creating a CosmosClient fetches account metadata over the network, so
+    every component shares one client (and its connection pool) per account.
+    Every response passes through record_cosmos_response for RU metrics.
+    The consistency level comes from COSMOS_CONSISTENCY_LEVEL (see
+    session_tokens.py); unset, the account default applies. Preferred and
+    write regions come from region_routing.py, whose monitor re-ranks the
+    regions of every client by probe latency.
+
+    Args:
+        host (str): Cosmos DB account endpoint
+        key (str): Cosmos DB account key
+
+    Returns:
+        CosmosClient: Shared client instance
+    """
+    with _clients_lock:
+        client = _clients.get((host, key))
+        if client is None:
+            client = CosmosClient(
+                host,
+                key,
+                consistency_level=consistency_level(),
+                raw_response_hook=record_cosmos_response,
+                **client_options()
+            )
+            region_monitor.attach(client)
+            _clients[(host, key)] = client
+        return client
+
+
+class CosmosContextStore(ContextStore):
+    """Context blobs in a Cosmos DB container partitioned by /id."""
+
+    def __init__(self, container: Any) -> None:
+        """
+        Args:
+            container (ContainerProxy): Blob container with partition key path "/id"
+        """
+        super().__init__()
+        self.container = container
+
+    def _write(self, document: Dict[str, Any]) -> bool:
+        try:
+            self.container.create_item(body=document)
+            return True
+        except CosmosResourceExistsError:
+            return False
+
+    def _read(self, ref: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.container.read_item(item=ref, partition_key=ref)
+        except CosmosResourceNotFoundError:
+            return None
+
+
+class AzureCosmosClass(ConversationStore):
     """
     A class to handle Azure Cosmos DB operations for chat conversations.
 
@@ -25,7 +99,10 @@ class AzureCosmosClass:
     - Create and manage chat conversations
     - Update conversation history
     - Handle user feedback
-    
+
+    Reads of a conversation pass the session token of its last write, so
+    they see it at Session consistency (see session_tokens.py).
+
     Attributes:
         COSMOS_HOST (str): The host URL for Cosmos DB
         COSMOS_MASTER_KEY (str): Authentication key for Cosmos DB
@@ -66,14 +143,17 @@ class AzureCosmosClass:
             self.CONTAINER_ID = os.getenv('CONVERSATIONS_CONTAINER')
 
             # Initialize Cosmos DB client
-            self.client = CosmosClient(self.COSMOS_HOST, self.COSMOS_MASTER_KEY)
+            self.client = get_cosmos_client(self.COSMOS_HOST, self.COSMOS_MASTER_KEY)
             self.database_object = self.client.create_database_if_not_exists(
                 id=self.DATABASE_ID
             )
-            self.container_object = self.database_object.create_container_if_not_exists(
-                id=self.CONTAINER_ID,
-                partition_key=PartitionKey(path=f"/{self.partition_key}")
+            self.container_object = ensure_container(
+                self.database_object, conversations_spec(self.CONTAINER_ID, self.partition_key)
             )
+            if CONTEXT_DEDUP_ENABLED:
+                self.context_store = CosmosContextStore(
+                    ensure_container(self.database_object, blob_spec(CONTEXT_CONTAINER))
+                )
             
         except CosmosHttpResponseError as e:
             logger.error(f"Cosmos DB initialization failed: {str(e)}")
@@ -98,8 +178,11 @@ class AzureCosmosClass:
                 self.partition_key: f"{chat_id}_partkey",
                 "conversation": []
             }
-            self.container_object.create_item(body=conversation_data)
-            logger.info(f"Created new conversation with chat_id: {chat_id}")
+            self.container_object.create_item(
+                body=lifecycle.stamp(conversation_data, "conversations"),
+                **session_tokens.write_options(self.container_object, chat_id)
+            )
+            logger.info("Created new conversation with chat_id: %s", chat_id)
             
         except CosmosHttpResponseError as e:
             logger.error(f"Cosmos DB operation failed: {str(e)}")
@@ -108,47 +191,6 @@ class AzureCosmosClass:
             logger.error(f"Failed to create conversation: {str(e)}")
             raise
 
-    def get_chat_history(self, chat_id: str) -> List[Dict[str, str]]:
-        """
-        Retrieve conversation history for a given chat ID.
-
-        Args:
-            chat_id (str): The conversation identifier
-
-        Returns:
-            List[Dict[str, str]]: List of conversation messages
-
-        Raises:
-            Exception: If retrieval of chat history fails
-        """
-        try:
-            existing_data = self.get_data(chat_id)
-            
-            if not existing_data:
-                self.upload_data(chat_id)
-                return []
-                
-            conversation = existing_data.get('conversation', [])
-            chat_history = []
-            
-            for msg in conversation:
-                if msg.get('user_message'):
-                    chat_history.append({
-                        "role": "user",
-                        "content": msg['user_message']
-                    })
-                if msg.get('ai_answer'):
-                    chat_history.append({
-                        "role": "assistant",
-                        "content": msg['ai_answer']
-                    })
-                    
-            return chat_history
-            
-        except Exception as e:
-            logger.error(f"Failed to retrieve chat history: {str(e)}")
-            raise
-
     def update_conversation(
             self,
             databricks_request_id: str,
@@ -159,7 +201,8 @@ class AzureCosmosClass:
             check_query: str,
             ai_answer: str,
             context: str,
-            comparison_details: Optional[Dict]
+            comparison_details: Optional[Dict],
+            translation: Optional[Dict[str, str]] = None
     ) -> None:
         """
         Updates an existing conversation with new message details.
@@ -174,6 +217,7 @@ class AzureCosmosClass:
             ai_answer (str): AI-generated response
             context (str): Knowledge base context used
             comparison_details (Dict): Message comparison metadata
+            translation (Optional[Dict[str, str]]): Localized query/answer for the session language
 
         Raises:
             CosmosHttpResponseError: If Cosmos DB operation fails
@@ -184,7 +228,8 @@ class AzureCosmosClass:
             partition_key = f"{chat_id}_partkey"
             prev_item = self.container_object.read_item(
                 item=chat_id,
-                partition_key=partition_key
+                partition_key=partition_key,
+                **session_tokens.read_options(self.container_object, chat_id)
             )
 
             new_message = {
@@ -200,13 +245,18 @@ class AzureCosmosClass:
                 "feedback_text": "",
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
+            if translation:
+                new_message["translation"] = translation
+            if self.context_store is not None:
+                externalize(new_message, self.context_store)
 
             prev_item['conversation'].append(new_message)
             self.container_object.replace_item(
                 item=chat_id,
-                body=prev_item
+                body=lifecycle.stamp(prev_item, "conversations"),
+                **session_tokens.write_options(self.container_object, chat_id)
             )
-            logger.info(f"Successfully updated conversation for chat_id: {chat_id}")
+            logger.info("Successfully updated conversation for chat_id: %s", chat_id)
 
         except CosmosHttpResponseError as e:
             logger.error(f"Cosmos DB operation failed for chat_id {chat_id}: {str(e)}")
@@ -233,11 +283,12 @@ class AzureCosmosClass:
         try:
             item = self.container_object.read_item(
                 item=conversation_id,
-                partition_key=partition_key
+                partition_key=partition_key,
+                **session_tokens.read_options(self.container_object, conversation_id)
             )
             return item
         except CosmosHttpResponseError:
-            logger.info(f"No existing conversation found for ID: {conversation_id}")
+            logger.info("No existing conversation found for ID: %s", conversation_id)
             return False
         except Exception as e:
             logger.error(f"Error retrieving conversation data: {str(e)}")
@@ -268,7 +319,8 @@ class AzureCosmosClass:
             partition_key = f"{chat_id}_partkey"
             item = self.container_object.read_item(
                 item=chat_id,
-                partition_key=partition_key
+                partition_key=partition_key,
+                **session_tokens.read_options(self.container_object, chat_id)
             )
 
             message_found = False
@@ -282,7 +334,11 @@ class AzureCosmosClass:
             if not message_found:
                 raise ValueError(f"Message ID {message_id} not found in conversation")
 
-            self.container_object.replace_item(item=chat_id, body=item)
+            self.container_object.replace_item(
+                item=chat_id,
+                body=item,
+                **session_tokens.write_options(self.container_object, chat_id)
+            )
             logger.info(
                 f"Feedback updated for message {message_id} in chat {chat_id}"
             )
@@ -311,7 +367,8 @@ class AzureCosmosClass:
             partition_key = f"{chat_id}_partkey"
             item = self.container_object.read_item(
                 item=chat_id,
-                partition_key=partition_key
+                partition_key=partition_key,
+                **session_tokens.read_options(self.container_object, chat_id)
             )
 
             message_found = False
@@ -325,7 +382,11 @@ class AzureCosmosClass:
             if not message_found:
                 raise ValueError(f"Message ID {message_id} not found in conversation")
 
-            self.container_object.replace_item(item=chat_id, body=item)
+            self.container_object.replace_item(
+                item=chat_id,
+                body=item,
+                **session_tokens.write_options(self.container_object, chat_id)
+            )
             logger.info(
                 f"Feedback reset for message {message_id} in chat {chat_id}"
             )
@@ -335,4 +396,33 @@ class AzureCosmosClass:
             raise
         except Exception as e:
             logger.error(f"Failed to reset feedback: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def conversation_partitions(self) -> List[Any]:
+        """
+        Return the container's feed ranges, which can be scanned in parallel.
+
+        Returns:
+            List[Any]: Opaque feed ranges
+        """
+        return list(self.container_object.read_feed_ranges())
+
+    def iter_conversations(self, partition: Any = None) -> Iterator[Dict]:
+        """
+        Yield every conversation document.
+
+        Intended for offline jobs (index builds, analytics), not the request path.
+
+        Args:
+            partition (Any): Feed range to scan, or None for a cross-partition read
+
+        Yields:
+            Dict: Conversation document
+        """
+        if partition is None:
+            yield from self.container_object.read_all_items()
+        else:
+            # The latest-version change feed from the beginning is a scan of one feed range
+            yield from self.container_object.query_items_change_feed(
+                feed_range=partition, start_time="Beginning"
+            )
@@ -0,0 +1,268 @@
+"""
+Declarative schema of the Cosmos DB containers.
+
+Containers used to be created with default settings, which index every
+property, including the large conversation "context" strings and the
+step "input"/"output" payloads. Every write paid index RUs for fields
+no query reads. Each container is described here by a ContainerSpec:
+- partition key path
+- indexed paths; everything else is excluded (consistent indexing)
+- composite indexes for filtered, sorted queries (list_threads)
+- default TTL: -1 turns TTL on without a default, so only items with a
+  "ttl" expire (see lifecycle.py); None turns it off
+
+ensure_container creates a missing container from its spec. For an
+existing one it compares the live properties with the spec. With
+COSMOS_SCHEMA_MODE=replace (default) it replaces a drifted indexing
+policy or TTL; Cosmos DB re-indexes in the background without downtime.
+With "check" it only logs the drift, and with "off" it skips the check.
+A partition key cannot be changed in place, so a mismatch is only logged
+(migrate the data instead). Every step is idempotent, so concurrent
+workers can run it at startup.
+
+Show the drift of every container without changing anything:
+
+    python cosmos_schema.py --check
+
+Configuration:
+    COSMOS_SCHEMA_MODE: "replace" (default), "check" or "off"
+"""
+
+import os
+import json
+import argparse
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from azure.cosmos import PartitionKey
+from dotenv import load_dotenv
+
+from utils import setup_logger
+from lifecycle import LIFECYCLE_ARCHIVE_CONTAINER, lifecycle
+from context_store import CONTEXT_CONTAINER
+
+logger = setup_logger("cosmos_schema")
+
+COSMOS_SCHEMA_MODE = os.getenv("COSMOS_SCHEMA_MODE", "replace").lower()
+
+# Always excluded by Cosmos DB; ignored when comparing policies
+_SYSTEM_EXCLUDED = '/"_etag"/?'
+
+
+@dataclass
+class ContainerSpec:
+    """
+    Desired settings of one container.
+
+    Attributes:
+        id (str): Container name
+        partition_key (str): Partition key path, e.g. "/id"
+        included_paths (List[str]): Indexed paths, e.g. "/userId/?" or "/tags/[]/?"
+        composite_indexes (List[List[Tuple[str, str]]]): Composite indexes as
+            (path, "ascending" | "descending") pairs
+        default_ttl (Optional[int]): Container TTL; -1 enables per-item TTL, None disables
+    """
+
+    id: str
+    partition_key: str
+    included_paths: List[str] = field(default_factory=list)
+    composite_indexes: List[List[Tuple[str, str]]] = field(default_factory=list)
+    default_ttl: Optional[int] = None
+
+    def indexing_policy(self) -> Dict[str, Any]:
+        """Return the Cosmos DB indexing policy of the spec."""
+        return {
+            "indexingMode": "consistent",
+            "automatic": True,
+            "includedPaths": [{"path": path} for path in self.included_paths],
+            "excludedPaths": [{"path": "/*"}],
+            "compositeIndexes": [
+                [{"path": path, "order": order} for path, order in index]
+                for index in self.composite_indexes
+            ],
+        }
+
+
+def _ttl(enabled: bool) -> Optional[int]:
+    return -1 if enabled else None
+
+
+def conversations_spec(container_id: str, partition_key: str) -> ContainerSpec:
+    """Conversations are only read by id and through the change feed."""
+    return ContainerSpec(
+        id=container_id,
+        partition_key=f"/{partition_key}",
+        included_paths=[f"/{partition_key}/?"],
+        default_ttl=_ttl(lifecycle.ttls["conversations"] > 0),
+    )
+
+
+def threads_spec(container_id: str, partition_key: str) -> ContainerSpec:
+    """Threads are filtered by user, tag and feedback message, and sorted by creation time."""
+    return ContainerSpec(
+        id=container_id,
+        partition_key=partition_key,
+        included_paths=[
+            "/userId/?",
+            "/createdAt/?",
+            "/tags/[]/?",
+            "/feedback/[]/message_id/?",
+        ],
+        # list_threads: WHERE t.userId = @user ORDER BY t.createdAt DESC
+        composite_indexes=[[("/userId", "ascending"), ("/createdAt", "descending")]],
+        default_ttl=_ttl(lifecycle.uses_ttl),
+    )
+
+
+def steps_spec(container_id: str, partition_key: str) -> ContainerSpec:
+    """Steps are looked up by id and thread; their input and output are never queried."""
+    return ContainerSpec(
+        id=container_id,
+        partition_key=partition_key,
+        included_paths=["/threadId/?", "/createdAt/?"],
+        composite_indexes=[[("/threadId", "ascending"), ("/createdAt", "ascending")]],
+        default_ttl=_ttl(lifecycle.uses_ttl),
+    )
+
+
+def blob_spec(container_id: str) -> ContainerSpec:
+    """Archive and context blob containers are only used with point reads and writes."""
+    return ContainerSpec(id=container_id, partition_key="/id")
+
+
+def _normalize(policy: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "includedPaths": sorted(p["path"] for p in policy.get("includedPaths", [])),
+        "excludedPaths": sorted(
+            p["path"] for p in policy.get("excludedPaths", []) if p["path"] != _SYSTEM_EXCLUDED
+        ),
+        "compositeIndexes": sorted(
+            [(p["path"], p.get("order", "ascending").lower()) for p in index]
+            for index in policy.get("compositeIndexes", [])
+        ),
+    }
+
+
+def schema_drift(properties: Dict[str, Any], spec: ContainerSpec) -> List[str]:
+    """
+    Compare live container properties with a spec.
+
+    Args:
+        properties (Dict[str, Any]): Result of ContainerProxy.read()
+        spec (ContainerSpec): Desired settings
+
+    Returns:
+        List[str]: Differences; empty if the container matches
+    """
+    drift = []
+    paths = properties.get("partitionKey", {}).get("paths", [])
+    if paths != [spec.partition_key]:
+        drift.append(f"partition key {paths} != ['{spec.partition_key}'] (requires migration)")
+    live = _normalize(properties.get("indexingPolicy", {}))
+    desired = _normalize(spec.indexing_policy())
+    for key in desired:
+        if live[key] != desired[key]:
+            drift.append(f"{key} {live[key]} != {desired[key]}")
+    if properties.get("defaultTtl") != spec.default_ttl:
+        drift.append(f"defaultTtl {properties.get('defaultTtl')} != {spec.default_ttl}")
+    return drift
+
+
+def ensure_container(database: Any, spec: ContainerSpec, mode: str = COSMOS_SCHEMA_MODE) -> Any:
+    """
+    Create a container from its spec, or bring an existing one in line with it.
+
+    Args:
+        database (DatabaseProxy): Database holding the container
+        spec (ContainerSpec): Desired settings
+        mode (str): "replace", "check" or "off"
+
+    Returns:
+        ContainerProxy: The container
+    """
+    container = database.create_container_if_not_exists(
+        id=spec.id,
+        partition_key=PartitionKey(path=spec.partition_key),
+        indexing_policy=spec.indexing_policy(),
+        default_ttl=spec.default_ttl,
+    )
+    if mode == "off":
+        return container
+
+    properties = container.read()
+    drift = schema_drift(properties, spec)
+    fixable = [d for d in drift if not d.startswith("partition key")]
+    if len(fixable) < len(drift):
+        logger.error("Container %s has partition key %s, expected %s",
+                     spec.id, properties.get("partitionKey", {}).get("paths"), spec.partition_key)
+    if not fixable:
+        return container
+    if mode != "replace":
+        logger.warning("Container %s differs from its schema: %s", spec.id, "; ".join(fixable))
+        return container
+
+    logger.info("Updating container %s: %s", spec.id, "; ".join(fixable))
+    # replace_container needs the existing partition key, which cannot change
+    return database.replace_container(
+        container,
+        partition_key=PartitionKey(path=properties["partitionKey"]["paths"][0]),
+        indexing_policy=spec.indexing_policy(),
+        default_ttl=spec.default_ttl,
+    )
+
+
+def specs_from_env() -> Dict[str, List[ContainerSpec]]:
+    """Return the specs of every configured container, grouped by database name."""
+    load_dotenv()
+    specs: Dict[str, List[ContainerSpec]] = {}
+    conversations_db = os.getenv("CONVERSATIONS_DB")
+    if conversations_db:
+        specs[conversations_db] = [
+            conversations_spec(os.getenv("CONVERSATIONS_CONTAINER"), os.getenv("CONVERSATIONS_PARTITION_KEY")),
+            blob_spec(CONTEXT_CONTAINER),
+        ]
+    chainlit_db = os.getenv("CHAINLIT_COSMOS_DB_NAME")
+    if chainlit_db:
+        partition_key = os.getenv("CHAINLIT_COSMOS_PARTITION_KEY")
+        steps_container = os.getenv("CHAINLIT_STEPS_CONTAINER")
+        steps_layout = os.getenv("STEPS_LAYOUT", "legacy").lower()
+        chainlit_specs = [threads_spec(os.getenv("CHAINLIT_THREADS_CONTAINER"), partition_key)]
+        if steps_layout != "thread":
+            chainlit_specs.append(steps_spec(steps_container, partition_key))
+        if steps_layout != "legacy":
+            # See data_layer.STEPS_LAYOUT
+            chainlit_specs.append(steps_spec(
+                os.getenv("CHAINLIT_STEPS_BY_THREAD_CONTAINER") or f"{steps_container}-by-thread",
+                "/threadId"
+            ))
+        chainlit_specs.append(blob_spec(LIFECYCLE_ARCHIVE_CONTAINER))
+        specs.setdefault(chainlit_db, []).extend(chainlit_specs)
+    return specs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Provision the Cosmos DB containers from their schema.")
+    parser.add_argument("--check", action="store_true", help="Report drift without changing anything")
+    args = parser.parse_args()
+
+    from cosmos_db import get_cosmos_client
+
+    client = get_cosmos_client(os.getenv("COSMOS_DB_HOST"), os.getenv("COSMOS_DB_KEY"))
+    report: Dict[str, List[str]] = {}
+    for database_id, specs in specs_from_env().items():
+        database = client.create_database_if_not_exists(id=database_id)
+        for spec in specs:
+            if args.check:
+                try:
+                    properties = database.get_container_client(spec.id).read()
+                    report[spec.id] = schema_drift(properties, spec)
+                except Exception as e:
+                    report[spec.id] = [f"unavailable: {str(e)}"]
+            else:
+                ensure_container(database, spec, mode="replace")
+                report[spec.id] = []
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
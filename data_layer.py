@@ -2,17 +2,19 @@
 Custom Data Layer implementation for Chainlit chat application.
 
 This module provides a custom implementation of Chainlit's BaseDataLayer
-for storing and managing chat conversations, user feedback, and related data
-in Azure Cosmos DB.
+for storing and managing chat conversations, user feedback, and related data.
+Storage goes through the ThreadStore and ConversationStore interfaces in
+storage.py, so the backend (Azure Cosmos DB or SQLite) is pluggable.
 
 Classes:
-    CustomDataLayer: Implements BaseDataLayer for Azure Cosmos DB storage
+    CosmosThreadStore: ThreadStore on the Chainlit Cosmos DB containers
+    CustomDataLayer: Implements BaseDataLayer on top of the storage interfaces
 """
 
 import os
 import chainlit as cl
 import chainlit.data as cl_data
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 from chainlit.types import (
     Feedback,
@@ -22,15 +24,27 @@ from chainlit.types import (
     ThreadDict,
     ThreadFilter,
 )
-from azure.cosmos import CosmosClient, PartitionKey
 from azure.cosmos.exceptions import (
+    CosmosBatchOperationError,
     CosmosResourceNotFoundError,
     CosmosHttpResponseError
 )
 from dotenv import load_dotenv
 import logging
 from utils import setup_logger
-from cosmos_db import AzureCosmosClass
+from cosmos_db import get_cosmos_client
+from storage import (
+    ConversationStore,
+    StorageNotFoundError,
+    ThreadStore,
+    create_conversation_store,
+    create_thread_store,
+)
+from feedback_view import feedback_view
+from lifecycle import LIFECYCLE_ARCHIVE_CONTAINER, lifecycle
+from cosmos_schema import blob_spec, ensure_container, steps_spec, threads_spec
+from session_tokens import session_tokens
+from session_state import get_session_state
 
 # Configure logging
 logger = setup_logger("data_layer")
@@ -43,77 +57,403 @@ logging.getLogger("azure.cosmos").setLevel(logging.WARNING)
 load_dotenv()
 
 # Cosmos DB Configuration
-try:
-    COSMOS_DB_ENDPOINT = os.getenv("COSMOS_DB_HOST")
-    COSMOS_DB_KEY = os.getenv("COSMOS_DB_KEY")
-    CHAINLIT_COSMOS_DB_NAME = os.getenv("CHAINLIT_COSMOS_DB_NAME")
-    CHAINLIT_THREADS_CONTAINER = os.getenv("CHAINLIT_THREADS_CONTAINER")
-    CHAINLIT_STEPS_CONTAINER = os.getenv("CHAINLIT_STEPS_CONTAINER")
-    CHAINLIT_COSMOS_PARTITION_KEY = os.getenv("CHAINLIT_COSMOS_PARTITION_KEY")
-
-    # Validate required environment variables
-    if not all([
-        COSMOS_DB_ENDPOINT,
-        COSMOS_DB_KEY,
-        CHAINLIT_COSMOS_DB_NAME,
-        CHAINLIT_THREADS_CONTAINER,
-        CHAINLIT_STEPS_CONTAINER,
-        CHAINLIT_COSMOS_PARTITION_KEY
-    ]):
-        raise ValueError("Missing required environment variables")
-
-except Exception as e:
-    logger.error(f"Configuration error: {str(e)}")
-    raise
+COSMOS_DB_ENDPOINT = os.getenv("COSMOS_DB_HOST")
+COSMOS_DB_KEY = os.getenv("COSMOS_DB_KEY")
+CHAINLIT_COSMOS_DB_NAME = os.getenv("CHAINLIT_COSMOS_DB_NAME")
+CHAINLIT_THREADS_CONTAINER = os.getenv("CHAINLIT_THREADS_CONTAINER")
+CHAINLIT_STEPS_CONTAINER = os.getenv("CHAINLIT_STEPS_CONTAINER")
+CHAINLIT_COSMOS_PARTITION_KEY = os.getenv("CHAINLIT_COSMOS_PARTITION_KEY")
+# Steps layout: "legacy" (CHAINLIT_STEPS_CONTAINER with CHAINLIT_COSMOS_PARTITION_KEY),
+# "dual" (steps partitioned by /threadId, reads falling back to the legacy container
+# during the migration, see migrate_steps.py) or "thread" (partitioned by /threadId only)
+STEPS_LAYOUT = os.getenv("STEPS_LAYOUT", "legacy").lower()
+CHAINLIT_STEPS_BY_THREAD_CONTAINER = (
+    os.getenv("CHAINLIT_STEPS_BY_THREAD_CONTAINER") or f"{CHAINLIT_STEPS_CONTAINER}-by-thread"
+)
+# Operations per transactional batch allowed by Cosmos DB
+COSMOS_BATCH_MAX_OPERATIONS = 100
 
 
-class CustomDataLayer(cl_data.BaseDataLayer):
+class CosmosThreadStore(ThreadStore):
     """
-    Custom implementation of Chainlit's BaseDataLayer for Azure Cosmos DB.
+    ThreadStore backed by the Chainlit threads and steps containers in Azure Cosmos DB.
 
-    This class handles storage and retrieval of chat conversations, user feedback,
-    and related data using Azure Cosmos DB as the backend storage solution.
+    With steps partitioned by thread id, listing and deleting a thread's
+    steps stay within one partition, and deletes go out as transactional
+    batches. In the "dual" layout, reads fall back to the legacy steps
+    container and deletes apply to both, so steps written before the
+    migration stay visible until migrate_steps.py has copied them.
+
+    Writes record their session token per thread and reads of the same
+    thread pass it, so they see those writes (see session_tokens.py).
 
     Attributes:
-        client: CosmosClient instance for database operations
-        database: Cosmos DB database instance
         threads_container: Container for storing chat threads
         steps_container: Container for storing conversation steps
-        conversations_cosmos: Instance of AzureCosmosClass for conversation management
+        archive_container: Container for archived threads, if configured
+        legacy_steps_container: Legacy steps container read during the migration, if any
+        steps_by_thread (bool): Whether steps_container is partitioned by /threadId
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        threads_container,
+        steps_container,
+        archive_container=None,
+        legacy_steps_container=None,
+        steps_by_thread: bool = False
+    ) -> None:
+        """
+        Args:
+            threads_container: Cosmos DB container for threads
+            steps_container: Cosmos DB container for steps
+            archive_container: Cosmos DB container for archived threads (partition key "/id")
+            legacy_steps_container: Container partitioned by step id to fall back to
+            steps_by_thread (bool): Whether steps_container is partitioned by /threadId
+        """
+        self.threads_container = threads_container
+        self.steps_container = steps_container
+        self.archive_container = archive_container
+        self.legacy_steps_container = legacy_steps_container
+        self.steps_by_thread = steps_by_thread
+
+    @classmethod
+    def from_env(cls) -> "CosmosThreadStore":
         """
-        Initialize the CustomDataLayer with Cosmos DB connections.
+        Connect to the containers configured by environment variables, creating them if needed.
+
+        Returns:
+            CosmosThreadStore: Store bound to the configured containers
 
         Raises:
+            ValueError: If required environment variables are missing
             CosmosHttpResponseError: If database/container creation fails
-            Exception: For other initialization errors
         """
+        if STEPS_LAYOUT not in ("legacy", "dual", "thread"):
+            raise ValueError(f"Unknown STEPS_LAYOUT: {STEPS_LAYOUT}")
+        if not all([
+            COSMOS_DB_ENDPOINT,
+            COSMOS_DB_KEY,
+            CHAINLIT_COSMOS_DB_NAME,
+            CHAINLIT_THREADS_CONTAINER,
+            CHAINLIT_STEPS_CONTAINER,
+            CHAINLIT_COSMOS_PARTITION_KEY
+        ]):
+            logger.error("Configuration error: Missing required environment variables")
+            raise ValueError("Missing required environment variables")
+
         try:
-            logger.info("Initializing CustomDataLayer")
-            self.client = CosmosClient(COSMOS_DB_ENDPOINT, COSMOS_DB_KEY)
-            
-            # Initialize database and containers
-            self.database = self.client.create_database_if_not_exists(
-                id=CHAINLIT_COSMOS_DB_NAME
+            client = get_cosmos_client(COSMOS_DB_ENDPOINT, COSMOS_DB_KEY)
+            database = client.create_database_if_not_exists(id=CHAINLIT_COSMOS_DB_NAME)
+            threads_container = ensure_container(
+                database, threads_spec(CHAINLIT_THREADS_CONTAINER, CHAINLIT_COSMOS_PARTITION_KEY)
             )
-            self.threads_container = self.database.create_container_if_not_exists(
-                id=CHAINLIT_THREADS_CONTAINER,
-                partition_key=PartitionKey(path=CHAINLIT_COSMOS_PARTITION_KEY)
-            )
-            self.steps_container = self.database.create_container_if_not_exists(
-                id=CHAINLIT_STEPS_CONTAINER,
-                partition_key=PartitionKey(path=CHAINLIT_COSMOS_PARTITION_KEY)
-            )
-            
-            # Initialize conversation handler
-            self.conversations_cosmos = AzureCosmosClass()
-            logger.info("CustomDataLayer initialized successfully")
-            
+            legacy_steps_container = None
+            if STEPS_LAYOUT != "thread":
+                legacy_steps_container = ensure_container(
+                    database, steps_spec(CHAINLIT_STEPS_CONTAINER, CHAINLIT_COSMOS_PARTITION_KEY)
+                )
+            steps_container = legacy_steps_container
+            if STEPS_LAYOUT != "legacy":
+                steps_container = ensure_container(
+                    database, steps_spec(CHAINLIT_STEPS_BY_THREAD_CONTAINER, "/threadId")
+                )
+            archive_container = None
+            if lifecycle.uses_ttl:
+                archive_container = ensure_container(database, blob_spec(LIFECYCLE_ARCHIVE_CONTAINER))
         except CosmosHttpResponseError as e:
             logger.error(f"Cosmos DB initialization failed: {str(e)}")
             raise
+        return cls(
+            threads_container,
+            steps_container,
+            archive_container,
+            legacy_steps_container=legacy_steps_container if STEPS_LAYOUT == "dual" else None,
+            steps_by_thread=STEPS_LAYOUT != "legacy"
+        )
+
+    def get_thread(self, thread_id: str) -> Optional[Dict]:
+        try:
+            return self.threads_container.read_item(
+                item=thread_id,
+                partition_key=thread_id,
+                **session_tokens.read_options(self.threads_container, thread_id)
+            )
+        except CosmosResourceNotFoundError:
+            return None
+
+    def upsert_thread(self, thread: Dict) -> None:
+        self.threads_container.upsert_item(
+            thread, **session_tokens.write_options(self.threads_container, thread.get('id'))
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        try:
+            self.threads_container.delete_item(item=thread_id, partition_key=thread_id)
+        except CosmosResourceNotFoundError as e:
+            raise StorageNotFoundError(f"Thread not found: {thread_id}") from e
+
+        self.delete_thread_steps(thread_id)
+        session_tokens.forget(thread_id)
+
+    def delete_thread_steps(self, thread_id: str) -> int:
+        if not self.steps_by_thread:
+            steps = self.list_steps(thread_id)
+            for step in steps:
+                self.steps_container.delete_item(item=step['id'], partition_key=step['id'])
+            return len(steps)
+
+        # One partition: delete in transactional batches instead of one call per step
+        step_ids = list(self.steps_container.query_items(
+            query="SELECT VALUE s.id FROM Steps s",
+            partition_key=thread_id
+        ))
+        for start in range(0, len(step_ids), COSMOS_BATCH_MAX_OPERATIONS):
+            chunk = step_ids[start:start + COSMOS_BATCH_MAX_OPERATIONS]
+            try:
+                self.steps_container.execute_item_batch(
+                    batch_operations=[("delete", (step_id,)) for step_id in chunk],
+                    partition_key=thread_id
+                )
+            except CosmosBatchOperationError:
+                # A batch is all-or-nothing; a step removed meanwhile (e.g. expired) fails it
+                for step_id in chunk:
+                    try:
+                        self.steps_container.delete_item(item=step_id, partition_key=thread_id)
+                    except CosmosResourceNotFoundError:
+                        pass
+        deleted = len(step_ids)
+        if self.legacy_steps_container is not None:
+            for step in self._legacy_steps(thread_id):
+                self._delete_legacy_step(step['id'])
+                deleted += 1
+        return deleted
+
+    def find_thread_by_feedback(self, message_id: str) -> Optional[Dict]:
+        query = f'SELECT * FROM Threads t WHERE ARRAY_CONTAINS(t.feedback, {{ "message_id": "{message_id}" }}, true)'
+        items = list(self.threads_container.query_items(query=query, enable_cross_partition_query=True))
+        return items[0] if items else None
+
+    def list_threads(
+        self,
+        user_id: Optional[str],
+        tag: Optional[str],
+        offset: int,
+        limit: int
+    ) -> Tuple[List[Dict], int]:
+        # ORDER BY skips threads without createdAt, so the count must skip them too
+        filters = ["AND IS_DEFINED(t.createdAt)"]
+        if user_id:
+            filters.append(f"AND t.userId = '{user_id}'")
+        if tag:
+            filters.append(f"AND ARRAY_CONTAINS(t.tags, '{tag}')")
+
+        query = ["SELECT * FROM Threads t WHERE 1=1"] + filters
+        # Newest first, as in the SQLite backend; served by the composite index in cosmos_schema
+        query.append(f"ORDER BY t.createdAt DESC OFFSET {offset} LIMIT {limit}")
+        items = list(self.threads_container.query_items(
+            query=" ".join(query),
+            enable_cross_partition_query=True
+        ))
+
+        count_query = ["SELECT VALUE COUNT(1) FROM Threads t WHERE 1=1"] + filters
+        total_count = list(self.threads_container.query_items(
+            query=" ".join(count_query),
+            enable_cross_partition_query=True
+        ))[0]
+        return items, total_count
+
+    @staticmethod
+    def _query_step(container, step_id: str, **options) -> Optional[Dict]:
+        items = list(container.query_items(
+            query="SELECT * FROM Steps s WHERE s.id = @step_id",
+            parameters=[{"name": "@step_id", "value": step_id}],
+            enable_cross_partition_query=True,
+            **options
+        ))
+        return items[0] if items else None
+
+    def get_step(self, step_id: str, thread_id: Optional[str] = None) -> Optional[Dict]:
+        options = session_tokens.read_options(self.steps_container, thread_id)
+        if self.steps_by_thread and thread_id:
+            try:
+                return self.steps_container.read_item(item=step_id, partition_key=thread_id, **options)
+            except CosmosResourceNotFoundError:
+                step = None
+        else:
+            step = self._query_step(self.steps_container, step_id, **options)
+        if step is None and self.legacy_steps_container is not None:
+            step = self._query_step(self.legacy_steps_container, step_id)
+        return step
+
+    def upsert_step(self, step: Dict) -> None:
+        self.steps_container.upsert_item(
+            step, **session_tokens.write_options(self.steps_container, step.get('threadId'))
+        )
+
+    def _delete_legacy_step(self, step_id: str) -> bool:
+        try:
+            self.legacy_steps_container.delete_item(item=step_id, partition_key=step_id)
+            return True
+        except CosmosResourceNotFoundError:
+            return False
+
+    def delete_step(self, step_id: str, thread_id: Optional[str] = None) -> None:
+        if not self.steps_by_thread:
+            try:
+                self.steps_container.delete_item(item=step_id, partition_key=step_id)
+            except CosmosResourceNotFoundError as e:
+                raise StorageNotFoundError(f"Step not found: {step_id}") from e
+            return
+
+        deleted = False
+        if thread_id is None:
+            step = self._query_step(self.steps_container, step_id)
+            thread_id = step['threadId'] if step else None
+        if thread_id is not None:
+            try:
+                self.steps_container.delete_item(item=step_id, partition_key=thread_id)
+                deleted = True
+            except CosmosResourceNotFoundError:
+                pass
+        if self.legacy_steps_container is not None:
+            deleted = self._delete_legacy_step(step_id) or deleted
+        if not deleted:
+            raise StorageNotFoundError(f"Step not found: {step_id}")
+
+    def _legacy_steps(self, thread_id: str) -> List[Dict]:
+        return list(self.legacy_steps_container.query_items(
+            query="SELECT * FROM Steps s WHERE s.threadId = @thread_id",
+            parameters=[{"name": "@thread_id", "value": thread_id}],
+            enable_cross_partition_query=True
+        ))
+
+    def list_steps(self, thread_id: str) -> List[Dict]:
+        options = session_tokens.read_options(self.steps_container, thread_id)
+        if not self.steps_by_thread:
+            return list(self.steps_container.query_items(
+                query="SELECT * FROM Steps s WHERE s.threadId = @thread_id",
+                parameters=[{"name": "@thread_id", "value": thread_id}],
+                enable_cross_partition_query=True,
+                **options
+            ))
+
+        steps = list(self.steps_container.query_items(
+            query="SELECT * FROM Steps s",
+            partition_key=thread_id,
+            **options
+        ))
+        if self.legacy_steps_container is not None:
+            # Steps not migrated yet; the copy in the new container wins
+            migrated = {step['id'] for step in steps}
+            steps.extend(s for s in self._legacy_steps(thread_id) if s['id'] not in migrated)
+        steps.sort(key=lambda step: step.get('createdAt') or '')
+        return steps
+
+    def _patch_steps(self, container, steps: List[Dict], patch_operations: List[Dict]) -> None:
+        # One patch per step, in partitions keyed by the step id
+        for step in steps:
+            try:
+                container.patch_item(item=step['id'], partition_key=step['id'], patch_operations=patch_operations)
+            except CosmosResourceNotFoundError:
+                pass
+
+    def set_steps_ttl(self, thread_id: str, ttl: int) -> int:
+        patch_operations = [{"op": "set", "path": "/ttl", "value": ttl}]
+        if not self.steps_by_thread:
+            steps = self.list_steps(thread_id)
+            self._patch_steps(self.steps_container, steps, patch_operations)
+            return len(steps)
+
+        # One partition: patch in transactional batches instead of one call per step
+        step_ids = list(self.steps_container.query_items(
+            query="SELECT VALUE s.id FROM Steps s",
+            partition_key=thread_id
+        ))
+        write_options = session_tokens.write_options(self.steps_container, thread_id)
+        for start in range(0, len(step_ids), COSMOS_BATCH_MAX_OPERATIONS):
+            chunk = step_ids[start:start + COSMOS_BATCH_MAX_OPERATIONS]
+            try:
+                self.steps_container.execute_item_batch(
+                    batch_operations=[("patch", (step_id, patch_operations)) for step_id in chunk],
+                    partition_key=thread_id,
+                    **write_options
+                )
+            except CosmosBatchOperationError:
+                # A batch is all-or-nothing; a step removed meanwhile (e.g. expired) fails it
+                for step_id in chunk:
+                    try:
+                        self.steps_container.patch_item(
+                            item=step_id,
+                            partition_key=thread_id,
+                            patch_operations=patch_operations,
+                            **write_options
+                        )
+                    except CosmosResourceNotFoundError:
+                        pass
+        updated = len(step_ids)
+        if self.legacy_steps_container is not None:
+            legacy_steps = self._legacy_steps(thread_id)
+            self._patch_steps(self.legacy_steps_container, legacy_steps, patch_operations)
+            updated += len(legacy_steps)
+        return updated
+
+    def set_thread_ttl(self, thread_id: str, ttl: int, archived_at: Optional[str] = None) -> None:
+        # A patch is one write without reading the document first
+        patch_operations = [{"op": "set", "path": "/ttl", "value": ttl}]
+        if archived_at is not None:
+            patch_operations.append({"op": "set", "path": "/archivedAt", "value": archived_at})
+        try:
+            self.threads_container.patch_item(
+                item=thread_id,
+                partition_key=thread_id,
+                patch_operations=patch_operations,
+                **session_tokens.write_options(self.threads_container, thread_id)
+            )
+        except CosmosResourceNotFoundError as e:
+            raise StorageNotFoundError(f"Thread not found: {thread_id}") from e
+
+    def archive_thread(self, record: Dict) -> None:
+        if self.archive_container is None:
+            raise ValueError("No archive container configured")
+        self.archive_container.upsert_item(record)
+
+
+class CustomDataLayer(cl_data.BaseDataLayer):
+    """
+    Custom implementation of Chainlit's BaseDataLayer.
+
+    This class handles storage and retrieval of chat conversations, user feedback,
+    and related data through the storage interfaces; the backend is selected by
+    STORAGE_BACKEND (Azure Cosmos DB by default).
+
+    Attributes:
+        thread_store (ThreadStore): Storage for threads, steps and thread feedback
+        conversations (ConversationStore): Storage for conversation history
+    """
+
+    def __init__(
+        self,
+        thread_store: Optional[ThreadStore] = None,
+        conversations: Optional[ConversationStore] = None
+    ):
+        """
+        Initialize the CustomDataLayer with its storage backends.
+
+        Args:
+            thread_store (Optional[ThreadStore]): Thread storage. Defaults to STORAGE_BACKEND's
+            conversations (Optional[ConversationStore]): Conversation storage. Defaults to STORAGE_BACKEND's
+
+        Raises:
+            CosmosHttpResponseError: If database/container creation fails
+            Exception: For other initialization errors
+        """
+        try:
+            logger.info("Initializing CustomDataLayer")
+            self.thread_store = thread_store or create_thread_store()
+            self.conversations = conversations or create_conversation_store()
+            logger.info("CustomDataLayer initialized successfully")
+
         except Exception as e:
             logger.error(f"Initialization error: {str(e)}")
             raise
@@ -133,9 +473,9 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             Exception: For other unexpected errors
         """
         try:
-            logger.info(f"Processing feedback for step: {feedback.forId}")
+            logger.info("Processing feedback for step: %s", feedback.forId)
             step_id = feedback.forId
-            step = await self.get_step(step_id)
+            step = await self.get_step(step_id, feedback.threadId)
             
             if not step:
                 raise ValueError(f"Step not found: {step_id}")
@@ -145,19 +485,20 @@ class CustomDataLayer(cl_data.BaseDataLayer):
                 raise ValueError(f"User message not found in step: {step_id}")
                 
             await self.store_feedback(user_message, feedback.value, feedback.comment)
-            logger.info(f"Feedback successfully processed for message: {user_message['id']}")
+            logger.info("Feedback successfully processed for message: %s", user_message['id'])
             return user_message['id']
             
         except Exception as e:
             logger.error(f"Failed to upsert feedback: {str(e)}")
             raise
 
-    async def get_step(self, step_id: str) -> Optional[Dict]:
+    async def get_step(self, step_id: str, thread_id: Optional[str] = None) -> Optional[Dict]:
         """
         Retrieve a specific conversation step from Cosmos DB.
 
         Args:
             step_id (str): Unique identifier for the step
+            thread_id (Optional[str]): Thread of the step, if known; allows a point read
 
         Returns:
             Optional[Dict]: Step data if found, None otherwise
@@ -166,12 +507,7 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             CosmosHttpResponseError: If Cosmos DB query fails
         """
         try:
-            query = f'SELECT * FROM Steps s WHERE s.id = "{step_id}"'
-            items = list(self.steps_container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
-            return items[0] if items else None
+            return self.thread_store.get_step(step_id, thread_id)
             
         except CosmosHttpResponseError as e:
             logger.error(f"Failed to query step {step_id}: {str(e)}")
@@ -237,7 +573,6 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             comment (str): User's feedback comments
 
         Raises:
-            CosmosResourceNotFoundError: If thread not found
             CosmosHttpResponseError: If Cosmos DB operation fails
         """
         try:
@@ -251,29 +586,29 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             thread_id = message['thread_id']
 
             # Store in local thread container
-            try:
-                thread = self.threads_container.read_item(
-                    item=thread_id,
-                    partition_key=thread_id
-                )
-            except CosmosResourceNotFoundError:
-                logger.info(f"Creating new thread: {thread_id}")
+            thread = self.thread_store.get_thread(thread_id)
+            if thread is None:
+                logger.info("Creating new thread: %s", thread_id)
                 thread = {
                     'id': thread_id,
+                    'createdAt': datetime.now(timezone.utc).isoformat(),
                     'feedback': []
                 }
 
-            # Update thread with feedback
-            if 'feedback' not in thread:
-                thread['feedback'] = []
+            # Update thread with feedback, replacing an earlier vote on the same message
+            replaced = [fb for fb in thread.get('feedback', []) if fb['message_id'] == message['id']]
+            thread['feedback'] = [
+                fb for fb in thread.get('feedback', []) if fb['message_id'] != message['id']
+            ]
             thread['feedback'].append(feedback_data)
             
-            self.threads_container.upsert_item(thread)
-            logger.info(f"Feedback stored locally for message: {message['id']}")
+            self.thread_store.upsert_thread(lifecycle.stamp(thread, "threads"))
+            logger.info("Feedback stored locally for message: %s", message['id'])
+            await self.update_feedback_view(replaced, feedback_data)
 
-            # Store in Cosmos DB
+            # Store in the conversation history
             try:
-                self.conversations_cosmos.upsert_feedback(
+                self.conversations.upsert_feedback(
                     chat_id=thread_id,
                     message_id=message['id'],
                     feedback_vote=-1 if value == 0 else value,
@@ -289,22 +624,40 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             logger.error(f"Failed to store feedback: {str(e)}")
             raise
 
+    async def update_feedback_view(self, removed: List[Dict], added: Optional[Dict] = None) -> None:
+        """
+        Apply stored feedback changes to the materialized feedback view.
+
+        The view is derived data, so failures are logged without failing the feedback.
+
+        Args:
+            removed (List[Dict]): Feedback entries deleted or replaced
+            added (Optional[Dict]): Feedback entry stored
+        """
+        try:
+            for fb in removed:
+                await feedback_view.retract(fb.get('user_message', ''), fb.get('value', 0), fb.get('timestamp'))
+            if added:
+                await feedback_view.record(added['user_message'], added['value'], added['timestamp'])
+        except Exception as e:
+            logger.warning("Failed to update feedback view: %s", e)
+
     async def get_user(self, identifier: str):
-        print("get_user is called")
+        logger.debug("get_user is called")
         pass
 
     async def create_user(self, user: cl.User):
-        print("create_user is called")
+        logger.debug("create_user is called")
         pass
 
     async def delete_feedback(self, feedback_id: str) -> bool:
-        print("delete_feedback is called")
-        query = f'SELECT * FROM Threads t WHERE ARRAY_CONTAINS(t.feedback, {{ "message_id": "{feedback_id}" }}, true)'
-        items = list(self.threads_container.query_items(query=query, enable_cross_partition_query=True))
-        if items:
-            thread = items[0]
+        logger.info("delete_feedback is called for: %s", feedback_id)
+        thread = self.thread_store.find_thread_by_feedback(feedback_id)
+        if thread:
+            removed = [fb for fb in thread['feedback'] if fb['message_id'] == feedback_id]
             thread['feedback'] = [fb for fb in thread['feedback'] if fb['message_id'] != feedback_id]
-            self.threads_container.upsert_item(thread)
+            self.thread_store.upsert_thread(lifecycle.stamp(thread, "threads"))
+            await self.update_feedback_view(removed)
             chat_id = thread['id']
             msg_id = feedback_id
 
@@ -315,19 +668,19 @@ class CustomDataLayer(cl_data.BaseDataLayer):
                     'msg_id': msg_id
                 }
                 # marked
-                self.conversations_cosmos.reset_feedback(
+                self.conversations.reset_feedback(
                     chat_id = api_feedback_data['chat_id'],
                     message_id = api_feedback_data['msg_id']
                     )
                 # response = requests.delete(f"{FEEDBACK_API}/reset", json=api_feedback_data)
                 # response.raise_for_status()
-                print("Feedback reset request sent to cosmos db successfully")
+                logger.info("Feedback reset request sent to cosmos db successfully")
                 
             # except requests.exceptions.RequestException as e:
-            #     print(f"Failed to send feedback reset request to API: {e}")
+            #     logger.error("Failed to send feedback reset request to API: %s", e)
             
             except Exception as e:
-                print(f"Failed to send feedback reset request to Cosmos DB: {e}")
+                logger.error("Failed to send feedback reset request to Cosmos DB: %s", e)
                 # Don't raise exception here since local deletion was successful
 
             return True
@@ -335,16 +688,16 @@ class CustomDataLayer(cl_data.BaseDataLayer):
 
     @cl_data.queue_until_user_message()
     async def create_element(self, element: "Element"):
-        print("create_element is called")
+        logger.debug("create_element is called")
         pass
 
     async def get_element(self, thread_id: str, element_id: str) -> Optional["ElementDict"]:
-        print("get_element is called")
+        logger.debug("get_element is called")
         pass
 
     @cl_data.queue_until_user_message()
     async def delete_element(self, element_id: str, thread_id: Optional[str] = None):
-        print("delete_element is called")
+        logger.debug("delete_element is called")
         pass
 
     async def create_step(self, step_dict: "StepDict") -> None:
@@ -358,9 +711,9 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             CosmosHttpResponseError: If step creation fails
         """
         try:
-            logger.info(f"Creating step: {step_dict.get('id')}")
-            self.steps_container.upsert_item(step_dict)
-            logger.info(f"Step created successfully: {step_dict.get('id')}")
+            logger.info("Creating step: %s", step_dict.get('id'))
+            self.thread_store.upsert_step(lifecycle.stamp(dict(step_dict), "steps"))
+            logger.info("Step created successfully: %s", step_dict.get('id'))
             
         except CosmosHttpResponseError as e:
             logger.error(f"Failed to create step: {str(e)}")
@@ -381,9 +734,9 @@ class CustomDataLayer(cl_data.BaseDataLayer):
         """
         try:
             step_id = step_dict.get('id')
-            logger.info(f"Updating step: {step_id}")
-            self.steps_container.upsert_item(step_dict)
-            logger.info(f"Step updated successfully: {step_id}")
+            logger.info("Updating step: %s", step_id)
+            self.thread_store.upsert_step(lifecycle.stamp(dict(step_dict), "steps"))
+            logger.info("Step updated successfully: %s", step_id)
             
         except CosmosHttpResponseError as e:
             logger.error(f"Failed to update step: {str(e)}")
@@ -400,18 +753,15 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             step_id (str): Unique identifier of the step to delete
 
         Raises:
-            CosmosResourceNotFoundError: If step doesn't exist
+            StorageNotFoundError: If step doesn't exist
             CosmosHttpResponseError: If deletion fails
         """
         try:
-            logger.info(f"Deleting step: {step_id}")
-            self.steps_container.delete_item(
-                item=step_id,
-                partition_key=step_id
-            )
-            logger.info(f"Step deleted successfully: {step_id}")
+            logger.info("Deleting step: %s", step_id)
+            self.thread_store.delete_step(step_id)
+            logger.info("Step deleted successfully: %s", step_id)
             
-        except CosmosResourceNotFoundError as e:
+        except StorageNotFoundError as e:
             logger.warning(f"Step not found: {step_id}")
             raise
         except CosmosHttpResponseError as e:
@@ -445,34 +795,19 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             thread_id (str): Unique identifier of the thread to delete
 
         Raises:
-            CosmosResourceNotFoundError: If thread doesn't exist
+            StorageNotFoundError: If thread doesn't exist
             CosmosHttpResponseError: If deletion fails
         """
         try:
-            logger.info(f"Deleting thread: {thread_id}")
-            
-            # Delete thread document
-            self.threads_container.delete_item(
-                item=thread_id,
-                partition_key=thread_id
-            )
+            logger.info("Deleting thread: %s", thread_id)
             
-            # Delete associated steps
-            query = f'SELECT * FROM Steps s WHERE s.threadId = "{thread_id}"'
-            steps = list(self.steps_container.query_items(
-                query=query,
-                enable_cross_partition_query=True
-            ))
-            
-            for step in steps:
-                self.steps_container.delete_item(
-                    item=step['id'],
-                    partition_key=step['id']
-                )
-                
-            logger.info(f"Thread and associated data deleted: {thread_id}")
+            # Delete thread document and associated steps
+            self.thread_store.delete_thread(thread_id)
+            # Other workers would otherwise keep serving the cached history until it expires
+            await get_session_state().delete_history(thread_id)
+            logger.info("Thread and associated data deleted: %s", thread_id)
             
-        except CosmosResourceNotFoundError as e:
+        except StorageNotFoundError as e:
             logger.warning(f"Thread not found: {thread_id}")
             raise
         except CosmosHttpResponseError as e:
@@ -503,35 +838,14 @@ class CustomDataLayer(cl_data.BaseDataLayer):
         try:
             logger.info("Retrieving thread list with filters")
             
-            # Build query with filters
-            query = ["SELECT * FROM Threads t WHERE 1=1"]
-            
-            if filters.user_id:
-                query.append(f"AND t.userId = '{filters.user_id}'")
-            if filters.tag:
-                query.append(f"AND ARRAY_CONTAINS(t.tags, '{filters.tag}')")
-            
-            # Add pagination
+            # Query one page of threads and the total count for pagination
             offset = (pagination.page - 1) * pagination.page_size
-            query.append(f"OFFSET {offset} LIMIT {pagination.page_size}")
-            
-            # Execute query
-            items = list(self.threads_container.query_items(
-                query=" ".join(query),
-                enable_cross_partition_query=True
-            ))
-            
-            # Get total count for pagination
-            count_query = ["SELECT VALUE COUNT(1) FROM Threads t WHERE 1=1"]
-            if filters.user_id:
-                count_query.append(f"AND t.userId = '{filters.user_id}'")
-            if filters.tag:
-                count_query.append(f"AND ARRAY_CONTAINS(t.tags, '{filters.tag}')")
-            
-            total_count = list(self.threads_container.query_items(
-                query=" ".join(count_query),
-                enable_cross_partition_query=True
-            ))[0]
+            items, total_count = self.thread_store.list_threads(
+                user_id=filters.user_id,
+                tag=filters.tag,
+                offset=offset,
+                limit=pagination.page_size
+            )
             
             # Calculate pagination info
             total_pages = (total_count + pagination.page_size - 1) // pagination.page_size
@@ -545,7 +859,7 @@ class CustomDataLayer(cl_data.BaseDataLayer):
                 has_previous=has_previous
             )
             
-            logger.info(f"Retrieved {len(items)} threads")
+            logger.info("Retrieved %s threads", len(items))
             return PaginatedResponse(data=items, page_info=page_info)
             
         except CosmosHttpResponseError as e:
@@ -569,16 +883,12 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             CosmosHttpResponseError: If thread retrieval fails
         """
         try:
-            logger.info(f"Retrieving thread: {thread_id}")
-            thread = self.threads_container.read_item(
-                item=thread_id,
-                partition_key=thread_id
-            )
+            logger.info("Retrieving thread: %s", thread_id)
+            thread = self.thread_store.get_thread(thread_id)
+            if thread is None:
+                logger.warning("Thread not found: %s", thread_id)
             return thread
             
-        except CosmosResourceNotFoundError:
-            logger.warning(f"Thread not found: {thread_id}")
-            return None
         except CosmosHttpResponseError as e:
             logger.error(f"Failed to retrieve thread: {str(e)}")
             raise
@@ -609,10 +919,10 @@ class CustomDataLayer(cl_data.BaseDataLayer):
             CosmosHttpResponseError: If update fails
         """
 
-        logger.info(f"Update thread called for thread id: {thread_id}. But its not implemented.")
+        logger.info("Update thread called for thread id: %s. But its not implemented.", thread_id)
         pass
         # try:
-        #     logger.info(f"Updating thread: {thread_id}")
+        #     logger.info("Updating thread: %s", thread_id)
             
         #     # Get existing thread
         #     thread = await self.get_thread(thread_id)
@@ -634,7 +944,7 @@ class CustomDataLayer(cl_data.BaseDataLayer):
         #         item=thread_id,
         #         body=thread
         #     )
-        #     logger.info(f"Thread updated successfully: {thread_id}")
+        #     logger.info("Thread updated successfully: %s", thread_id)
             
         # except CosmosHttpResponseError as e:
         #     logger.error(f"Failed to update thread: {str(e)}")
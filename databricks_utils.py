@@ -1,7 +1,19 @@
-import mlflow.deployments
 import os
+import asyncio
 from dotenv import load_dotenv
 
+from serving_client import get_serving_client
+from utils import setup_logger
+
+load_dotenv()
+
+logger = setup_logger("databricks_utils")
+
+# "http" (default) uses the built-in serving client; "mlflow" uses
+# mlflow.deployments, which requires the optional requirements-mlflow.txt
+SERVING_CLIENT = os.getenv("SERVING_CLIENT", "http").lower()
+
+
 def call_databricks_endpoint(messages):
     """
     Call a Databricks endpoint with a list of messages.
@@ -15,10 +27,15 @@ def call_databricks_endpoint(messages):
     Raises:
         Exception: If there is an error during the endpoint call.
     """
-    load_dotenv()
     try:
-        # Get the MLflow deployment client for Databricks
-        client = mlflow.deployments.get_deploy_client("databricks")
+        if SERVING_CLIENT == "mlflow":
+            # Imported here because mlflow takes seconds to import
+            import mlflow.deployments
+
+            # Get the MLflow deployment client for Databricks
+            client = mlflow.deployments.get_deploy_client("databricks")
+        else:
+            client = get_serving_client()
 
         # Call the Databricks endpoint with the provided messages
         response = client.predict(
@@ -29,10 +46,38 @@ def call_databricks_endpoint(messages):
         )
         return response
     except Exception as e:
-        # Log or print the error as needed
-        print(f"Error calling Databricks endpoint: {e}")
+        logger.error("Error calling Databricks endpoint: %s", e)
+        raise
+
+
+async def acall_databricks_endpoint(messages):
+    """
+    Call a Databricks endpoint with a list of messages without blocking the event loop.
+
+    Args:
+        messages (list): List of message dictionaries with 'role' and 'content' keys.
+
+    Returns:
+        dict: The response from the Databricks endpoint.
+
+    Raises:
+        Exception: If there is an error during the endpoint call.
+    """
+    if SERVING_CLIENT == "mlflow":
+        return await asyncio.to_thread(call_databricks_endpoint, messages)
+
+    try:
+        return await get_serving_client().apredict(
+            endpoint=os.getenv("SERVING_ENDPOINT_NAME"),
+            inputs={
+                "messages": messages
+            }
+        )
+    except Exception as e:
+        logger.error("Error calling Databricks endpoint: %s", e)
         raise
 
+
 if __name__ == "__main__":
     # Example usage for manual testing
     user_msg = input("Enter your message: ")
@@ -42,4 +87,3 @@ if __name__ == "__main__":
         print(response)
     except Exception as e:
         print(f"Failed to get response: {e}")
-
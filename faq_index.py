@@ -0,0 +1,580 @@
+"""
+Local FAQ retrieval tier.
+
+The bot's knowledge base is a bounded FAQ, so the most frequent questions
+can be answered from an embedded index in milliseconds instead of a
+Databricks round trip. The index combines:
+- BM25 over an inverted index of question tokens
+- Optional dense vectors (hashed character trigrams, NumPy) searched with
+  one batched cosine-similarity product, which tolerates typos and word
+  order changes that BM25 misses
+
+Only high-confidence matches are answered locally; everything else goes
+to the endpoint as before. Confidence is the BM25 score relative to the
+score a perfect match would get, blended with the cosine similarity when
+dense vectors are enabled, and the best match must beat the runner-up
+with a different answer by a margin.
+
+The index is built offline from an FAQ corpus (JSON, JSONL or CSV with
+"question" and "answer" columns) or from answered questions stored in the
+conversations container, and loaded from FAQ_INDEX_PATH at startup:
+
+    python faq_index.py build --faq faq.csv --output faq_index.json
+    python faq_index.py build --from-conversations --min-count 3 --output faq_index.json
+    python faq_index.py query faq_index.json "How do I book a service?"
+
+Configuration:
+    FAQ_INDEX_ENABLED: "true" to answer from the index (default "false")
+    FAQ_INDEX_PATH: Index file (default "faq_index.json")
+    FAQ_MIN_CONFIDENCE: Confidence needed to answer locally, 0-1 (default 0.8)
+    FAQ_MIN_MARGIN: Lead needed over the runner-up answer (default 0.1)
+    FAQ_DENSE_ENABLED: "true" to add dense vectors when NumPy is installed (default "true")
+    FAQ_DENSE_DIM: Dense vector size (default 1024)
+    FAQ_DENSE_WEIGHT: Weight of the cosine similarity in the confidence (default 0.5)
+    FAQ_LOCAL_FOLLOW_UPS: "true" to also answer follow-up turns locally (default "false")
+"""
+
+import os
+import re
+import csv
+import json
+import math
+import time
+import zlib
+import argparse
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils import setup_logger
+from metrics import registry
+from singleflight import normalize_text
+
+try:
+    import numpy as np
+except ImportError:  # Dense vectors are optional
+    np = None
+
+logger = setup_logger("faq_index")
+
+FAQ_INDEX_ENABLED = os.getenv("FAQ_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+FAQ_INDEX_PATH = os.getenv("FAQ_INDEX_PATH", "faq_index.json")
+FAQ_MIN_CONFIDENCE = float(os.getenv("FAQ_MIN_CONFIDENCE", "0.8"))
+FAQ_MIN_MARGIN = float(os.getenv("FAQ_MIN_MARGIN", "0.1"))
+FAQ_DENSE_ENABLED = os.getenv("FAQ_DENSE_ENABLED", "true").lower() in ("1", "true", "yes")
+FAQ_DENSE_DIM = int(os.getenv("FAQ_DENSE_DIM", "1024"))
+FAQ_DENSE_WEIGHT = float(os.getenv("FAQ_DENSE_WEIGHT", "0.5"))
+# Follow-ups ("and on weekends?") depend on earlier turns the index cannot see
+FAQ_LOCAL_FOLLOW_UPS = os.getenv("FAQ_LOCAL_FOLLOW_UPS", "false").lower() in ("1", "true", "yes")
+
+FAQ_LOOKUPS = registry.counter(
+    "faq_index_lookups_total",
+    "Local FAQ index lookups by outcome (hit answered locally, miss sent to the endpoint)",
+    ["outcome"],
+)
+FAQ_LOOKUP_SECONDS = registry.histogram(
+    "faq_index_lookup_seconds",
+    "Local FAQ index lookup latency",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-cased word tokens."""
+    return _TOKEN.findall((text or "").lower())
+
+
+def _trigrams(text: str) -> List[str]:
+    padded = f" {normalize_text(text)} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class FAQIndex:
+    """
+    BM25 inverted index over FAQ questions with optional dense vectors.
+
+    Each entry is a dict with "question" and "answer", and optionally
+    "context" (stored with the turn like the endpoint's retrieved context)
+    and "alternates" (other phrasings of the question, indexed too).
+
+    Attributes:
+        entries (List[Dict[str, Any]]): Indexed FAQ entries
+        dense (bool): Whether dense vectors are in use
+        hits (int): Lookups answered locally
+        misses (int): Lookups sent on to the endpoint
+    """
+
+    def __init__(
+        self,
+        entries: List[Dict[str, Any]],
+        k1: float = 1.2,
+        b: float = 0.75,
+        dense: bool = FAQ_DENSE_ENABLED,
+        dense_dim: int = FAQ_DENSE_DIM,
+    ) -> None:
+        self.entries = entries
+        self.k1 = k1
+        self.b = b
+        self.hits = 0
+        self.misses = 0
+        self._lookup_seconds = 0.0
+        self._lock = threading.Lock()
+
+        # One document per phrasing; _doc_entry maps documents back to entries
+        self._doc_entry: List[int] = []
+        doc_tokens: List[List[str]] = []
+        doc_texts: List[str] = []
+        for entry_id, entry in enumerate(entries):
+            for question in [entry["question"], *entry.get("alternates", [])]:
+                self._doc_entry.append(entry_id)
+                doc_tokens.append(tokenize(question))
+                doc_texts.append(question)
+
+        self._doc_length = [len(tokens) for tokens in doc_tokens]
+        self._avg_length = (sum(self._doc_length) / len(doc_tokens)) if doc_tokens else 1.0
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc_id, tokens in enumerate(doc_tokens):
+            for term, tf in Counter(tokens).items():
+                self._postings[term].append((doc_id, tf))
+        documents = len(doc_tokens)
+        self._idf = {
+            term: math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+        # A term no question contains is as informative as the rarest possible term
+        self._unknown_idf = math.log(1 + (documents + 0.5) / 0.5)
+
+        self.dense = bool(dense and np is not None and documents)
+        self.dense_dim = dense_dim
+        self._vectors = self._embed(doc_texts) if self.dense else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _embed(self, texts: List[str]) -> "np.ndarray":
+        """Embed texts as L2-normalized hashed character-trigram vectors."""
+        vectors = np.zeros((len(texts), self.dense_dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for gram, count in Counter(_trigrams(text)).items():
+                # crc32 rather than hash(): stable across processes
+                vectors[row, zlib.crc32(gram.encode("utf-8")) % self.dense_dim] += 1 + math.log(count)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _bm25(self, tokens: List[str]) -> Tuple[Dict[int, float], float]:
+        """Return BM25 scores per document and the score of a perfect match."""
+        scores: Dict[int, float] = defaultdict(float)
+        terms = Counter(tokens)
+        perfect = 0.0
+        query_norm = self.k1 * (1 - self.b + self.b * len(tokens) / self._avg_length)
+        for term, query_tf in terms.items():
+            idf = self._idf.get(term, self._unknown_idf)
+            perfect += idf * query_tf * (self.k1 + 1) / (query_tf + query_norm)
+            for doc_id, tf in self._postings.get(term, ()):
+                norm = self.k1 * (1 - self.b + self.b * self._doc_length[doc_id] / self._avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores, perfect
+
+    def search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Rank entries for several queries.
+
+        Dense similarities for all queries are computed with one matrix
+        product.
+
+        Args:
+            queries (List[str]): Query texts
+            k (int): Results per query
+
+        Returns:
+            List[List[Dict[str, Any]]]: Per query, results with "entry", "confidence",
+            "bm25" (relative to a perfect match) and "cosine", best first
+        """
+        similarities = None
+        if self.dense and queries:
+            similarities = self._embed(queries) @ self._vectors.T
+
+        results = []
+        for row, query in enumerate(queries):
+            scores, perfect = self._bm25(tokenize(query))
+            candidates = set(sorted(scores, key=scores.get, reverse=True)[:k * 2])
+            if similarities is not None:
+                top = np.argsort(-similarities[row])[:k * 2]
+                candidates.update(int(doc_id) for doc_id in top)
+
+            # Keep the best-scoring phrasing of each entry
+            best: Dict[int, Dict[str, Any]] = {}
+            for doc_id in candidates:
+                bm25 = min(1.0, scores.get(doc_id, 0.0) / perfect) if perfect else 0.0
+                cosine = float(similarities[row, doc_id]) if similarities is not None else None
+                confidence = bm25 if cosine is None else (
+                    (1 - FAQ_DENSE_WEIGHT) * bm25 + FAQ_DENSE_WEIGHT * max(cosine, 0.0)
+                )
+                entry_id = self._doc_entry[doc_id]
+                if entry_id not in best or confidence > best[entry_id]["confidence"]:
+                    best[entry_id] = {
+                        "entry": self.entries[entry_id],
+                        "confidence": round(confidence, 4),
+                        "bm25": round(bm25, 4),
+                        "cosine": None if cosine is None else round(cosine, 4),
+                    }
+            ranked = sorted(best.values(), key=lambda result: result["confidence"], reverse=True)
+            results.append(ranked[:k])
+        return results
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Rank entries for one query; see search_batch."""
+        return self.search_batch([query], k)[0]
+
+    def match(
+        self,
+        query: str,
+        min_confidence: float = FAQ_MIN_CONFIDENCE,
+        min_margin: float = FAQ_MIN_MARGIN,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the entry to answer a query with, if the match is confident.
+
+        Args:
+            query (str): User's question
+            min_confidence (float): Confidence needed to answer locally
+            min_margin (float): Lead needed over the best result with a different answer
+
+        Returns:
+            Optional[Dict[str, Any]]: Best search result, or None to ask the endpoint
+        """
+        start = time.perf_counter()
+        results = self.search(query, k=3)
+        matched = None
+        if results and results[0]["confidence"] >= min_confidence:
+            answer = results[0]["entry"]["answer"]
+            runner_up = next(
+                (result for result in results[1:] if result["entry"]["answer"] != answer), None
+            )
+            if runner_up is None or results[0]["confidence"] - runner_up["confidence"] >= min_margin:
+                matched = results[0]
+
+        elapsed = time.perf_counter() - start
+        FAQ_LOOKUP_SECONDS.observe(elapsed)
+        FAQ_LOOKUPS.inc(outcome="hit" if matched else "miss")
+        with self._lock:
+            self._lookup_seconds += elapsed
+            if matched:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return matched
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size, hit rate and mean lookup latency."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "dense": self.dense,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "mean_lookup_ms": round(self._lookup_seconds / lookups * 1000, 3) if lookups else None,
+        }
+
+    def save(self, path: str) -> None:
+        """Write the entries to a JSON index file."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+        logger.info("Saved FAQ index with %s entries to %s", len(self.entries), path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs: Any) -> "FAQIndex":
+        """
+        Load an index file written by save().
+
+        Args:
+            path (str): Index file path
+            **kwargs (Any): FAQIndex options
+
+        Returns:
+            FAQIndex: Index over the stored entries
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["entries"], **kwargs)
+
+
+def load_faq_corpus(path: str) -> List[Dict[str, Any]]:
+    """
+    Read FAQ entries from a JSON, JSONL or CSV file.
+
+    Rows need "question" and "answer"; "context" and "alternates" (a list,
+    or "|"-separated in CSV) are optional.
+
+    Args:
+        path (str): Corpus file
+
+    Returns:
+        List[Dict[str, Any]]: FAQ entries
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows: List[Dict[str, Any]] = list(csv.DictReader(f))
+            for row in rows:
+                row["alternates"] = [a for a in (row.get("alternates") or "").split("|") if a]
+        elif path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = json.load(f)
+
+    entries = []
+    for row in rows:
+        if not row.get("question") or not row.get("answer"):
+            continue
+        entry = {"question": row["question"].strip(), "answer": row["answer"].strip()}
+        if row.get("context"):
+            entry["context"] = row["context"]
+        if row.get("alternates"):
+            entry["alternates"] = list(row["alternates"])
+        entries.append(entry)
+    return entries
+
+
+class QuestionTally:
+    """
+    Counts of answered questions and their feedback, grouped by normalized question.
+
+    Tallies of separate scans (e.g. one per partition) can be merged.
+
+    Attributes:
+        asked (Counter): Times each normalized question was asked
+    """
+
+    def __init__(self) -> None:
+        self.asked: Counter = Counter()
+        self._phrasing: Dict[str, str] = {}
+        # Per question and answer: [times given, up votes, down votes]
+        self._answers: Dict[str, Dict[str, List[int]]] = defaultdict(dict)
+        self._details: Dict[Tuple[str, str], Dict[str, str]] = {}
+
+    def add(self, conversation: Dict[str, Any]) -> None:
+        """Count the answered turns of a conversation document."""
+        for message in conversation.get("conversation", []):
+            question = message.get("user_message")
+            answer = message.get("ai_answer")
+            if not question or not answer:
+                continue
+            key = normalize_text(question)
+            self.asked[key] += 1
+            self._phrasing.setdefault(key, question.strip())
+            counts = self._answers[key].setdefault(answer, [0, 0, 0])
+            counts[0] += 1
+            if message.get("feedback_vote") == 1:
+                counts[1] += 1
+            elif message.get("feedback_vote") == -1:
+                counts[2] += 1
+            if (key, answer) not in self._details:
+                self._details[(key, answer)] = {
+                    "context": message.get("context") or "",
+                    "rephrased_query": message.get("rephrased_message") or "",
+                }
+                if message.get("context_ref"):
+                    # Saved by reference (context_store.py); resolved for selected entries only
+                    self._details[(key, answer)]["context_ref"] = message["context_ref"]
+
+    def merge(self, other: "QuestionTally") -> None:
+        """Add another tally's counts to this one."""
+        self.asked.update(other.asked)
+        for key, phrasing in other._phrasing.items():
+            self._phrasing.setdefault(key, phrasing)
+        for key, answers in other._answers.items():
+            for answer, counts in answers.items():
+                mine = self._answers[key].setdefault(answer, [0, 0, 0])
+                for i, count in enumerate(counts):
+                    mine[i] += count
+        for key, details in other._details.items():
+            self._details.setdefault(key, details)
+
+    def entries(
+        self, min_count: int = 2, min_positive: int = 0, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Select FAQ entries: frequent questions with their best-rated answer.
+
+        An answer qualifies if it was not voted down more often than up and
+        has at least min_positive net up votes; the most up-voted, then most
+        given, qualifying answer is chosen.
+
+        Args:
+            min_count (int): Times a question must have been asked
+            min_positive (int): Net up votes the answer needs
+            limit (Optional[int]): Maximum number of entries
+
+        Returns:
+            List[Dict[str, Any]]: Entries with "question", "answer", "context",
+            "rephrased_query", "asked" and "positive", most asked first
+        """
+        entries = []
+        for key, count in self.asked.most_common():
+            if count < min_count:
+                break
+            candidates = [
+                (up - down, given, answer)
+                for answer, (given, up, down) in self._answers[key].items()
+                if up >= down and up - down >= min_positive
+            ]
+            if not candidates:
+                continue
+            positive, _, answer = max(candidates)
+            entries.append({
+                "question": self._phrasing[key],
+                "answer": answer,
+                **self._details[(key, answer)],
+                "asked": count,
+                "positive": positive,
+            })
+            if limit is not None and len(entries) >= limit:
+                break
+        return entries
+
+
+def entries_from_conversations(
+    conversations: Iterable[Dict[str, Any]], min_count: int = 2
+) -> List[Dict[str, Any]]:
+    """
+    Derive FAQ entries from answered questions stored in conversations.
+
+    Questions become entries once they were asked at least min_count times;
+    answers voted down more than up are ignored.
+
+    Args:
+        conversations (Iterable[Dict[str, Any]]): Conversation documents
+        min_count (int): Times a question must have been asked
+
+    Returns:
+        List[Dict[str, Any]]: FAQ entries, most asked first
+    """
+    tally = QuestionTally()
+    for conversation in conversations:
+        tally.add(conversation)
+    return tally.entries(min_count=min_count)
+
+
+def local_response(match: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build an endpoint-shaped response from an index match.
+
+    Args:
+        match (Dict[str, Any]): Result returned by FAQIndex.match
+
+    Returns:
+        Dict[str, Any]: Response marked with "local": "faq_index"
+    """
+    entry = match["entry"]
+    return {
+        "messages": [{"role": "assistant", "content": entry["answer"]}],
+        "custom_outputs": {
+            "context": entry.get("context", ""),
+            "faq_question": entry["question"],
+            "faq_confidence": match["confidence"],
+        },
+        "databricks_output": {},
+        "local": "faq_index",
+    }
+
+
+_faq_index: Optional[FAQIndex] = None
+_faq_index_loaded = False
+_faq_index_lock = threading.Lock()
+
+
+def get_faq_index() -> Optional[FAQIndex]:
+    """
+    Return the process-wide index, loading FAQ_INDEX_PATH on first use.
+
+    Returns:
+        Optional[FAQIndex]: The index, or None if disabled or not available
+    """
+    global _faq_index, _faq_index_loaded
+    if not _faq_index_loaded:
+        with _faq_index_lock:
+            if not _faq_index_loaded:
+                if FAQ_INDEX_ENABLED and os.path.exists(FAQ_INDEX_PATH):
+                    try:
+                        _faq_index = FAQIndex.load(FAQ_INDEX_PATH)
+                        logger.info(
+                            "Loaded FAQ index with %s entries (dense=%s)",
+                            len(_faq_index), _faq_index.dense
+                        )
+                    except Exception as e:
+                        logger.error("Failed to load FAQ index %s: %s", FAQ_INDEX_PATH, e)
+                elif FAQ_INDEX_ENABLED:
+                    logger.warning("FAQ index enabled but %s does not exist", FAQ_INDEX_PATH)
+                _faq_index_loaded = True
+    return _faq_index
+
+
+def set_faq_index(index: Optional[FAQIndex]) -> None:
+    """
+    Replace the process-wide index (e.g. after a rebuild, or in benchmarks).
+
+    Args:
+        index (Optional[FAQIndex]): New index, or None to disable local answers
+    """
+    global _faq_index, _faq_index_loaded
+    with _faq_index_lock:
+        _faq_index = index
+        _faq_index_loaded = True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or query the local FAQ index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build an index file")
+    build.add_argument("--faq", action="append", default=[], help="FAQ corpus file (repeatable)")
+    build.add_argument(
+        "--from-conversations", action="store_true",
+        help="Add questions answered in the conversations store (STORAGE_BACKEND)"
+    )
+    build.add_argument("--min-count", type=int, default=2, help="Times a stored question must have been asked")
+    build.add_argument("--output", default=FAQ_INDEX_PATH, help="Index file to write")
+
+    query = commands.add_parser("query", help="Show the best matches for questions")
+    query.add_argument("index", help="Index file")
+    query.add_argument("questions", nargs="+")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        entries: List[Dict[str, Any]] = []
+        for path in args.faq:
+            entries.extend(load_faq_corpus(path))
+        if args.from_conversations:
+            from storage import create_conversation_store
+
+            store = create_conversation_store()
+            known = {normalize_text(entry["question"]) for entry in entries}
+            derived = [
+                store.hydrate_message(entry)
+                for entry in entries_from_conversations(store.iter_conversations(), args.min_count)
+            ]
+            # Curated FAQ entries win over answers derived from conversations
+            entries.extend(e for e in derived if normalize_text(e["question"]) not in known)
+        if not entries:
+            parser.error("no entries: pass --faq and/or --from-conversations")
+        FAQIndex(entries).save(args.output)
+    else:
+        index = FAQIndex.load(args.index)
+        for question, results in zip(args.questions, index.search_batch(args.questions, k=3)):
+            print(question)
+            for result in results:
+                print(
+                    f"  {result['confidence']:.3f} (bm25={result['bm25']:.3f}, "
+                    f"cosine={result['cosine']}) {result['entry']['question']}"
+                )
+            print(f"  -> {'local answer' if index.match(question) else 'endpoint'}")
+
+
+if __name__ == "__main__":
+    main()
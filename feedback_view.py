@@ -0,0 +1,254 @@
+"""
+Materialized view of user feedback.
+
+Finding which questions get voted down used to mean scanning every
+conversation's feedback_vote and every thread's feedback array. This view
+keeps vote counters that are updated as feedback is stored and deleted
+(see data_layer.CustomDataLayer.store_feedback and delete_feedback):
+- per question (normalized text), e.g. to stop serving a cached answer
+  users dislike
+- per day the vote was cast, for dashboards
+- in total
+
+Every read is a counter lookup in the current generation of the view.
+Counters live in the session state backend (session_state.py), so with
+SESSION_STATE_BACKEND=redis every worker shares one view that survives
+restarts. rebuild() counts the votes stored in conversations into a fresh
+generation and then makes it current, so votes the live path already
+counted are not counted twice. Startup seeds the view (seed(), from the
+warm-up in app.py) when the backend holds no built view, i.e. on every
+start of the in-memory backend and on the first start with Redis.
+
+A full rebuild can also be run with python feedback_view.py rebuild; it
+only reaches the server with SESSION_STATE_BACKEND=redis, since the
+in-memory backend lives in the server process. Votes cast while a rebuild
+runs are missing from the new generation if their conversation was read
+before them, until the next rebuild.
+
+Configuration:
+    FEEDBACK_DISLIKE_MIN_VOTES: Down votes before a question counts as disliked (default 3)
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from utils import setup_logger
+from singleflight import normalize_text
+from session_state import SessionStateBackend, get_session_state
+
+logger = setup_logger("feedback_view")
+
+FEEDBACK_DISLIKE_MIN_VOTES = int(os.getenv("FEEDBACK_DISLIKE_MIN_VOTES", "3"))
+
+_QUESTIONS = "feedback:question"
+_DAYS = "feedback:day"
+_TOTALS = "feedback:total"
+_META = "feedback:meta"
+
+
+def question_key(question: str) -> str:
+    """Return the counter key of a question: a digest of its normalized text."""
+    return hashlib.sha256(normalize_text(question).encode("utf-8")).hexdigest()[:32]
+
+
+def _counts(counters: Dict[str, int]) -> Dict[str, int]:
+    return {"up": counters.get("up", 0), "down": counters.get("down", 0)}
+
+
+class FeedbackView:
+    """
+    Up and down vote counters per question, per day and in total.
+
+    Votes follow the stored feedback values: positive values are up votes,
+    zero (Chainlit's thumbs down) and negative values are down votes.
+    Counters are kept per generation; readers and writers use the current
+    one, and rebuild() fills a new one before switching to it.
+    """
+
+    def __init__(self, state: Optional[SessionStateBackend] = None) -> None:
+        """
+        Args:
+            state (Optional[SessionStateBackend]): Counter storage. Defaults to the
+                process-wide session state backend
+        """
+        self._state = state
+
+    @property
+    def state(self) -> SessionStateBackend:
+        return self._state or get_session_state()
+
+    async def generation(self) -> int:
+        """Return the current generation, 0 if the view was never rebuilt."""
+        return (await self.state.get_counters(_META, "generation")).get("current", 0)
+
+    @staticmethod
+    def _namespace(base: str, generation: int) -> str:
+        # Generation 0 keeps the unsuffixed names of views counted before rebuilds
+        return f"{base}:{generation}" if generation else base
+
+    async def _count(
+        self, generation: int, question: str, value: int, timestamp: Optional[str], delta: int
+    ) -> None:
+        vote = "up" if value and value > 0 else "down"
+        day = (timestamp or datetime.now(timezone.utc).isoformat())[:10]
+        counters = [
+            (_QUESTIONS, question_key(question)),
+            (_DAYS, day),
+            (_TOTALS, "all"),
+        ]
+        await asyncio.gather(*[
+            self.state.incr_counters(self._namespace(base, generation), key, {vote: delta})
+            for base, key in counters
+        ])
+
+    async def _read(self, base: str, key: str) -> Dict[str, int]:
+        return _counts(await self.state.get_counters(self._namespace(base, await self.generation()), key))
+
+    async def record(
+        self, question: str, value: int, timestamp: Optional[str] = None, delta: int = 1
+    ) -> None:
+        """
+        Count a vote.
+
+        Args:
+            question (str): Question the voted answer replied to
+            value (int): Stored feedback value
+            timestamp (Optional[str]): ISO time the vote was cast. Defaults to now
+            delta (int): 1 to add the vote, -1 to retract it
+        """
+        await self._count(await self.generation(), question, value, timestamp, delta)
+
+    async def retract(self, question: str, value: int, timestamp: Optional[str] = None) -> None:
+        """Remove a previously counted vote (deleted or replaced feedback)."""
+        await self.record(question, value, timestamp, delta=-1)
+
+    async def for_question(self, question: str) -> Dict[str, int]:
+        """Return {"up", "down"} vote counts of a question."""
+        return await self._read(_QUESTIONS, question_key(question))
+
+    async def for_day(self, day: str) -> Dict[str, int]:
+        """Return {"up", "down"} vote counts of a day (YYYY-MM-DD, UTC)."""
+        return await self._read(_DAYS, day)
+
+    async def totals(self) -> Dict[str, int]:
+        """Return {"up", "down"} vote counts over all feedback."""
+        return await self._read(_TOTALS, "all")
+
+    async def is_disliked(self, question: str, min_votes: int = FEEDBACK_DISLIKE_MIN_VOTES) -> bool:
+        """
+        Return True if a question's answers got at least min_votes down votes and more down than up.
+
+        Args:
+            question (str): Question text
+            min_votes (int): Down votes needed
+
+        Returns:
+            bool: Whether the question is disliked
+        """
+        counts = await self.for_question(question)
+        return counts["down"] >= min_votes and counts["down"] > counts["up"]
+
+    async def rebuild(self, conversations: Iterable[Dict[str, Any]]) -> int:
+        """
+        Recount the view from the votes stored in conversation documents.
+
+        Votes are counted into a new generation, which then replaces the
+        current one, so votes already counted by the live path are not
+        counted again. Conversations do not record when a vote was cast, so
+        votes are counted on the day of the answered turn.
+
+        Args:
+            conversations (Iterable[Dict[str, Any]]): Conversation documents
+
+        Returns:
+            int: Votes counted
+        """
+        allocated = await self.state.incr_counters(_META, "generation", {"allocated": 1})
+        generation = allocated["allocated"]
+        counted = 0
+        for conversation in conversations:
+            for message in conversation.get("conversation", []):
+                if message.get("feedback_vote") and message.get("user_message"):
+                    await self._count(
+                        generation,
+                        message["user_message"],
+                        message["feedback_vote"],
+                        message.get("timestamp"),
+                        1,
+                    )
+                    counted += 1
+        # A single counter update, so readers see either the old or the new generation
+        current = await self.generation()
+        await self.state.incr_counters(_META, "generation", {"current": generation - current})
+        logger.info("Rebuilt feedback view generation %s from %s stored votes", generation, counted)
+        return counted
+
+
+def seed(conversations: Any) -> int:
+    """
+    Rebuild the feedback view at startup unless the backend already holds one.
+
+    Runs on its own event loop in a worker thread, so it can be called from
+    the synchronous warm-up whether or not a loop is running. A shared
+    backend (Redis) gets a dedicated client, since the server's client
+    belongs to the server's event loop.
+
+    Args:
+        conversations (ConversationStore): Store whose votes are counted
+
+    Returns:
+        int: Votes counted, 0 if the view was already built
+    """
+    async def run() -> int:
+        state = get_session_state()
+        own_state = type(state)() if state.shared else None
+        try:
+            view = FeedbackView(own_state or state)
+            if await view.generation():
+                logger.info("Feedback view already built; not seeding")
+                return 0
+            return await view.rebuild(conversations.iter_conversations())
+        finally:
+            if own_state is not None:
+                await own_state.close()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, run()).result()
+
+
+feedback_view = FeedbackView()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Read or seed the feedback view.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild", help="Count the votes stored in conversations")
+    question = commands.add_parser("question", help="Show the votes of questions")
+    question.add_argument("questions", nargs="+")
+    day = commands.add_parser("day", help="Show the votes of days (YYYY-MM-DD)")
+    day.add_argument("days", nargs="+")
+    args = parser.parse_args()
+
+    async def run() -> Dict[str, Any]:
+        if args.command == "rebuild":
+            from storage import create_conversation_store
+
+            if not feedback_view.state.shared:
+                logger.warning("SESSION_STATE_BACKEND is not redis: the rebuilt view stays in this process")
+
+            return {"counted": await feedback_view.rebuild(create_conversation_store().iter_conversations())}
+        if args.command == "question":
+            return {q: await feedback_view.for_question(q) for q in args.questions}
+        return {d: await feedback_view.for_day(d) for d in args.days}
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Lifecycle of threads, steps and conversations after a user disconnects.
+
+on_chat_end used to delete the thread and all its steps on every
+disconnect. That put a cross-partition query and one delete per step on
+the request path, made on_chat_resume useless, and turned network blips
+into data loss. The policy is selected by LIFECYCLE_MODE:
+
+- "ttl" (default): nothing is deleted on the request path. Steps and
+  threads carry a Cosmos DB "ttl" stamped on every write, so they expire
+  that many seconds after their last write and the database removes them
+  in the background. A disconnect reads the thread and shortens the TTL of
+  the thread (one point write) and of its steps (one transactional batch
+  per 100 steps with the /threadId steps layout) to the grace period, so
+  steps do not outlive their thread. A resume within the grace period
+  restores both TTLs. Threads worth keeping (with feedback, or tagged with
+  one of LIFECYCLE_ARCHIVE_TAGS) are first copied with their steps and
+  conversation into the archive, which never expires. The thread's TTL write
+  records the copy in its "archivedAt". Any rewrite of the thread
+  (stamp) clears it, and later disconnects only copy again if the thread
+  was rewritten or the conversation has turns newer than "archivedAt".
+  Otherwise they cost one conversation point read on top of the thread
+  read and TTL writes.
+- "delete": the previous behaviour, delete the thread and its steps.
+- "keep": leave everything in place.
+
+Per-item TTLs only take effect on containers with TTL enabled (default
+TTL -1); containers created by this application enable it in "ttl" mode.
+The SQLite backend has no native expiry: it records an expiry time and
+purge_expired deletes expired rows, at most every
+LIFECYCLE_PURGE_INTERVAL_SECONDS.
+
+Configuration:
+    LIFECYCLE_MODE: "ttl" (default), "delete" or "keep"
+    LIFECYCLE_STEPS_TTL_SECONDS: Step lifetime after its last write (default 2592000, 30 days)
+    LIFECYCLE_THREADS_TTL_SECONDS: Thread lifetime after its last write (default 2592000)
+    LIFECYCLE_CONVERSATIONS_TTL_SECONDS: Conversation lifetime, 0 to keep forever (default 0)
+    LIFECYCLE_GRACE_SECONDS: Thread and step lifetime after a disconnect (default 86400)
+    LIFECYCLE_ARCHIVE_FEEDBACK: "true" to archive threads with feedback (default "true")
+    LIFECYCLE_ARCHIVE_TAGS: Comma-separated thread tags that trigger archival (default "")
+    LIFECYCLE_ARCHIVE_CONTAINER: Cosmos DB container of archived threads (default "archive")
+    LIFECYCLE_PURGE_INTERVAL_SECONDS: Minimum seconds between SQLite purges (default 3600)
+"""
+
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from utils import setup_logger
+from metrics import registry
+from storage import StorageNotFoundError
+from session_state import get_session_state
+
+logger = setup_logger("lifecycle")
+
+LIFECYCLE_MODE = os.getenv("LIFECYCLE_MODE", "ttl").lower()
+LIFECYCLE_STEPS_TTL_SECONDS = int(os.getenv("LIFECYCLE_STEPS_TTL_SECONDS", "2592000"))
+LIFECYCLE_THREADS_TTL_SECONDS = int(os.getenv("LIFECYCLE_THREADS_TTL_SECONDS", "2592000"))
+LIFECYCLE_CONVERSATIONS_TTL_SECONDS = int(os.getenv("LIFECYCLE_CONVERSATIONS_TTL_SECONDS", "0"))
+LIFECYCLE_GRACE_SECONDS = int(os.getenv("LIFECYCLE_GRACE_SECONDS", "86400"))
+LIFECYCLE_ARCHIVE_FEEDBACK = os.getenv("LIFECYCLE_ARCHIVE_FEEDBACK", "true").lower() in ("1", "true", "yes")
+LIFECYCLE_ARCHIVE_TAGS = [
+    tag.strip() for tag in os.getenv("LIFECYCLE_ARCHIVE_TAGS", "").split(",") if tag.strip()
+]
+LIFECYCLE_ARCHIVE_CONTAINER = os.getenv("LIFECYCLE_ARCHIVE_CONTAINER", "archive")
+LIFECYCLE_PURGE_INTERVAL_SECONDS = float(os.getenv("LIFECYCLE_PURGE_INTERVAL_SECONDS", "3600"))
+
+LIFECYCLE_SESSION_ENDS = registry.counter(
+    "lifecycle_session_ends_total",
+    "Disconnects by lifecycle action (deleted, expiring, archived, kept, failed)",
+    ["action"],
+)
+
+
+class LifecyclePolicy:
+    """
+    Applies LIFECYCLE_MODE to stored items and disconnects.
+
+    Attributes:
+        mode (str): "ttl", "delete" or "keep"
+        ttls (Dict[str, int]): TTL in seconds per container kind ("steps",
+            "threads", "conversations"); 0 or less means no expiry
+        grace (int): Thread and step TTL after a disconnect
+        archive_feedback (bool): Archive threads holding feedback
+        archive_tags (List[str]): Thread tags that trigger archival
+    """
+
+    def __init__(
+        self,
+        mode: str = LIFECYCLE_MODE,
+        steps_ttl: int = LIFECYCLE_STEPS_TTL_SECONDS,
+        threads_ttl: int = LIFECYCLE_THREADS_TTL_SECONDS,
+        conversations_ttl: int = LIFECYCLE_CONVERSATIONS_TTL_SECONDS,
+        grace: int = LIFECYCLE_GRACE_SECONDS,
+        archive_feedback: bool = LIFECYCLE_ARCHIVE_FEEDBACK,
+        archive_tags: Optional[List[str]] = None,
+        purge_interval: float = LIFECYCLE_PURGE_INTERVAL_SECONDS,
+    ) -> None:
+        if mode not in ("ttl", "delete", "keep"):
+            raise ValueError(f"Unknown LIFECYCLE_MODE: {mode}")
+        self.mode = mode
+        self.ttls = {"steps": steps_ttl, "threads": threads_ttl, "conversations": conversations_ttl}
+        self.grace = grace
+        self.archive_feedback = archive_feedback
+        self.archive_tags = LIFECYCLE_ARCHIVE_TAGS if archive_tags is None else archive_tags
+        self.purge_interval = purge_interval
+        self._last_purge = float("-inf")
+
+    @property
+    def uses_ttl(self) -> bool:
+        """Whether containers need TTL enabled."""
+        return self.mode == "ttl"
+
+    def stamp(self, item: Dict[str, Any], kind: str) -> Dict[str, Any]:
+        """
+        Set the TTL of an item about to be written, in place.
+
+        A rewritten thread has changed since its last archival, so its
+        "archivedAt" is dropped.
+
+        Args:
+            item (Dict[str, Any]): Document
+            kind (str): "steps", "threads" or "conversations"
+
+        Returns:
+            Dict[str, Any]: The same document
+        """
+        if self.mode == "ttl" and self.ttls[kind] > 0:
+            item["ttl"] = self.ttls[kind]
+        if kind == "threads":
+            item.pop("archivedAt", None)
+        return item
+
+    def should_archive(self, thread: Dict[str, Any]) -> bool:
+        """Return True if a thread must outlive its TTL."""
+        if self.archive_feedback and thread.get("feedback"):
+            return True
+        return any(tag in self.archive_tags for tag in thread.get("tags") or [])
+
+    @staticmethod
+    def archive_is_current(thread: Dict[str, Any], conversation: Optional[Dict[str, Any]]) -> bool:
+        """Return True if nothing changed since the thread was last archived."""
+        archived_at = thread.get("archivedAt")
+        if not archived_at:
+            return False
+        messages = (conversation or {}).get("conversation") or []
+        return all((message.get("timestamp") or "") <= archived_at for message in messages)
+
+    def _archive(
+        self, thread_store: Any, thread: Dict[str, Any], conversation: Optional[Dict[str, Any]]
+    ) -> str:
+        thread_id = thread["id"]
+        archived_at = datetime.now(timezone.utc).isoformat()
+        thread_store.archive_thread({
+            "id": thread_id,
+            "archived_at": archived_at,
+            "thread": thread,
+            "steps": thread_store.list_steps(thread_id),
+            "conversation": conversation,
+        })
+        logger.info("Archived thread %s", thread_id)
+        return archived_at
+
+    def _end(self, data_layer: Any, thread_id: str) -> str:
+        thread_store = data_layer.thread_store
+        if self.mode == "keep":
+            return "kept"
+        if self.mode == "delete":
+            try:
+                thread_store.delete_thread(thread_id)
+            except StorageNotFoundError:
+                # Threads are only stored once they hold feedback; delete the steps anyway
+                thread_store.delete_thread_steps(thread_id)
+            return "deleted"
+
+        self.maybe_purge(thread_store)
+        thread = thread_store.get_thread(thread_id)
+        thread_store.set_steps_ttl(thread_id, self.grace)
+        if thread is None:
+            # No thread document; only the steps expire
+            return "expiring"
+        action, archived_at = "expiring", None
+        if self.should_archive(thread):
+            conversations = getattr(data_layer, "conversations", None)
+            conversation = (conversations.get_data(thread_id) or None) if conversations is not None else None
+            if not self.archive_is_current(thread, conversation):
+                archived_at = self._archive(thread_store, thread, conversation)
+                action = "archived"
+        thread_store.set_thread_ttl(thread_id, self.grace, archived_at)
+        return action
+
+    async def end_session(self, data_layer: Any, thread_id: str) -> str:
+        """
+        Apply the policy to a thread whose user disconnected.
+
+        Storage calls run in a worker thread. Failures are logged, not
+        raised: an item left behind only costs storage until it expires.
+
+        Args:
+            data_layer (CustomDataLayer): Data layer holding the thread and conversation stores
+            thread_id (str): Thread of the ended session
+
+        Returns:
+            str: Action taken ("deleted", "expiring", "archived", "kept" or "failed")
+        """
+        try:
+            action = await asyncio.to_thread(self._end, data_layer, thread_id)
+            if action == "deleted":
+                await get_session_state().delete_history(thread_id)
+        except Exception as e:
+            logger.error("Lifecycle action failed for thread %s: %s", thread_id, e)
+            action = "failed"
+        LIFECYCLE_SESSION_ENDS.inc(action=action)
+        logger.info("Session end for thread %s: %s", thread_id, action)
+        return action
+
+    async def resume(self, data_layer: Any, thread_id: str) -> None:
+        """Restore the full TTL of a thread and its steps resumed within the grace period."""
+        if self.mode != "ttl":
+            return
+        thread_store = data_layer.thread_store
+        try:
+            # -1: steps without a configured lifetime never expire again
+            await asyncio.to_thread(
+                thread_store.set_steps_ttl, thread_id, self.ttls["steps"] if self.ttls["steps"] > 0 else -1
+            )
+            if self.ttls["threads"] > 0:
+                await asyncio.to_thread(thread_store.set_thread_ttl, thread_id, self.ttls["threads"])
+        except StorageNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Could not restore TTL of thread %s: %s", thread_id, str(e))
+
+    def maybe_purge(self, thread_store: Any) -> int:
+        """Delete expired items on backends without native expiry, at most once per interval."""
+        now = time.monotonic()
+        if now - self._last_purge < self.purge_interval:
+            return 0
+        self._last_purge = now
+        purged = thread_store.purge_expired()
+        if purged:
+            logger.info("Purged %s expired items", purged)
+        return purged
+
+
+lifecycle = LifecyclePolicy()
@@ -0,0 +1,257 @@
+"""
+Response-side localization for the Copilot UI application.
+
+This module translates chat turns into the session language without adding
+avoidable round trips to the response path:
+- Translations are cached in-process (LRU), so repeated FAQ answers are
+  translated once per worker, and in the shared session state when it is
+  shared (e.g. Redis), so they are translated once per deployment
+- Translations stored with earlier conversation turns can seed the cache
+- Query and answer translations run concurrently with other work
+
+Failures never break a chat turn; the original text is used instead.
+"""
+
+import os
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from utils import setup_logger
+
+load_dotenv()
+
+logger = setup_logger("localization")
+
+SOURCE_LANGUAGE = os.getenv("SOURCE_LANGUAGE", "en")
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "2048"))
+# Cache key used for translations whose source language was auto-detected
+AUTO_DETECT = "auto"
+
+
+class TranslationCache:
+    """
+    Bounded LRU cache of translations keyed by (source, target, text).
+
+    Attributes:
+        max_size (int): Maximum number of cached translations
+        hits (int): Number of cache hits
+        misses (int): Number of cache misses
+    """
+
+    def __init__(self, max_size: int = TRANSLATION_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+
+    def get(self, source: str, target: str, text: str) -> Optional[str]:
+        """Return a cached translation, or None if not cached."""
+        key = (source, target, text)
+        translated = self._items.get(key)
+        if translated is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return translated
+
+    def put(self, source: str, target: str, text: str, translated: str) -> None:
+        """Store a translation, evicting the least recently used entry if full."""
+        key = (source, target, text)
+        self._items[key] = translated
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+translation_cache = TranslationCache()
+
+
+def _shared_cache_key(source: str, target: str, text: str) -> str:
+    """Return the shared-cache key of a translation."""
+    return hashlib.sha256(f"{source}\x1f{target}\x1f{text}".encode("utf-8")).hexdigest()
+
+
+async def _get_shared(source: str, target: str, text: str) -> Optional[str]:
+    """Look a translation up in the shared session state, if it is shared across workers."""
+    try:
+        from session_state import get_session_state
+
+        state = get_session_state()
+        if not state.shared:
+            return None
+        return await state.get_cached("translation", _shared_cache_key(source, target, text))
+    except Exception as e:
+        logger.warning("Shared translation cache lookup failed: %s", e)
+        return None
+
+
+async def _put_shared(source: str, target: str, text: str, translated: str) -> None:
+    """Store a translation in the shared session state, if it is shared across workers."""
+    try:
+        from session_state import get_session_state
+
+        state = get_session_state()
+        if state.shared:
+            await state.set_cached("translation", _shared_cache_key(source, target, text), translated)
+    except Exception as e:
+        logger.warning("Shared translation cache update failed: %s", e)
+
+
+def _primary_subtag(language: Optional[str]) -> str:
+    """Return the lower-cased primary language subtag ('en-US' -> 'en')."""
+    return (language or "").split("-")[0].lower()
+
+
+def is_localization_enabled(language: Optional[str]) -> bool:
+    """
+    Check whether answers need translating for the given language.
+
+    Args:
+        language (Optional[str]): Session language code
+
+    Returns:
+        bool: True if a translator is configured and the language differs from SOURCE_LANGUAGE
+    """
+    if not language or _primary_subtag(language) == _primary_subtag(SOURCE_LANGUAGE):
+        return False
+    return bool(
+        os.getenv("AZURE_TRANSLATE_API_ENDPOINT") and os.getenv("AZURE_TRANSLATE_API_KEY")
+    )
+
+
+async def localize(
+    text: str, target_language: str, source_language: Optional[str] = SOURCE_LANGUAGE
+) -> str:
+    """
+    Translate text, serving from cache when possible.
+
+    Args:
+        text (str): Text to translate
+        target_language (str): Target language code
+        source_language (Optional[str]): Source language code, or None to auto-detect
+
+    Returns:
+        str: Translated text, or the original text if translation fails
+    """
+    if not text:
+        return text
+
+    cache_source = source_language or AUTO_DETECT
+    cached = translation_cache.get(cache_source, target_language, text)
+    if cached is not None:
+        return cached
+
+    # Another worker may already have translated this text
+    shared = await _get_shared(cache_source, target_language, text)
+    if shared is not None:
+        translation_cache.put(cache_source, target_language, text, shared)
+        return shared
+
+    try:
+        # Imported lazily so the translator is only set up when needed
+        from translation_helper import get_translator
+
+        result = await get_translator().translate(text, [target_language], source_language)
+        translated = result.get(target_language)
+        if not translated:
+            return text
+        translation_cache.put(cache_source, target_language, text, translated)
+        await _put_shared(cache_source, target_language, text, translated)
+        return translated
+
+    except Exception as e:
+        logger.warning("Translation to %s failed, using original text: %s", target_language, e)
+        return text
+
+
+def start_query_localization(query: str, language: Optional[str]) -> Optional["asyncio.Task"]:
+    """
+    Start translating the user's query into SOURCE_LANGUAGE in the background.
+
+    The query's language is auto-detected, since users do not always write
+    in their session language.
+
+    Args:
+        query (str): The user's message
+        language (Optional[str]): Session language code
+
+    Returns:
+        Optional[asyncio.Task]: Task resolving to the translated query, or None if not needed
+    """
+    if not is_localization_enabled(language):
+        return None
+    return asyncio.create_task(
+        localize(query, target_language=SOURCE_LANGUAGE, source_language=None)
+    )
+
+
+async def localize_turn(
+    query: str,
+    answer: str,
+    language: Optional[str],
+    query_task: Optional["asyncio.Task"] = None,
+) -> Optional[Dict[str, str]]:
+    """
+    Localize a chat turn: the answer into the session language and the query into SOURCE_LANGUAGE.
+
+    Args:
+        query (str): Original user message
+        answer (str): Answer in SOURCE_LANGUAGE
+        language (Optional[str]): Session language code
+        query_task (Optional[asyncio.Task]): Task from start_query_localization, if started
+
+    Returns:
+        Optional[Dict[str, str]]: Translation record for storage, or None if not needed
+    """
+    if not is_localization_enabled(language):
+        return None
+
+    if query_task is None:
+        query_task = start_query_localization(query, language)
+
+    translated_answer, translated_query = await asyncio.gather(
+        localize(answer, target_language=language),
+        query_task,
+    )
+    return {
+        "language": language,
+        "source_language": SOURCE_LANGUAGE,
+        "user_message": translated_query,
+        "ai_answer": translated_answer,
+    }
+
+
+def seed_from_conversation(messages: Iterable[Dict]) -> int:
+    """
+    Seed the translation cache from stored conversation messages.
+
+    Args:
+        messages (Iterable[Dict]): Messages from a stored conversation
+
+    Returns:
+        int: Number of translations added to the cache
+    """
+    seeded = 0
+    for message in messages:
+        translation = message.get("translation")
+        if not translation:
+            continue
+        language = translation.get("language")
+        source = translation.get("source_language", SOURCE_LANGUAGE)
+        if message.get("ai_answer") and translation.get("ai_answer"):
+            translation_cache.put(source, language, message["ai_answer"], translation["ai_answer"])
+            seeded += 1
+        if message.get("user_message") and translation.get("user_message"):
+            translation_cache.put(
+                AUTO_DETECT, source, message["user_message"], translation["user_message"]
+            )
+            seeded += 1
+    return seeded
@@ -0,0 +1,223 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+A watchdog thread schedules a heartbeat callback on the event loop at a
+fixed interval and measures how late it runs. Every measured lag is
+recorded in the event_loop_lag_seconds histogram. When a heartbeat is
+late by more than the threshold, the loop is stuck in a blocking call:
+the watchdog captures the event-loop thread's stack with
+sys._current_frames() and logs the offending application call site
+(e.g. a synchronous Cosmos DB or requests call inside an async handler).
+
+The loop itself only runs one tiny callback per interval and stacks are
+captured only during stalls, so the monitor can run in production.
+
+Configuration:
+    LOOP_MONITOR_ENABLED: "true" to start the monitor (default "false")
+    LOOP_MONITOR_INTERVAL_SECONDS: heartbeat interval (default 0.5)
+    LOOP_MONITOR_THRESHOLD_SECONDS: lag reported as blocking (default 0.1)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import setup_logger
+from metrics import registry
+
+logger = setup_logger("loop_monitor")
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() in ("1", "true", "yes")
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.5"))
+LOOP_MONITOR_THRESHOLD_SECONDS = float(os.getenv("LOOP_MONITOR_THRESHOLD_SECONDS", "0.1"))
+# Frames of the captured stack included in the log record
+LOOP_MONITOR_STACK_DEPTH = int(os.getenv("LOOP_MONITOR_STACK_DEPTH", "15"))
+
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay between scheduling and running the event-loop heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+BLOCKING_CALLS = registry.counter(
+    "event_loop_blocking_calls_total",
+    "Event-loop stalls longer than the threshold, by application call site",
+    ["call_site"],
+)
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_LIBRARY_MARKERS = ("site-packages", "dist-packages", f"{os.sep}lib{os.sep}python")
+
+
+def _is_application_frame(filename: str) -> bool:
+    """Return True for frames from this application's source files."""
+    path = os.path.abspath(filename)
+    return path.startswith(_APP_DIR) and not any(marker in path for marker in _LIBRARY_MARKERS)
+
+
+def find_call_site(stack: List[traceback.FrameSummary]) -> str:
+    """
+    Pick the innermost application frame of a stack.
+
+    That frame is where the application made the blocking call, even when
+    the thread is actually waiting deeper inside a library or the stdlib.
+
+    Args:
+        stack (List[traceback.FrameSummary]): Stack, outermost frame first
+
+    Returns:
+        str: "file.py:line function", or the innermost frame if no application frame is found
+    """
+    for frame in reversed(stack):
+        if _is_application_frame(frame.filename):
+            return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+    return "unknown"
+
+
+class LoopMonitor:
+    """
+    Watchdog measuring event-loop lag and reporting blocking call sites.
+
+    Attributes:
+        interval (float): Seconds between heartbeats
+        threshold (Optional[float]): Lag in seconds reported as a blocking call,
+            or None to only measure lag
+        stalls (int): Number of stalls detected
+        max_lag (float): Largest lag observed in seconds
+        call_sites (Dict[str, int]): Stall count per application call site
+        samples (Optional[List[float]]): Every observed lag in seconds, when
+            keep_samples is set (benchmarks)
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL_SECONDS,
+        threshold: Optional[float] = LOOP_MONITOR_THRESHOLD_SECONDS,
+        stack_depth: int = LOOP_MONITOR_STACK_DEPTH,
+        keep_samples: bool = False,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_depth = stack_depth
+        self.stalls = 0
+        self.max_lag = 0.0
+        self.call_sites: Dict[str, int] = {}
+        self.samples: Optional[List[float]] = [] if keep_samples else None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._beat = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Start watching a loop. Must be called from the loop's thread.
+
+        Args:
+            loop (Optional[asyncio.AbstractEventLoop]): Loop to watch. Defaults to the running loop
+        """
+        if self.running:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Event-loop monitor started (interval=%.3fs, threshold=%s)",
+            self.interval, f"{self.threshold:.3f}s" if self.threshold is not None else "off"
+        )
+
+    def stop(self) -> None:
+        """Stop the watchdog thread."""
+        self._stop.set()
+        self._beat.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + (self.threshold or 0) + 1)
+        self._thread = None
+
+    def _capture_stack(self) -> List[traceback.FrameSummary]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return []
+        return traceback.extract_stack(frame)
+
+    def _report_stall(self, stack: List[traceback.FrameSummary], lag: float) -> None:
+        call_site = find_call_site(stack)
+        self.stalls += 1
+        self.call_sites[call_site] = self.call_sites.get(call_site, 0) + 1
+        BLOCKING_CALLS.inc(call_site=call_site)
+        logger.warning(
+            "Event loop blocked for %.0f ms at %s\n%s",
+            lag * 1000,
+            call_site,
+            "".join(traceback.format_list(stack[-self.stack_depth:])).rstrip()
+        )
+
+    def _watch(self) -> None:
+        while not self._stop.is_set():
+            self._beat.clear()
+            sent = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(self._beat.set)
+            except RuntimeError:
+                # The loop was closed
+                return
+
+            stack: List[traceback.FrameSummary] = []
+            if self.threshold is None:
+                self._beat.wait()
+            elif not self._beat.wait(self.threshold):
+                # Still not run: capture where the loop thread is stuck
+                stack = self._capture_stack()
+                self._beat.wait()
+            if self._stop.is_set():
+                return
+
+            lag = time.monotonic() - sent
+            EVENT_LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if self.samples is not None:
+                self.samples.append(lag)
+            if stack:
+                self._report_stall(stack, lag)
+            self._stop.wait(self.interval)
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """Return stall counters and the most frequent blocking call sites."""
+        sites: List[Tuple[str, int]] = sorted(
+            self.call_sites.items(), key=lambda item: item[1], reverse=True
+        )
+        return {
+            "running": self.running,
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "call_sites": dict(sites[:top]),
+        }
+
+
+loop_monitor = LoopMonitor()
+
+
+def start_loop_monitor() -> bool:
+    """
+    Start the shared monitor on the running loop if LOOP_MONITOR_ENABLED is set.
+
+    Safe to call repeatedly (e.g. from every chat start).
+
+    Returns:
+        bool: True if the monitor is running
+    """
+    if LOOP_MONITOR_ENABLED and not loop_monitor.running:
+        loop_monitor.start()
+    return loop_monitor.running
@@ -0,0 +1,401 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Provides counters, gauges and latency histograms (with optional labels),
+callback metrics that read values from existing components at scrape
+time, and a /metrics route for the Chainlit FastAPI server.
+
+Example:
+    >>> MESSAGES = registry.counter("chat_messages_total", "Chat messages", ["input"])
+    >>> MESSAGES.inc(input="text")
+    >>> print(registry.render())
+"""
+
+import re
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+from utils import setup_logger
+
+logger = setup_logger("metrics")
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """Base class holding name, help text and label names."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.label_names}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """Increase the counter."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: Any) -> float:
+        """Return the current value."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        """Set the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """Increase the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        """Decrease the gauge."""
+        self.inc(-amount, **labels)
+
+    def get(self, **labels: Any) -> float:
+        """Return the current value."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram of observed values (e.g. latencies in seconds)."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Record an observation."""
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.label_names + ("le",), key + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """
+    Metric whose values are read from a callback at scrape time.
+
+    The callback returns a mapping of label-value tuples to numbers, which
+    lets existing components (caches, breakers) expose their own counters.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        callback: Callable[[], Dict[LabelValues, float]],
+        label_names: Sequence[str] = (),
+        type_name: str = "gauge",
+    ) -> None:
+        super().__init__(name, help_text, label_names)
+        self.callback = callback
+        self.type_name = type_name
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning("Metric callback %s failed: %s", self.name, e)
+            return []
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered with another type")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        """Create (or return the existing) counter."""
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        """Create (or return the existing) gauge."""
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Create (or return the existing) histogram."""
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def callback(
+        self,
+        name: str,
+        help_text: str,
+        callback: Callable[[], Dict[LabelValues, float]],
+        label_names: Sequence[str] = (),
+        type_name: str = "gauge",
+    ) -> CallbackMetric:
+        """Register a metric read from a callback at scrape time."""
+        with self._lock:
+            metric = CallbackMetric(name, help_text, callback, label_names, type_name)
+            self._metrics[name] = metric
+            return metric
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Core application metrics
+MESSAGES_TOTAL = registry.counter(
+    "chat_messages_total", "Chat messages received", ["input"]
+)
+ACTIVE_SESSIONS = registry.gauge(
+    "chat_active_sessions", "Chat sessions currently connected"
+)
+AUDIO_BYTES_TOTAL = registry.counter(
+    "audio_bytes_received_total", "Raw audio bytes received from clients"
+)
+TURN_LATENCY = registry.histogram(
+    "chat_turn_latency_seconds", "End-to-end latency of a chat turn", ["input"]
+)
+ENDPOINT_LATENCY = registry.histogram(
+    "databricks_endpoint_latency_seconds", "Latency of Databricks endpoint calls", ["outcome"]
+)
+COSMOS_REQUEST_CHARGE = registry.counter(
+    "cosmos_request_units_total", "Cosmos DB request units consumed", ["container", "method"]
+)
+COSMOS_REQUESTS = registry.counter(
+    "cosmos_requests_total", "Cosmos DB requests", ["container", "method", "status"]
+)
+ERRORS_TOTAL = registry.counter(
+    "errors_total", "Errors by pipeline stage", ["stage"]
+)
+
+_caches: Dict[str, Callable[[], Tuple[float, float]]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], Tuple[float, float]]) -> None:
+    """
+    Expose a cache's hit and miss counts as cache_requests_total.
+
+    Args:
+        name (str): Cache name used as the "cache" label
+        stats (Callable[[], Tuple[float, float]]): Returns (hits, misses)
+    """
+    _caches[name] = stats
+
+
+def _cache_samples() -> Dict[LabelValues, float]:
+    samples: Dict[LabelValues, float] = {}
+    for name, stats in list(_caches.items()):
+        hits, misses = stats()
+        samples[(name, "hit")] = hits
+        samples[(name, "miss")] = misses
+    return samples
+
+
+registry.callback(
+    "cache_requests_total", "Cache lookups by result", _cache_samples,
+    ["cache", "result"], type_name="counter"
+)
+
+_COSMOS_RESOURCE = re.compile(r"/dbs/[^/]+/colls/([^/]+)")
+
+
+def record_cosmos_response(response: Any) -> None:
+    """
+    Record RU charge and status of a Cosmos DB response.
+
+    Installed as the CosmosClient raw_response_hook, so it sees every
+    request made through the shared client.
+
+    Args:
+        response (Any): azure.core PipelineResponse
+    """
+    try:
+        http_response = response.http_response
+        match = _COSMOS_RESOURCE.search(http_response.request.url)
+        container = match.group(1) if match else "account"
+        method = http_response.request.method
+        COSMOS_REQUESTS.inc(container=container, method=method, status=http_response.status_code)
+        charge = http_response.headers.get("x-ms-request-charge")
+        if charge:
+            COSMOS_REQUEST_CHARGE.inc(float(charge), container=container, method=method)
+    except Exception as e:
+        logger.debug("Could not record Cosmos response metrics: %s", e)
+
+
+def mount_metrics_route(app: Any, path: str = "/metrics") -> None:
+    """
+    Serve the registry on a route of the Chainlit FastAPI app.
+
+    Chainlit registers a catch-all route for its frontend, so the metrics
+    route is moved in front of it.
+
+    Args:
+        app (Any): FastAPI application (chainlit.server.app)
+        path (str): Route path
+    """
+    from fastapi import Response
+
+    async def metrics_endpoint() -> Response:
+        return Response(
+            content=registry.render(),
+            media_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+    app.add_api_route(path, metrics_endpoint, methods=["GET"], include_in_schema=False)
+    routes = app.router.routes
+    route = next(
+        candidate for candidate in routes
+        if getattr(candidate, "path", None) == path
+        and getattr(candidate, "endpoint", None) is metrics_endpoint
+    )
+    routes.remove(route)
+    routes.insert(0, route)
+    logger.info("Metrics exposed on %s", path)
@@ -0,0 +1,176 @@
+"""
+Copy steps from the legacy steps container into the one partitioned by thread.
+
+The legacy container is partitioned by the step id (CHAINLIT_COSMOS_PARTITION_KEY),
+so every per-thread operation has to query all partitions. The new container
+(CHAINLIT_STEPS_BY_THREAD_CONTAINER) is partitioned by /threadId. Cutover:
+
+1. Deploy with STEPS_LAYOUT=dual: new steps go to the new container, and
+   reads fall back to the legacy container
+2. Run this script. It copies every legacy step, one worker per feed range.
+   Steps already in the new container are kept, because they were written
+   later. Re-running it is safe
+3. Check with --verify that every legacy step resolves in the new
+   container under its threadId. Then deploy with STEPS_LAYOUT=thread and
+   drop the legacy container
+
+Usage:
+    python migrate_steps.py [--workers 8] [--verify]
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from azure.cosmos.exceptions import CosmosResourceExistsError, CosmosResourceNotFoundError
+
+from utils import setup_logger
+
+logger = setup_logger("migrate_steps")
+
+# Properties Cosmos DB sets on every item; they must not be copied
+_SYSTEM_PROPERTIES = ("_rid", "_self", "_etag", "_attachments", "_ts", "_lsn")
+# Missing step ids listed in the --verify report
+_MAX_REPORTED_MISSING = 20
+
+
+def copy_range(legacy: Any, target: Any, feed_range: Any) -> Dict[str, int]:
+    """
+    Copy the legacy steps of one feed range.
+
+    Args:
+        legacy (ContainerProxy): Legacy steps container
+        target (ContainerProxy): Steps container partitioned by /threadId
+        feed_range (Any): Feed range of the legacy container
+
+    Returns:
+        Dict[str, int]: Steps "copied", "existing" (already migrated) and "skipped" (no threadId)
+    """
+    counts = {"copied": 0, "existing": 0, "skipped": 0}
+    for step in legacy.query_items_change_feed(feed_range=feed_range, start_time="Beginning"):
+        if not step.get("threadId"):
+            counts["skipped"] += 1
+            continue
+        body = {key: value for key, value in step.items() if key not in _SYSTEM_PROPERTIES}
+        try:
+            target.create_item(body=body)
+            counts["copied"] += 1
+        except CosmosResourceExistsError:
+            counts["existing"] += 1
+    return counts
+
+
+def migrate(legacy: Any, target: Any, workers: int = 8) -> Dict[str, int]:
+    """
+    Copy every legacy step into the container partitioned by thread.
+
+    Args:
+        legacy (ContainerProxy): Legacy steps container
+        target (ContainerProxy): Steps container partitioned by /threadId
+        workers (int): Parallel feed ranges
+
+    Returns:
+        Dict[str, int]: Totals of copy_range
+    """
+    start = time.perf_counter()
+    feed_ranges = list(legacy.read_feed_ranges())
+    totals = {"copied": 0, "existing": 0, "skipped": 0}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(feed_ranges)))) as pool:
+        for counts in pool.map(lambda feed_range: copy_range(legacy, target, feed_range), feed_ranges):
+            for key, value in counts.items():
+                totals[key] += value
+    logger.info(
+        "Migrated steps from %s feed ranges in %.1f s: %s",
+        len(feed_ranges), time.perf_counter() - start, totals
+    )
+    return totals
+
+
+def verify_range(legacy: Any, target: Any, feed_range: Any) -> Dict[str, Any]:
+    """
+    Check that every legacy step of one feed range exists in the target.
+
+    Args:
+        legacy (ContainerProxy): Legacy steps container
+        target (ContainerProxy): Steps container partitioned by /threadId
+        feed_range (Any): Feed range of the legacy container
+
+    Returns:
+        Dict[str, Any]: Steps "found", "missing" and "skipped" (no threadId), and "missing_ids"
+    """
+    report: Dict[str, Any] = {"found": 0, "missing": 0, "skipped": 0, "missing_ids": []}
+    for step in legacy.query_items_change_feed(feed_range=feed_range, start_time="Beginning"):
+        if not step.get("threadId"):
+            report["skipped"] += 1
+            continue
+        try:
+            target.read_item(item=step["id"], partition_key=step["threadId"])
+            report["found"] += 1
+        except CosmosResourceNotFoundError:
+            report["missing"] += 1
+            report["missing_ids"].append(step["id"])
+    return report
+
+
+def verify(legacy: Any, target: Any, workers: int = 8) -> Dict[str, Any]:
+    """
+    Check every legacy step by id, one worker per feed range.
+
+    Counts alone cannot tell: in the "dual" layout new steps are only
+    written to the target, which hides legacy steps that were not copied.
+
+    Args:
+        legacy (ContainerProxy): Legacy steps container
+        target (ContainerProxy): Steps container partitioned by /threadId
+        workers (int): Parallel feed ranges
+
+    Returns:
+        Dict[str, Any]: Totals of verify_range, with up to 20 missing step ids
+    """
+    feed_ranges = list(legacy.read_feed_ranges())
+    totals: Dict[str, Any] = {"found": 0, "missing": 0, "skipped": 0}
+    missing_ids: List[str] = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(feed_ranges)))) as pool:
+        for report in pool.map(lambda feed_range: verify_range(legacy, target, feed_range), feed_ranges):
+            missing_ids.extend(report.pop("missing_ids"))
+            for key, value in report.items():
+                totals[key] += value
+    totals["missing_ids"] = missing_ids[:_MAX_REPORTED_MISSING]
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Copy steps into the container partitioned by thread.")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel feed ranges")
+    parser.add_argument("--verify", action="store_true", help="Only check that every legacy step was copied")
+    args = parser.parse_args()
+
+    from cosmos_db import get_cosmos_client
+    from cosmos_schema import ensure_container, steps_spec
+    from data_layer import (
+        CHAINLIT_COSMOS_DB_NAME,
+        CHAINLIT_COSMOS_PARTITION_KEY,
+        CHAINLIT_STEPS_BY_THREAD_CONTAINER,
+        CHAINLIT_STEPS_CONTAINER,
+    )
+
+    if CHAINLIT_COSMOS_PARTITION_KEY == "/threadId":
+        parser.error("CHAINLIT_COSMOS_PARTITION_KEY is already /threadId; nothing to migrate")
+
+    client = get_cosmos_client(os.getenv("COSMOS_DB_HOST"), os.getenv("COSMOS_DB_KEY"))
+    database = client.get_database_client(CHAINLIT_COSMOS_DB_NAME)
+    legacy = database.get_container_client(CHAINLIT_STEPS_CONTAINER)
+    target = ensure_container(database, steps_spec(CHAINLIT_STEPS_BY_THREAD_CONTAINER, "/threadId"))
+
+    if args.verify:
+        report = verify(legacy, target, args.workers)
+    else:
+        report = migrate(legacy, target, args.workers)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
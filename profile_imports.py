@@ -0,0 +1,191 @@
+"""
+Import-time profile report for the Copilot UI application.
+
+Runs ``python -X importtime -c "import <module>"`` in a subprocess, parses
+the timings Python writes to stderr and prints the slowest imports. The
+report can be saved as JSON and compared against a previous run to catch
+startup regressions.
+
+Usage:
+    python profile_imports.py                          # profile app.py
+    python profile_imports.py --top 30 --json report.json
+    python profile_imports.py --baseline report.json --threshold 20
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Optional
+
+# Placeholders so app.py passes its environment validation when profiled
+PROFILE_ENV_DEFAULTS = {
+    "CHATBOT_NAME": "profile",
+    "WELCOME_MESSAGE": "profile",
+    "LANGUAGE": "en",
+    "LAZY_STARTUP": "true",
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_importtime(module: str, extra_env: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): Module to import
+        extra_env (Optional[Dict[str, str]]): Environment overrides
+
+    Returns:
+        List[Dict]: One entry per imported module with self/cumulative microseconds and depth
+
+    Raises:
+        RuntimeError: If the import fails
+    """
+    env = dict(os.environ)
+    for key, value in PROFILE_ENV_DEFAULTS.items():
+        env.setdefault(key, value)
+    env.update(extra_env or {})
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append({
+                "module": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": len(match.group(3)) // 2,
+            })
+
+    if result.returncode != 0:
+        tail = "\n".join(
+            line for line in result.stderr.splitlines() if not line.startswith("import time:")
+        )
+        raise RuntimeError(f"Importing {module} failed:\n{tail}")
+    return entries
+
+
+def build_report(module: str, entries: List[Dict], top: int) -> Dict:
+    """
+    Summarize importtime entries.
+
+    Args:
+        module (str): Profiled module
+        entries (List[Dict]): Parsed importtime entries
+        top (int): Number of slowest imports to keep
+
+    Returns:
+        Dict: Report with total time, top-level packages and slowest imports
+    """
+    total_us = sum(entry["self_us"] for entry in entries)
+    packages: Dict[str, int] = {}
+    for entry in entries:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "module_count": len(entries),
+        "packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        },
+        "slowest": sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:top],
+    }
+
+
+def compare_reports(report: Dict, baseline: Dict, threshold_pct: float) -> List[str]:
+    """
+    Compare a report against a baseline.
+
+    Args:
+        report (Dict): Current report
+        baseline (Dict): Previous report
+        threshold_pct (float): Allowed growth in percent before flagging a regression
+
+    Returns:
+        List[str]: Human-readable regression descriptions (empty if none)
+    """
+    regressions = []
+    limit = 1 + threshold_pct / 100
+
+    if report["total_ms"] > baseline["total_ms"] * limit:
+        regressions.append(
+            f"total import time {baseline['total_ms']} ms -> {report['total_ms']} ms"
+        )
+    for package, ms in report["packages_ms"].items():
+        previous = baseline.get("packages_ms", {}).get(package)
+        if previous is None:
+            regressions.append(f"new heavy package {package}: {ms} ms")
+        elif ms > previous * limit and ms - previous > 10:
+            regressions.append(f"{package}: {previous} ms -> {ms} ms")
+    return regressions
+
+
+def print_report(report: Dict) -> None:
+    """Print a report as a table."""
+    print(
+        f"Import of '{report['module']}': {report['total_ms']} ms "
+        f"across {report['module_count']} modules\n"
+    )
+    print(f"{'package':<40} {'self ms':>10}")
+    for package, ms in report["packages_ms"].items():
+        print(f"{package:<40} {ms:>10}")
+    print(f"\n{'module':<60} {'cumulative ms':>14} {'self ms':>10}")
+    for entry in report["slowest"]:
+        print(
+            f"{entry['module']:<60} {entry['cumulative_us'] / 1000:>14.1f} "
+            f"{entry['self_us'] / 1000:>10.1f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app", help="Module to import (default: app)")
+    parser.add_argument("--top", type=int, default=20, help="Number of entries to show")
+    parser.add_argument("--json", dest="json_path", help="Write the report as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON report")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0,
+        help="Allowed growth in percent before a regression is reported"
+    )
+    parser.add_argument(
+        "--eager", action="store_true", help="Profile with LAZY_STARTUP=false"
+    )
+    args = parser.parse_args()
+
+    extra_env = {"LAZY_STARTUP": "false"} if args.eager else None
+    report = build_report(args.module, run_importtime(args.module, extra_env), args.top)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(report, json.load(f), args.threshold)
+        if regressions:
+            print("\nImport-time regressions:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\nNo import-time regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
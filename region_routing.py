@@ -0,0 +1,316 @@
+"""
+Multi-region routing for the shared Cosmos DB client.
+
+The CosmosClient was built with only an endpoint and key, so every
+replica of the app sent reads and writes to the account's write region,
+wherever that replica ran. get_cosmos_client now passes:
+
+- preferred_locations (COSMOS_PREFERRED_REGIONS): reads go to the first
+  available region of the list, the SDK falls back along it
+- multiple_write_locations (COSMOS_MULTIPLE_WRITE_LOCATIONS): on accounts
+  with multi-region writes, writes also go to the first preferred region
+
+The SDK only moves off a region after requests to it fail, and the static
+list ignores latency changes. RegionHealthMonitor probes every preferred
+region from a background thread and re-ranks them:
+
+- regions answering probes are ordered by smoothed latency
+- a region failing COSMOS_REGION_FAILURE_THRESHOLD probes in a row moves
+  to the end (failover) until it answers again
+- the first region is only replaced by one that is faster by
+  COSMOS_REGION_SWITCH_MARGIN, so similar regions do not flap
+
+Each new ranking is applied to every attached client and passed to the
+listeners registered with on_change. The probe is injectable: by default
+it times an HTTPS request to the region's endpoint (any HTTP status means
+the region answered). Tests and benchmarks can pass simulated regions
+instead (see benchmarks/fakes.py FakeRegions).
+
+Configuration:
+    COSMOS_PREFERRED_REGIONS: Comma-separated region names in preference order,
+        e.g. "West Europe,North Europe" (default "": the account's write region)
+    COSMOS_MULTIPLE_WRITE_LOCATIONS: "true" to write to the preferred region (default "false")
+    COSMOS_REGION_MONITOR_ENABLED: "true" to re-rank regions by probes (default "true";
+        only runs with two or more preferred regions)
+    COSMOS_REGION_PROBE_INTERVAL_SECONDS: Seconds between probe rounds (default 30)
+    COSMOS_REGION_PROBE_TIMEOUT_SECONDS: Timeout of one probe (default 2)
+    COSMOS_REGION_FAILURE_THRESHOLD: Consecutive failed probes before failover (default 3)
+    COSMOS_REGION_SWITCH_MARGIN: Relative latency gain needed to change the first region (default 0.2)
+"""
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from utils import setup_logger
+from metrics import registry
+
+logger = setup_logger("region_routing")
+
+COSMOS_PREFERRED_REGIONS = [
+    region.strip() for region in os.getenv("COSMOS_PREFERRED_REGIONS", "").split(",") if region.strip()
+]
+COSMOS_MULTIPLE_WRITE_LOCATIONS = (
+    os.getenv("COSMOS_MULTIPLE_WRITE_LOCATIONS", "false").lower() in ("1", "true", "yes")
+)
+COSMOS_REGION_MONITOR_ENABLED = (
+    os.getenv("COSMOS_REGION_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+)
+COSMOS_REGION_PROBE_INTERVAL_SECONDS = float(os.getenv("COSMOS_REGION_PROBE_INTERVAL_SECONDS", "30"))
+COSMOS_REGION_PROBE_TIMEOUT_SECONDS = float(os.getenv("COSMOS_REGION_PROBE_TIMEOUT_SECONDS", "2"))
+COSMOS_REGION_FAILURE_THRESHOLD = int(os.getenv("COSMOS_REGION_FAILURE_THRESHOLD", "3"))
+COSMOS_REGION_SWITCH_MARGIN = float(os.getenv("COSMOS_REGION_SWITCH_MARGIN", "0.2"))
+
+REGION_PROBE_LATENCY = registry.gauge(
+    "cosmos_region_probe_latency_seconds", "Smoothed probe latency per Cosmos DB region", ["region"]
+)
+REGION_SWITCHES = registry.counter(
+    "cosmos_region_switches_total",
+    "Changes of the preferred Cosmos DB region, by reason (latency, failover, recovery)",
+    ["reason"],
+)
+
+
+def client_options() -> Dict[str, Any]:
+    """Return the CosmosClient keyword arguments for the configured regions."""
+    options: Dict[str, Any] = {}
+    if COSMOS_PREFERRED_REGIONS:
+        options["preferred_locations"] = list(COSMOS_PREFERRED_REGIONS)
+    if COSMOS_MULTIPLE_WRITE_LOCATIONS:
+        options["multiple_write_locations"] = True
+    return options
+
+
+def apply_preferred_locations(client: Any, regions: List[str]) -> None:
+    """
+    Reorder the preferred locations of a live CosmosClient.
+
+    The SDK reads its preferred locations once at construction, so the
+    location cache is updated in place.
+
+    Args:
+        client (CosmosClient): Client to update
+        regions (List[str]): Regions in the new preference order
+    """
+    connection = client.client_connection
+    connection.connection_policy.PreferredLocations = list(regions)
+    endpoint_manager = connection._global_endpoint_manager
+    endpoint_manager.PreferredLocations = list(regions)
+    endpoint_manager.location_cache.preferred_locations = list(regions)
+    endpoint_manager.location_cache.update_location_cache()
+
+
+def endpoint_probe(client: Any, timeout: float = COSMOS_REGION_PROBE_TIMEOUT_SECONDS) -> Callable[[str], float]:
+    """
+    Build a probe that times a request to a region's endpoint.
+
+    Args:
+        client (CosmosClient): Client whose account metadata lists the regional endpoints
+        timeout (float): Seconds before a probe fails
+
+    Returns:
+        Callable[[str], float]: Probe returning the latency in seconds, raising on failure
+    """
+    http = httpx.Client(timeout=timeout)
+
+    def probe(region: str) -> float:
+        cache = client.client_connection._global_endpoint_manager.location_cache
+        endpoint = cache.available_read_endpoint_by_locations.get(region)
+        if not endpoint:
+            raise LookupError(f"Region {region} is not available on the account")
+        start = time.perf_counter()
+        # Unauthenticated: any HTTP status shows the region answered
+        http.get(endpoint)
+        return time.perf_counter() - start
+
+    return probe
+
+
+class RegionHealthMonitor:
+    """
+    Ranks Cosmos DB regions by probe latency and health.
+
+    Attributes:
+        regions (List[str]): Regions in configured preference order
+        ranking (List[str]): Current preference order
+        interval (float): Seconds between probe rounds
+        failure_threshold (int): Consecutive failed probes before a region is ranked last
+        switch_margin (float): Relative latency gain needed to change the first region
+        smoothing (float): Weight of a new sample in the latency average
+        switches (int): Changes of the first region
+    """
+
+    def __init__(
+        self,
+        regions: List[str],
+        probe: Optional[Callable[[str], float]] = None,
+        interval: float = COSMOS_REGION_PROBE_INTERVAL_SECONDS,
+        failure_threshold: int = COSMOS_REGION_FAILURE_THRESHOLD,
+        switch_margin: float = COSMOS_REGION_SWITCH_MARGIN,
+        smoothing: float = 0.3,
+    ) -> None:
+        self.regions = list(regions)
+        self.ranking = list(regions)
+        self.probe = probe
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.switch_margin = switch_margin
+        self.smoothing = smoothing
+        self.switches = 0
+        self._latency: Dict[str, Optional[float]] = {region: None for region in regions}
+        self._failures: Dict[str, int] = {region: 0 for region in regions}
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def healthy(self, region: str) -> bool:
+        """Return True unless a region failed failure_threshold probes in a row."""
+        return self._failures[region] < self.failure_threshold
+
+    def on_change(self, listener: Callable[[List[str]], None]) -> None:
+        """Call a listener with every new ranking."""
+        self._listeners.append(listener)
+
+    def attach(self, client: Any) -> None:
+        """
+        Keep a CosmosClient's preferred locations in line with the ranking.
+
+        The first attached client also provides the default probe. The
+        monitor thread starts here when there is more than one region.
+
+        Args:
+            client (CosmosClient): Client built with the same preferred locations
+        """
+        if len(self.regions) < 2 or not COSMOS_REGION_MONITOR_ENABLED:
+            return
+        if self.probe is None:
+            self.probe = endpoint_probe(client)
+        self.on_change(lambda ranking: apply_preferred_locations(client, ranking))
+        if self.ranking != self.regions:
+            apply_preferred_locations(client, self.ranking)
+        self.start()
+
+    def record(self, region: str, latency: Optional[float]) -> None:
+        """
+        Record one probe result.
+
+        Args:
+            region (str): Probed region
+            latency (Optional[float]): Latency in seconds, or None if the probe failed
+        """
+        with self._lock:
+            if latency is None:
+                self._failures[region] += 1
+                return
+            self._failures[region] = 0
+            previous = self._latency[region]
+            smoothed = latency if previous is None else (
+                self.smoothing * latency + (1 - self.smoothing) * previous
+            )
+            self._latency[region] = smoothed
+        REGION_PROBE_LATENCY.set(smoothed, region=region)
+
+    def rank(self) -> List[str]:
+        """Return the preference order implied by the recorded probes."""
+        with self._lock:
+            order = {region: index for index, region in enumerate(self.regions)}
+            healthy = sorted(
+                (region for region in self.regions if self.healthy(region)),
+                key=lambda region: (
+                    self._latency[region] if self._latency[region] is not None else float("inf"),
+                    order[region],
+                ),
+            )
+            unhealthy = [region for region in self.regions if not self.healthy(region)]
+            leader = self.ranking[0]
+            if healthy and leader in healthy and healthy[0] != leader:
+                best, current = self._latency[healthy[0]], self._latency[leader]
+                if current is None or best is None or best >= current * (1 - self.switch_margin):
+                    # Not enough of a gain to move traffic
+                    healthy.remove(leader)
+                    healthy.insert(0, leader)
+            return healthy + unhealthy
+
+    def _switch_reason(self, previous: str, leader: str) -> str:
+        if not self.healthy(previous):
+            return "failover"
+        if previous != self.regions[0] and leader == self.regions[0]:
+            return "recovery"
+        return "latency"
+
+    def probe_once(self) -> List[str]:
+        """
+        Probe every region once and apply the resulting ranking.
+
+        Returns:
+            List[str]: The ranking after this round
+        """
+        for region in self.regions:
+            try:
+                latency = self.probe(region)
+            except Exception as e:
+                logger.debug("Probe of region %s failed: %s", region, e)
+                latency = None
+            self.record(region, latency)
+
+        ranking = self.rank()
+        if ranking == self.ranking:
+            return ranking
+        previous, self.ranking = self.ranking, ranking
+        if ranking[0] != previous[0]:
+            reason = self._switch_reason(previous[0], ranking[0])
+            self.switches += 1
+            REGION_SWITCHES.inc(reason=reason)
+            logger.warning("Cosmos DB region %s -> %s (%s)", previous[0], ranking[0], reason)
+        for listener in self._listeners:
+            try:
+                listener(ranking)
+            except Exception as e:
+                logger.error("Could not apply region ranking %s: %s", ranking, e)
+        return ranking
+
+    def start(self) -> None:
+        """Start probing in a daemon thread."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="region-monitor", daemon=True)
+        self._thread.start()
+        logger.info("Region monitor started for %s (interval=%.1fs)", self.regions, self.interval)
+
+    def stop(self) -> None:
+        """Stop the probing thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.probe_once()
+            self._stop.wait(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the ranking, smoothed latencies and failure counts."""
+        with self._lock:
+            return {
+                "running": self.running,
+                "ranking": list(self.ranking),
+                "switches": self.switches,
+                "latency_ms": {
+                    region: round(latency * 1000, 2) if latency is not None else None
+                    for region, latency in self._latency.items()
+                },
+                "failures": dict(self._failures),
+            }
+
+
+region_monitor = RegionHealthMonitor(COSMOS_PREFERRED_REGIONS)
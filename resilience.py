@@ -0,0 +1,363 @@
+"""
+Resilience layer for calls to the Databricks serving endpoint.
+
+Provides:
+- CircuitBreaker: fails fast while the endpoint is unhealthy and lets a
+  single probe through after a cool-down
+- LatencyTracker: rolling latency window used to pick the hedge delay
+- EndpointGuard: timeout, circuit breaking and optional hedged requests
+  (a duplicate request is sent if the first one is slower than the
+  observed p95, and the first success wins)
+- FallbackAnswers: last good response per question, served when the
+  circuit is open or the call fails
+
+Breaker state and hedge counters are available through stats().
+"""
+
+import os
+import time
+import math
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from utils import setup_logger
+
+logger = setup_logger("resilience")
+
+T = TypeVar("T")
+
+ENDPOINT_TIMEOUT_SECONDS = float(os.getenv("ENDPOINT_TIMEOUT_SECONDS", "60"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+# Hedged requests may add at most this fraction of extra upstream load
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+FALLBACK_CACHE_SIZE = int(os.getenv("FALLBACK_CACHE_SIZE", "1024"))
+FALLBACK_MESSAGE = os.getenv(
+    "FALLBACK_MESSAGE",
+    "Our answer service is temporarily unavailable. Please try again in a few minutes."
+)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Decide whether an error says something about the endpoint's health.
+
+    Client errors (4xx other than 408/429) are the caller's fault and do not
+    trip the breaker.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None and 400 <= status_code < 500 and status_code not in (408, 429):
+        return False
+    return True
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures that open the circuit
+        reset_timeout (float): Seconds to stay open before allowing a probe
+        state (str): "closed", "open" or "half_open"
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_SECONDS,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self.rejected_count = 0
+        self._probe_in_flight = False
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("Circuit '%s' %s -> %s", self.name, self.state, state)
+            self.state = state
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may proceed.
+
+        Returns:
+            bool: False while open, or while a half-open probe is in flight
+        """
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected_count += 1
+                return False
+            self._transition(STATE_HALF_OPEN)
+
+        if self.state == STATE_HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected_count += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self._transition(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit past the threshold."""
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == STATE_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.open_count += 1
+            self._transition(STATE_OPEN)
+
+    def release_probe(self) -> None:
+        """Release a half-open probe slot without recording an outcome."""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return breaker state and counters."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_count": self.open_count,
+            "rejected_count": self.rejected_count,
+        }
+
+
+class LatencyTracker:
+    """
+    Rolling window of call latencies.
+
+    Attributes:
+        window (int): Number of recent samples kept
+    """
+
+    def __init__(self, window: int = 500) -> None:
+        self.window = window
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """Add a latency sample in seconds."""
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Return the given latency percentile.
+
+        Args:
+            pct (float): Percentile between 0 and 100
+
+        Returns:
+            Optional[float]: Latency in seconds, or None without samples
+        """
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class EndpointGuard:
+    """
+    Timeout, circuit breaker and optional hedging around an async upstream call.
+
+    Attributes:
+        breaker (CircuitBreaker): Circuit breaker for the endpoint
+        latency (LatencyTracker): Observed latencies of successful calls
+        timeout (float): Overall deadline per call in seconds
+        hedge_enabled (bool): Whether hedged requests are sent
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float = ENDPOINT_TIMEOUT_SECONDS,
+        hedge_enabled: bool = HEDGE_ENABLED,
+        hedge_percentile: float = HEDGE_PERCENTILE,
+        hedge_min_samples: int = HEDGE_MIN_SAMPLES,
+        hedge_max_ratio: float = HEDGE_MAX_RATIO,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker = breaker or CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self.counters: Dict[str, int] = {
+            "calls": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "hedges_sent": 0,
+            "hedges_won": 0,
+        }
+
+    def hedge_delay(self) -> Optional[float]:
+        """Return the delay before sending a hedge, or None if hedging is not allowed now."""
+        if not self.hedge_enabled or len(self.latency) < self.hedge_min_samples:
+            return None
+        if self.counters["hedges_sent"] >= self.hedge_max_ratio * max(1, self.counters["calls"]):
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn, sending a duplicate if it outlives the hedge delay; first success wins."""
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(fn())
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.counters["hedges_sent"] += 1
+        logger.info("Hedging call to '%s' after %.2fs", self.name, delay)
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters["hedges_won"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call the upstream through the breaker, with timeout and optional hedging.
+
+        Args:
+            fn (Callable[[], Awaitable[T]]): Coroutine factory making the upstream call
+
+        Returns:
+            T: Upstream result
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            asyncio.TimeoutError: If the call exceeds the timeout
+            Exception: Whatever the upstream call raised
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+        self.counters["calls"] += 1
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._hedged(fn), timeout=self.timeout)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self.counters["failures"] += 1
+            self.breaker.record_failure()
+            raise
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.counters["failures"] += 1
+                self.breaker.record_failure()
+            else:
+                # Not an upstream outage, but not a success either: leave the breaker as it is
+                self.breaker.release_probe()
+            raise
+
+        self.latency.record(time.perf_counter() - start)
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return breaker state, latency percentiles and hedge counters."""
+        return {
+            **self.counters,
+            "breaker": self.breaker.stats(),
+            "p50_seconds": self.latency.percentile(50),
+            "p95_seconds": self.latency.percentile(95),
+        }
+
+
+class FallbackAnswers:
+    """
+    Bounded LRU of the last good endpoint response per question.
+
+    Attributes:
+        max_size (int): Maximum number of stored responses
+        hits (int): Fallbacks served from the cache
+        misses (int): Fallbacks that found nothing cached
+    """
+
+    def __init__(self, max_size: int = FALLBACK_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Remember a good response for a question key."""
+        self._items[key] = response
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored response for a question key, if any."""
+        response = self._items.get(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def static_fallback_response() -> Dict[str, Any]:
+    """
+    Build an endpoint-shaped response carrying FALLBACK_MESSAGE.
+
+    Returns:
+        Dict[str, Any]: Response marked with "fallback": "static"
+    """
+    return {
+        "messages": [{"role": "assistant", "content": FALLBACK_MESSAGE}],
+        "custom_outputs": {"context": ""},
+        "databricks_output": {},
+        "fallback": "static",
+    }
+
+
+endpoint_guard = EndpointGuard("databricks")
+fallback_answers = FallbackAnswers()
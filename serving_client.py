@@ -0,0 +1,290 @@
+"""
+Lightweight client for Databricks Model Serving endpoints.
+
+Speaks the serving-endpoint invocations protocol directly:
+
+    POST {DATABRICKS_HOST}/serving-endpoints/{endpoint}/invocations
+    Authorization: Bearer <token>
+
+so the hot path needs only httpx instead of mlflow. Supports personal
+access tokens (DATABRICKS_TOKEN) and OAuth machine-to-machine credentials
+(DATABRICKS_CLIENT_ID / DATABRICKS_CLIENT_SECRET), pooled connections,
+timeouts and retries on throttling and transient server errors.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from utils import setup_logger
+
+load_dotenv()
+
+logger = setup_logger("serving_client")
+
+DEFAULT_TIMEOUT = float(os.getenv("SERVING_TIMEOUT_SECONDS", "60"))
+DEFAULT_MAX_RETRIES = int(os.getenv("SERVING_MAX_RETRIES", "2"))
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("SERVING_MAX_CONNECTIONS", "32"))
+DEFAULT_BACKOFF_SECONDS = 0.5
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+# Refresh OAuth tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+
+
+class ServingEndpointError(Exception):
+    """
+    Raised when a serving endpoint call fails.
+
+    Attributes:
+        status_code (Optional[int]): HTTP status code, if a response was received
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DatabricksServingClient:
+    """
+    Minimal Databricks Model Serving client.
+
+    One instance holds a sync and an async connection pool; use
+    get_serving_client() for the shared process-wide instance.
+
+    Attributes:
+        host (str): Databricks workspace URL
+        timeout (float): Per-request timeout in seconds
+        max_retries (int): Retries on throttling and transient failures
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        token: Optional[str] = None,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    ) -> None:
+        """
+        Initialize the serving client.
+
+        Args:
+            host (Optional[str]): Workspace URL. Defaults to DATABRICKS_HOST
+            token (Optional[str]): Personal access token. Defaults to DATABRICKS_TOKEN
+            client_id (Optional[str]): OAuth client id. Defaults to DATABRICKS_CLIENT_ID
+            client_secret (Optional[str]): OAuth client secret. Defaults to DATABRICKS_CLIENT_SECRET
+            timeout (float): Per-request timeout in seconds
+            max_retries (int): Retries on throttling and transient failures
+            max_connections (int): Connection pool size
+
+        Raises:
+            ValueError: If the host or credentials are missing
+        """
+        host = host or os.getenv("DATABRICKS_HOST")
+        if not host:
+            raise ValueError("DATABRICKS_HOST environment variable is not set")
+        if not host.startswith("http"):
+            host = f"https://{host}"
+        self.host = host.rstrip("/")
+
+        self._token = token or os.getenv("DATABRICKS_TOKEN")
+        self._client_id = client_id or os.getenv("DATABRICKS_CLIENT_ID")
+        self._client_secret = client_secret or os.getenv("DATABRICKS_CLIENT_SECRET")
+        if not self._token and not (self._client_id and self._client_secret):
+            raise ValueError(
+                "Set DATABRICKS_TOKEN or DATABRICKS_CLIENT_ID and DATABRICKS_CLIENT_SECRET"
+            )
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._oauth_token: Optional[str] = None
+        self._oauth_expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None or self._client.is_closed:
+                self._client = httpx.Client(timeout=self.timeout, limits=self._limits)
+            return self._client
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout, limits=self._limits)
+        return self._async_client
+
+    def _bearer_token(self) -> str:
+        """Return a valid bearer token, refreshing the OAuth token if needed."""
+        if self._token:
+            return self._token
+
+        with self._lock:
+            if self._oauth_token and time.time() < self._oauth_expires_at:
+                return self._oauth_token
+
+            response = httpx.post(
+                f"{self.host}/oidc/v1/token",
+                data={"grant_type": "client_credentials", "scope": "all-apis"},
+                auth=(self._client_id, self._client_secret),
+                timeout=self.timeout,
+            )
+            if response.status_code != 200:
+                raise ServingEndpointError(
+                    f"OAuth token request failed: {response.status_code} {response.text}",
+                    status_code=response.status_code,
+                )
+            payload = response.json()
+            self._oauth_token = payload["access_token"]
+            self._oauth_expires_at = (
+                time.time() + int(payload.get("expires_in", 3600)) - TOKEN_REFRESH_MARGIN_SECONDS
+            )
+            return self._oauth_token
+
+    def _invocations_url(self, endpoint: str) -> str:
+        return f"{self.host}/serving-endpoints/{endpoint}/invocations"
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None and response.headers.get("Retry-After"):
+            try:
+                return float(response.headers["Retry-After"])
+            except ValueError:
+                pass
+        return DEFAULT_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+
+    @staticmethod
+    def _raise_for_response(endpoint: str, response: httpx.Response) -> None:
+        if response.status_code >= 400:
+            raise ServingEndpointError(
+                f"Endpoint '{endpoint}' returned {response.status_code}: {response.text}",
+                status_code=response.status_code,
+            )
+
+    def predict(self, endpoint: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Invoke a serving endpoint synchronously.
+
+        Args:
+            endpoint (str): Serving endpoint name
+            inputs (Dict[str, Any]): Request payload, e.g. {"messages": [...]}
+
+        Returns:
+            Dict[str, Any]: Decoded JSON response
+
+        Raises:
+            ServingEndpointError: If the call fails after all retries
+        """
+        url = self._invocations_url(endpoint)
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            response: Optional[httpx.Response] = None
+            try:
+                response = self._get_client().post(
+                    url,
+                    json=inputs,
+                    headers={"Authorization": f"Bearer {self._bearer_token()}"},
+                )
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self._raise_for_response(endpoint, response)
+                    return response.json()
+                last_error = ServingEndpointError(
+                    f"Endpoint '{endpoint}' returned {response.status_code}",
+                    status_code=response.status_code,
+                )
+            except httpx.TransportError as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                logger.warning(
+                    "Serving call attempt %s failed: %s. Retrying in %.2fs", attempt + 1, last_error, delay
+                )
+                time.sleep(delay)
+
+        raise ServingEndpointError(f"Serving call to '{endpoint}' failed: {last_error}")
+
+    async def apredict(self, endpoint: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Invoke a serving endpoint without blocking the event loop.
+
+        Args:
+            endpoint (str): Serving endpoint name
+            inputs (Dict[str, Any]): Request payload, e.g. {"messages": [...]}
+
+        Returns:
+            Dict[str, Any]: Decoded JSON response
+
+        Raises:
+            ServingEndpointError: If the call fails after all retries
+        """
+        url = self._invocations_url(endpoint)
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            response: Optional[httpx.Response] = None
+            try:
+                token = self._token or await asyncio.to_thread(self._bearer_token)
+                response = await self._get_async_client().post(
+                    url,
+                    json=inputs,
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self._raise_for_response(endpoint, response)
+                    return response.json()
+                last_error = ServingEndpointError(
+                    f"Endpoint '{endpoint}' returned {response.status_code}",
+                    status_code=response.status_code,
+                )
+            except httpx.TransportError as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                logger.warning(
+                    "Serving call attempt %s failed: %s. Retrying in %.2fs", attempt + 1, last_error, delay
+                )
+                await asyncio.sleep(delay)
+
+        raise ServingEndpointError(f"Serving call to '{endpoint}' failed: {last_error}")
+
+    def close(self) -> None:
+        """Close the sync connection pool."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        """Close the async connection pool."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+_serving_client: Optional[DatabricksServingClient] = None
+_serving_client_lock = threading.Lock()
+
+
+def get_serving_client() -> DatabricksServingClient:
+    """
+    Return the process-wide serving client.
+
+    Returns:
+        DatabricksServingClient: Shared client instance
+    """
+    global _serving_client
+    with _serving_client_lock:
+        if _serving_client is None:
+            _serving_client = DatabricksServingClient()
+        return _serving_client
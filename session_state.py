@@ -0,0 +1,394 @@
+"""
+Shared session state for running several Chainlit workers.
+
+Per-session data (recorded audio, thread id, language) and per-thread
+conversation history live in a SessionStateBackend instead of process
+memory, so any worker can serve any session and a restarted worker can
+pick up a conversation mid-way. The backend also holds shared caches
+(e.g. translations) so every worker benefits from the others' work.
+
+Backends:
+- SESSION_STATE_BACKEND=memory (default): in-process, for a single worker
+  and for tests
+- SESSION_STATE_BACKEND=redis: shared Redis at REDIS_URL; requires the
+  optional requirements-redis.txt
+
+All methods are coroutines so the Redis backend never blocks the event loop.
+"""
+
+import os
+import json
+import time
+from urllib.parse import urlsplit
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import setup_logger
+
+logger = setup_logger("session_state")
+
+SESSION_STATE_BACKEND = os.getenv("SESSION_STATE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SESSION_STATE_PREFIX = os.getenv("SESSION_STATE_PREFIX", "copilot:")
+SESSION_STATE_TTL_SECONDS = int(os.getenv("SESSION_STATE_TTL_SECONDS", "86400"))
+HISTORY_CACHE_TTL_SECONDS = int(os.getenv("HISTORY_CACHE_TTL_SECONDS", "3600"))
+# Audio chunks beyond this recording size are dropped (24 kHz 16-bit mono: ~3.6 minutes)
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(10 * 1024 * 1024)))
+# Entry cap per map of the in-memory backend (history, cache)
+SESSION_STATE_MAX_ENTRIES = int(os.getenv("SESSION_STATE_MAX_ENTRIES", "10000"))
+
+
+def _redis_location(url: str) -> str:
+    """Return the host, port and db of a Redis URL, without its credentials."""
+    parts = urlsplit(url)
+    if parts.scheme == "unix":
+        return f"unix://{parts.path}"
+    db = parts.path.lstrip("/") or "0"
+    return f"{parts.scheme}://{parts.hostname or 'localhost'}:{parts.port or 6379}/{db}"
+
+
+class SessionStateBackend(ABC):
+    """Storage for per-session values, recorded audio, thread history and shared caches."""
+
+    # True when other workers see this backend's state
+    shared = False
+
+    @abstractmethod
+    async def get_value(self, session_id: str, key: str) -> Any:
+        """Return a session value, or None."""
+
+    @abstractmethod
+    async def set_value(self, session_id: str, key: str, value: Any) -> None:
+        """Set a JSON-serializable session value."""
+
+    @abstractmethod
+    async def append_audio(self, session_id: str, data: bytes) -> int:
+        """
+        Append recorded audio bytes for a session.
+
+        Returns:
+            int: Total bytes buffered, or -1 if the chunk was dropped because
+            the recording exceeds AUDIO_MAX_BYTES
+        """
+
+    @abstractmethod
+    async def pop_audio(self, session_id: str) -> bytes:
+        """Return and clear the recorded audio of a session."""
+
+    @abstractmethod
+    async def clear_audio(self, session_id: str) -> None:
+        """Discard the recorded audio of a session."""
+
+    @abstractmethod
+    async def delete_session(self, session_id: str) -> None:
+        """Discard every value and the audio of a session."""
+
+    @abstractmethod
+    async def get_history(self, thread_id: str) -> Optional[List[Dict[str, str]]]:
+        """Return the cached chat history of a thread, or None if not cached."""
+
+    @abstractmethod
+    async def set_history(self, thread_id: str, history: List[Dict[str, str]]) -> None:
+        """Cache the chat history of a thread."""
+
+    @abstractmethod
+    async def append_history(self, thread_id: str, messages: List[Dict[str, str]]) -> None:
+        """Append messages to a thread's cached history; no-op if it is not cached."""
+
+    @abstractmethod
+    async def delete_history(self, thread_id: str) -> None:
+        """Drop a thread's cached history."""
+
+    @abstractmethod
+    async def get_cached(self, namespace: str, key: str) -> Any:
+        """Return a shared cache entry, or None."""
+
+    @abstractmethod
+    async def set_cached(self, namespace: str, key: str, value: Any, ttl: int = SESSION_STATE_TTL_SECONDS) -> None:
+        """Store a JSON-serializable shared cache entry."""
+
+    @abstractmethod
+    async def incr_counters(self, namespace: str, key: str, deltas: Dict[str, int]) -> Dict[str, int]:
+        """Atomically add deltas to counters (which never expire); return the new values."""
+
+    @abstractmethod
+    async def get_counters(self, namespace: str, key: str) -> Dict[str, int]:
+        """Return the counters under a key, or an empty dict."""
+
+    async def close(self) -> None:
+        """Release connections."""
+
+
+class InMemorySessionState(SessionStateBackend):
+    """
+    Process-local backend with TTL expiry.
+
+    Only one worker sees this state; use it for single-worker deployments
+    and as a local stand-in in tests.
+    """
+
+    def __init__(
+        self,
+        ttl: int = SESSION_STATE_TTL_SECONDS,
+        history_ttl: int = HISTORY_CACHE_TTL_SECONDS,
+        audio_max_bytes: int = AUDIO_MAX_BYTES,
+        max_entries: int = SESSION_STATE_MAX_ENTRIES,
+    ) -> None:
+        self.ttl = ttl
+        self.history_ttl = history_ttl
+        self.audio_max_bytes = audio_max_bytes
+        self.max_entries = max_entries
+        self._values: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._audio: Dict[str, bytearray] = {}
+        self._history: Dict[str, Tuple[float, List[Dict[str, str]]]] = {}
+        self._cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._counters: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    @staticmethod
+    def _live(entry: Optional[Tuple[float, Any]]) -> bool:
+        return entry is not None and entry[0] > time.monotonic()
+
+    def _bound(self, entries: Dict[Any, Tuple[float, Any]]) -> None:
+        """Drop expired entries, then the oldest ones, once a map exceeds max_entries."""
+        if len(entries) <= self.max_entries:
+            return
+        now = time.monotonic()
+        for key in [key for key, entry in entries.items() if entry[0] <= now]:
+            del entries[key]
+        while len(entries) > self.max_entries:
+            del entries[next(iter(entries))]
+
+    async def get_value(self, session_id: str, key: str) -> Any:
+        entry = self._values.get(session_id)
+        return entry[1].get(key) if self._live(entry) else None
+
+    async def set_value(self, session_id: str, key: str, value: Any) -> None:
+        entry = self._values.get(session_id)
+        values = entry[1] if self._live(entry) else {}
+        values[key] = value
+        self._values.pop(session_id, None)
+        self._values[session_id] = (time.monotonic() + self.ttl, values)
+        self._bound(self._values)
+
+    async def append_audio(self, session_id: str, data: bytes) -> int:
+        buffer = self._audio.setdefault(session_id, bytearray())
+        if len(buffer) + len(data) > self.audio_max_bytes:
+            return -1
+        buffer.extend(data)
+        return len(buffer)
+
+    async def pop_audio(self, session_id: str) -> bytes:
+        return bytes(self._audio.pop(session_id, b""))
+
+    async def clear_audio(self, session_id: str) -> None:
+        self._audio.pop(session_id, None)
+
+    async def delete_session(self, session_id: str) -> None:
+        self._values.pop(session_id, None)
+        self._audio.pop(session_id, None)
+
+    async def get_history(self, thread_id: str) -> Optional[List[Dict[str, str]]]:
+        entry = self._history.get(thread_id)
+        if not self._live(entry):
+            self._history.pop(thread_id, None)
+            return None
+        return list(entry[1])
+
+    async def set_history(self, thread_id: str, history: List[Dict[str, str]]) -> None:
+        self._history.pop(thread_id, None)
+        self._history[thread_id] = (time.monotonic() + self.history_ttl, list(history))
+        self._bound(self._history)
+
+    async def append_history(self, thread_id: str, messages: List[Dict[str, str]]) -> None:
+        entry = self._history.get(thread_id)
+        if self._live(entry):
+            entry[1].extend(messages)
+
+    async def delete_history(self, thread_id: str) -> None:
+        self._history.pop(thread_id, None)
+
+    async def get_cached(self, namespace: str, key: str) -> Any:
+        entry = self._cache.get((namespace, key))
+        if not self._live(entry):
+            self._cache.pop((namespace, key), None)
+            return None
+        return entry[1]
+
+    async def set_cached(self, namespace: str, key: str, value: Any, ttl: int = SESSION_STATE_TTL_SECONDS) -> None:
+        self._cache.pop((namespace, key), None)
+        self._cache[(namespace, key)] = (time.monotonic() + ttl, value)
+        self._bound(self._cache)
+
+    async def incr_counters(self, namespace: str, key: str, deltas: Dict[str, int]) -> Dict[str, int]:
+        counters = self._counters.setdefault((namespace, key), {})
+        for name, delta in deltas.items():
+            counters[name] = counters.get(name, 0) + delta
+        return {name: counters[name] for name in deltas}
+
+    async def get_counters(self, namespace: str, key: str) -> Dict[str, int]:
+        return dict(self._counters.get((namespace, key), {}))
+
+
+# Marks a cached history list as present, so an empty history is still a cache hit
+_HISTORY_MARKER = "__history__"
+
+
+class RedisSessionState(SessionStateBackend):
+    """
+    Redis backend shared by every worker.
+
+    Keys (under SESSION_STATE_PREFIX):
+    - session:{id}      hash of JSON session values
+    - audio:{id}        recorded audio, appended with APPEND
+    - history:{thread}  list of JSON messages headed by a marker element
+    - cache:{ns}:{key}  JSON cache entries
+    - counters:{ns}:{key}  hash of integer counters, updated with HINCRBY
+
+    Every key except counters carries a TTL, so abandoned sessions expire on their own.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        url: str = REDIS_URL,
+        prefix: str = SESSION_STATE_PREFIX,
+        ttl: int = SESSION_STATE_TTL_SECONDS,
+        history_ttl: int = HISTORY_CACHE_TTL_SECONDS,
+        audio_max_bytes: int = AUDIO_MAX_BYTES,
+    ) -> None:
+        """
+        Raises:
+            ImportError: If the redis package is not installed
+        """
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.history_ttl = history_ttl
+        self.audio_max_bytes = audio_max_bytes
+
+    def _key(self, *parts: str) -> str:
+        return self.prefix + ":".join(parts)
+
+    async def get_value(self, session_id: str, key: str) -> Any:
+        raw = await self.redis.hget(self._key("session", session_id), key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set_value(self, session_id: str, key: str, value: Any) -> None:
+        name = self._key("session", session_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(name, key, json.dumps(value))
+            pipe.expire(name, self.ttl)
+            await pipe.execute()
+
+    async def append_audio(self, session_id: str, data: bytes) -> int:
+        name = self._key("audio", session_id)
+        # Check first so an over-long recording stops growing; the race with a
+        # concurrent append of the same session is harmless
+        if await self.redis.strlen(name) + len(data) > self.audio_max_bytes:
+            return -1
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.append(name, data)
+            pipe.expire(name, self.ttl)
+            size, _ = await pipe.execute()
+        return size
+
+    async def pop_audio(self, session_id: str) -> bytes:
+        name = self._key("audio", session_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(name)
+            pipe.delete(name)
+            data, _ = await pipe.execute()
+        return data or b""
+
+    async def clear_audio(self, session_id: str) -> None:
+        await self.redis.delete(self._key("audio", session_id))
+
+    async def delete_session(self, session_id: str) -> None:
+        await self.redis.delete(self._key("session", session_id), self._key("audio", session_id))
+
+    async def get_history(self, thread_id: str) -> Optional[List[Dict[str, str]]]:
+        items = await self.redis.lrange(self._key("history", thread_id), 0, -1)
+        if not items:
+            return None
+        return [json.loads(item) for item in items[1:]]
+
+    async def set_history(self, thread_id: str, history: List[Dict[str, str]]) -> None:
+        name = self._key("history", thread_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(name)
+            pipe.rpush(name, _HISTORY_MARKER, *[json.dumps(message) for message in history])
+            pipe.expire(name, self.history_ttl)
+            await pipe.execute()
+
+    async def append_history(self, thread_id: str, messages: List[Dict[str, str]]) -> None:
+        if not messages:
+            return
+        # RPUSHX only appends to an existing (cached) list
+        await self.redis.rpushx(
+            self._key("history", thread_id), *[json.dumps(message) for message in messages]
+        )
+
+    async def delete_history(self, thread_id: str) -> None:
+        await self.redis.delete(self._key("history", thread_id))
+
+    async def get_cached(self, namespace: str, key: str) -> Any:
+        raw = await self.redis.get(self._key("cache", namespace, key))
+        return json.loads(raw) if raw is not None else None
+
+    async def set_cached(self, namespace: str, key: str, value: Any, ttl: int = SESSION_STATE_TTL_SECONDS) -> None:
+        await self.redis.set(self._key("cache", namespace, key), json.dumps(value), ex=ttl)
+
+    async def incr_counters(self, namespace: str, key: str, deltas: Dict[str, int]) -> Dict[str, int]:
+        name = self._key("counters", namespace, key)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for field, delta in deltas.items():
+                pipe.hincrby(name, field, delta)
+            values = await pipe.execute()
+        return dict(zip(deltas, values))
+
+    async def get_counters(self, namespace: str, key: str) -> Dict[str, int]:
+        raw = await self.redis.hgetall(self._key("counters", namespace, key))
+        return {field.decode(): int(value) for field, value in raw.items()}
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+_session_state: Optional[SessionStateBackend] = None
+
+
+def get_session_state() -> SessionStateBackend:
+    """
+    Return the process-wide session state backend selected by SESSION_STATE_BACKEND.
+
+    Returns:
+        SessionStateBackend: Shared backend instance
+
+    Raises:
+        ValueError: If the backend is unknown
+        ImportError: If the redis backend is selected but redis is not installed
+    """
+    global _session_state
+    if _session_state is None:
+        if SESSION_STATE_BACKEND == "redis":
+            _session_state = RedisSessionState()
+            logger.info("Using Redis session state at %s", _redis_location(REDIS_URL))
+        elif SESSION_STATE_BACKEND == "memory":
+            _session_state = InMemorySessionState()
+        else:
+            raise ValueError(f"Unknown SESSION_STATE_BACKEND: {SESSION_STATE_BACKEND}")
+    return _session_state
+
+
+def set_session_state(backend: SessionStateBackend) -> None:
+    """
+    Replace the process-wide backend (e.g. with a stand-in in tests and benchmarks).
+
+    Args:
+        backend (SessionStateBackend): New backend
+    """
+    global _session_state
+    _session_state = backend
@@ -0,0 +1,206 @@
+"""
+Per-thread Cosmos DB session tokens for read-your-writes.
+
+Every Cosmos DB write returns a session token ("x-ms-session-token")
+naming the replica progress the write reached. A read passing that token
+is served by a replica that has caught up to it, so it sees the write.
+That gives read-your-writes without running the whole account at Strong
+or Bounded Staleness consistency.
+
+The client used to rely on the account's default consistency. The level
+can now be chosen with COSMOS_CONSISTENCY_LEVEL, and the stores record
+the token of each write per (container, chat thread). The next read of
+that thread passes the token, so a reply or feedback vote is visible to
+the reads that follow it. Reads of other threads carry no token and may be
+served by any replica, which costs fewer RUs and less latency at Session
+or Eventual consistency.
+
+Tokens are captured from the headers of each write's own response, never
+from the client-wide last_response_headers, which concurrent requests
+overwrite. A token has one "<range id>:<progress>" segment per partition
+key range; merge_session_tokens keeps the most advanced progress per range.
+Tokens live in this process only: after a restart, or in another replica,
+reads fall back to the configured consistency level.
+
+Configuration:
+    COSMOS_CONSISTENCY_LEVEL: "Strong", "BoundedStaleness", "Session",
+        "ConsistentPrefix" or "Eventual"; empty for the account default (default "")
+    COSMOS_SESSION_TOKENS: "true" to track session tokens (default "true")
+    COSMOS_SESSION_TOKENS_MAX_THREADS: Threads whose tokens are kept (default 10000)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from utils import setup_logger
+from metrics import record_cosmos_response, registry
+
+logger = setup_logger("session_tokens")
+
+COSMOS_CONSISTENCY_LEVEL = os.getenv("COSMOS_CONSISTENCY_LEVEL", "")
+COSMOS_SESSION_TOKENS = os.getenv("COSMOS_SESSION_TOKENS", "true").lower() in ("1", "true", "yes")
+COSMOS_SESSION_TOKENS_MAX_THREADS = int(os.getenv("COSMOS_SESSION_TOKENS_MAX_THREADS", "10000"))
+
+CONSISTENCY_LEVELS = ("Strong", "BoundedStaleness", "Session", "ConsistentPrefix", "Eventual")
+SESSION_TOKEN_HEADER = "x-ms-session-token"
+
+SESSION_READS = registry.counter(
+    "cosmos_session_reads_total",
+    "Cosmos DB reads of a chat thread, by whether a session token was passed (tracked, untracked)",
+    ["token"],
+)
+
+
+def consistency_level() -> Optional[str]:
+    """
+    Return the configured client consistency level.
+
+    Returns:
+        Optional[str]: Level name, or None for the account default
+
+    Raises:
+        ValueError: If COSMOS_CONSISTENCY_LEVEL is not a Cosmos DB level
+    """
+    if not COSMOS_CONSISTENCY_LEVEL:
+        return None
+    for level in CONSISTENCY_LEVELS:
+        if level.lower() == COSMOS_CONSISTENCY_LEVEL.lower():
+            return level
+    raise ValueError(f"Unknown COSMOS_CONSISTENCY_LEVEL: {COSMOS_CONSISTENCY_LEVEL}")
+
+
+def _progress(segment: str) -> Tuple[int, ...]:
+    # "<lsn>" (v1) or "<version>#<global lsn>#<region>=<lsn>..." (v2)
+    parts = segment.split("#")
+    try:
+        if len(parts) == 1:
+            return (0, int(parts[0]))
+        return (int(parts[0]), int(parts[1]))
+    except ValueError:
+        return (-1, -1)
+
+
+def merge_session_tokens(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    """
+    Combine two session tokens of the same container.
+
+    Args:
+        current (Optional[str]): Token recorded so far
+        new (Optional[str]): Token of a later response
+
+    Returns:
+        Optional[str]: Token covering both, with the most advanced progress per range
+    """
+    if not current or not new:
+        return new or current
+    ranges: Dict[str, str] = {}
+    for token in (current, new):
+        for segment in token.split(","):
+            range_id, _, progress = segment.strip().partition(":")
+            if not progress:
+                continue
+            known = ranges.get(range_id)
+            if known is None or _progress(progress) >= _progress(known):
+                ranges[range_id] = progress
+    return ",".join(f"{range_id}:{progress}" for range_id, progress in ranges.items()) or new
+
+
+class SessionTokenTracker:
+    """
+    Latest session token per (container, chat thread), with LRU eviction.
+
+    Attributes:
+        enabled (bool): Whether tokens are recorded and passed on reads
+        max_threads (int): Maximum number of (container, thread) entries kept
+    """
+
+    def __init__(
+        self, enabled: bool = COSMOS_SESSION_TOKENS, max_threads: int = COSMOS_SESSION_TOKENS_MAX_THREADS
+    ) -> None:
+        self.enabled = enabled
+        self.max_threads = max_threads
+        self._tokens: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def token(self, container_id: str, thread_id: str) -> Optional[str]:
+        """Return the recorded token of a thread in a container, if any."""
+        with self._lock:
+            return self._tokens.get((container_id, thread_id))
+
+    def observe(self, container_id: str, thread_id: str, token: Optional[str]) -> None:
+        """
+        Record the session token returned by a write.
+
+        Args:
+            container_id (str): Container written to
+            thread_id (str): Chat thread of the written item
+            token (Optional[str]): Value of the x-ms-session-token header
+        """
+        if not self.enabled or not token:
+            return
+        key = (container_id, thread_id)
+        with self._lock:
+            self._tokens[key] = merge_session_tokens(self._tokens.get(key), token)
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > self.max_threads:
+                self._tokens.popitem(last=False)
+
+    def forget(self, thread_id: str) -> None:
+        """Drop the tokens of a thread in every container."""
+        with self._lock:
+            for key in [key for key in self._tokens if key[1] == thread_id]:
+                del self._tokens[key]
+
+    def write_options(self, container: Any, thread_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Return request options that record the session token of a write.
+
+        The per-request raw_response_hook replaces the client-wide one, so
+        it also records the response metrics.
+
+        Args:
+            container (ContainerProxy): Container written to
+            thread_id (Optional[str]): Chat thread of the written item
+
+        Returns:
+            Dict[str, Any]: Keyword arguments for the write call
+        """
+        if not self.enabled or not thread_id:
+            return {}
+        container_id = container.id
+
+        def capture(response: Any) -> None:
+            record_cosmos_response(response)
+            try:
+                self.observe(container_id, thread_id, response.http_response.headers.get(SESSION_TOKEN_HEADER))
+            except Exception as e:
+                logger.debug("Could not read the session token: %s", e)
+
+        return {"raw_response_hook": capture}
+
+    def read_options(self, container: Any, thread_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Return request options that make a read see the thread's own writes.
+
+        Args:
+            container (ContainerProxy): Container read from
+            thread_id (Optional[str]): Chat thread of the read item
+
+        Returns:
+            Dict[str, Any]: Keyword arguments for the read call
+        """
+        if not self.enabled or not thread_id:
+            return {}
+        token = self.token(container.id, thread_id)
+        SESSION_READS.inc(token="tracked" if token else "untracked")
+        return {"session_token": token} if token else {}
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of tracked (container, thread) entries."""
+        with self._lock:
+            return {"tracked": len(self._tokens)}
+
+
+session_tokens = SessionTokenTracker()
@@ -0,0 +1,146 @@
+"""
+Request coalescing (single-flight) for identical in-flight questions.
+
+When many users ask the same question at the same time, only the first
+request (the leader) calls the upstream endpoint; concurrent identical
+requests await the leader's result instead of issuing their own call.
+Requests are considered identical when their normalized messages match,
+so a question asked with empty or equivalent history is shared.
+
+Only in-flight calls are shared; nothing is cached after completion.
+"""
+
+import os
+import re
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, TypeVar
+
+from utils import setup_logger
+
+logger = setup_logger("singleflight")
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+T = TypeVar("T")
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for request matching.
+
+    Lower-cases, collapses whitespace and strips trailing punctuation, so
+    "How do I book a service?" and "how do i  book a service" match.
+
+    Args:
+        text (str): Text to normalize
+
+    Returns:
+        str: Normalized text
+    """
+    text = _WHITESPACE.sub(" ", (text or "").strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def request_key(messages: List[Dict[str, str]]) -> str:
+    """
+    Build the coalescing key for a list of chat messages.
+
+    Args:
+        messages (List[Dict[str, str]]): Chat history including the current query
+
+    Returns:
+        str: Hex digest identifying equivalent requests
+    """
+    normalized = [
+        [message.get("role", ""), normalize_text(message.get("content", ""))]
+        for message in messages
+    ]
+    payload = json.dumps(normalized, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key.
+
+    The upstream call runs in its own task, so cancelling one waiting
+    caller (e.g. a user pressing stop) does not cancel it for the others.
+
+    Attributes:
+        leader_calls (int): Number of upstream calls made
+        shared_calls (int): Number of callers served by another caller's upstream call
+    """
+
+    def __init__(self) -> None:
+        self.leader_calls = 0
+        self.shared_calls = 0
+        self._in_flight: Dict[str, "asyncio.Task"] = {}
+
+    def in_flight(self) -> int:
+        """Return the number of upstream calls currently in flight."""
+        return len(self._in_flight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn, or join an identical call that is already in flight.
+
+        Args:
+            key (str): Coalescing key, see request_key()
+            fn (Callable[[], Awaitable[T]]): Coroutine factory making the upstream call
+
+        Returns:
+            T: Result of the (possibly shared) upstream call
+
+        Raises:
+            Exception: Whatever the upstream call raised, for every waiting caller
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.shared_calls += 1
+            logger.info("Joined in-flight request %s", key[:12])
+            return await asyncio.shield(task)
+
+        self.leader_calls += 1
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task") -> None:
+        """Forget a completed call and mark its exception as retrieved."""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return coalescing counters."""
+        return {
+            "leader_calls": self.leader_calls,
+            "shared_calls": self.shared_calls,
+            "in_flight": self.in_flight(),
+        }
+
+
+endpoint_flights = SingleFlight()
+
+
+async def coalesce(messages: List[Dict[str, str]], fn: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run an upstream call for messages, sharing it with identical in-flight requests.
+
+    Args:
+        messages (List[Dict[str, str]]): Chat history including the current query
+        fn (Callable[[], Awaitable[T]]): Coroutine factory making the upstream call
+
+    Returns:
+        T: Result of the (possibly shared) upstream call
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return await fn()
+    return await endpoint_flights.do(request_key(messages), fn)
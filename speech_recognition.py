@@ -5,6 +5,7 @@ import requests
 import logging 
 from dotenv import load_dotenv
 from utils import setup_logger
+from tracing import start_span
 
 load_dotenv()
 logger = setup_logger("speech_recognition")
@@ -59,34 +60,45 @@ def recognize_from_file(filename: str) -> str:
             "locales": get_locales()
         }
         
-        with open(filename, "rb") as audio_file:
-            files = {
-                "audio": audio_file,
-                "definition": (None, json.dumps(definition), "application/json")
-            }
-            
+        with start_span("speech.read_audio") as span:
+            with open(filename, "rb") as audio_file:
+                audio_bytes = audio_file.read()
+            span.set_attribute("audio.bytes", len(audio_bytes))
+
+        files = {
+            "audio": (os.path.basename(filename), audio_bytes),
+            "definition": (None, json.dumps(definition), "application/json")
+        }
+
+        with start_span("speech.request", {"audio.bytes": len(audio_bytes)}) as span:
             response = requests.post(url, headers=headers, files=files)
+            # Time from sending the upload until the response headers arrived
+            span.set_attribute("http.elapsed_ms", response.elapsed.total_seconds() * 1000)
+            span.set_attribute("http.status_code", response.status_code)
             response.raise_for_status()
-            
+
             result: Dict[str, Any] = response.json()
+            if result.get("durationMilliseconds") is not None:
+                span.set_attribute("speech.audio_duration_ms", result["durationMilliseconds"])
+
+        if not result.get("combinedPhrases"):
+            return "No speech could be recognized."
             
-            if not result.get("combinedPhrases"):
-                return "No speech could be recognized."
-                
-            phrases = result["combinedPhrases"]
-            if len(phrases) > 1:
-                highest_confidence_phrase = max(
-                    phrases, 
-                    key=lambda x: x.get('confidence', 0)
-                )
-                logger.info(
-                    f"Selected phrase in {highest_confidence_phrase.get('locale', 'unknown')} "
-                    f"with confidence: {highest_confidence_phrase.get('confidence')}"
-                )
-                return highest_confidence_phrase['text']
-            
-            return phrases[0]['text']
-            
+        phrases = result["combinedPhrases"]
+        if len(phrases) > 1:
+            highest_confidence_phrase = max(
+                phrases, 
+                key=lambda x: x.get('confidence', 0)
+            )
+            logger.info(
+                "Selected phrase in %s with confidence: %s",
+                highest_confidence_phrase.get('locale', 'unknown'),
+                highest_confidence_phrase.get('confidence')
+            )
+            return highest_confidence_phrase['text']
+        
+        return phrases[0]['text']
+        
     except requests.exceptions.HTTPError as e:
         error_msg = f"API Error: {e.response.status_code}, {e.response.text}"
         logger.error(error_msg)
@@ -0,0 +1,245 @@
+"""
+Startup helpers for the Copilot UI application.
+
+This module keeps container cold start fast and resilient:
+- lazy_import() defers heavy modules until their first attribute access
+- WarmUp provisions shared resources (Cosmos clients, containers) either
+  eagerly at import or in a background thread with a readiness flag
+- LazyDataLayer stands in for the Chainlit data layer until it is ready
+
+Set LAZY_STARTUP=true to enable background warm-up. In the default eager
+mode resources are provisioned at import and failures abort startup.
+"""
+
+import os
+import time
+import asyncio
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import setup_logger
+
+logger = setup_logger("startup")
+
+LAZY_STARTUP = os.getenv("LAZY_STARTUP", "false").lower() in ("1", "true", "yes")
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+WARMUP_MAX_RETRY_SECONDS = float(os.getenv("WARMUP_MAX_RETRY_SECONDS", "60"))
+
+
+class _LazyModule(ModuleType):
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self.__name__)
+            logger.info(
+                "Lazily imported %s in %.1f ms", self.__name__, (time.perf_counter() - start) * 1000
+            )
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Return a proxy for a module that is imported on first use.
+
+    Args:
+        name (str): Fully qualified module name
+
+    Returns:
+        ModuleType: Proxy forwarding attribute access to the real module
+
+    Example:
+        >>> np = lazy_import("numpy")
+        >>> np.zeros(3)  # numpy is imported here
+    """
+    return _LazyModule(name)
+
+
+class WarmUp:
+    """
+    Registry of named resources provisioned at startup.
+
+    Resources are built by factories, in registration order. In lazy mode
+    start() builds them in a daemon thread and retries failures with
+    backoff, so an outage of a backing service delays readiness instead of
+    crashing the process. get() builds a resource on demand if the
+    background thread has not reached it yet.
+
+    Attributes:
+        ready (threading.Event): Set once every registered resource is built
+        errors (Dict[str, str]): Last provisioning error per resource
+    """
+
+    def __init__(self) -> None:
+        self.ready = threading.Event()
+        self.errors: Dict[str, str] = {}
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._resources: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Register a resource factory.
+
+        Args:
+            name (str): Resource name
+            factory (Callable[[], Any]): Zero-argument callable building the resource
+        """
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+        self.ready.clear()
+
+    def provide(self, name: str, resource: Any) -> None:
+        """
+        Supply an already-built resource, e.g. a local stand-in for benchmarks.
+
+        A provided resource takes precedence over any registered factory.
+
+        Args:
+            name (str): Resource name
+            resource (Any): The resource
+        """
+        self._resources[name] = resource
+        self._locks.setdefault(name, threading.Lock())
+        self._factories.setdefault(name, lambda: resource)
+        if not self.pending():
+            self.ready.set()
+
+    def is_ready(self) -> bool:
+        """Return True once every registered resource has been built."""
+        return self.ready.is_set()
+
+    def pending(self) -> List[str]:
+        """Return the names of resources that are not built yet."""
+        return [name for name in self._factories if name not in self._resources]
+
+    def get(self, name: str) -> Any:
+        """
+        Return a resource, building it now if it is not ready yet.
+
+        Args:
+            name (str): Resource name
+
+        Returns:
+            Any: The built resource
+
+        Raises:
+            KeyError: If no factory is registered under the name
+            Exception: Whatever the factory raises
+        """
+        if name in self._resources:
+            return self._resources[name]
+        if name not in self._factories:
+            raise KeyError(f"No warm-up resource registered as '{name}'")
+
+        with self._locks[name]:
+            if name not in self._resources:
+                start = time.perf_counter()
+                try:
+                    self._resources[name] = self._factories[name]()
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    raise
+                self.errors.pop(name, None)
+                logger.info(
+                    "Warm-up resource '%s' ready in %.1f ms", name, (time.perf_counter() - start) * 1000
+                )
+        if not self.pending():
+            self.ready.set()
+        return self._resources[name]
+
+    def run_now(self) -> None:
+        """
+        Build every registered resource synchronously.
+
+        Raises:
+            Exception: The first provisioning error encountered
+        """
+        for name in list(self._factories):
+            self.get(name)
+
+    def _run(self) -> None:
+        """Background loop building resources until all are ready."""
+        delay = WARMUP_RETRY_SECONDS
+        while self.pending():
+            for name in self.pending():
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error("Warm-up of '%s' failed: %s", name, e)
+            if self.pending():
+                logger.warning(
+                    "Warm-up incomplete (%s), retrying in %.0fs", ', '.join(self.pending()), delay
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, WARMUP_MAX_RETRY_SECONDS)
+        self.ready.set()
+        logger.info("Warm-up complete")
+
+    def start(self) -> None:
+        """Start building resources in a background daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+        self._thread.start()
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for readiness without blocking the event loop.
+
+        Args:
+            timeout (Optional[float]): Maximum seconds to wait
+
+        Returns:
+            bool: True if ready
+        """
+        return await asyncio.to_thread(self.ready.wait, timeout)
+
+
+warm_up = WarmUp()
+
+
+class LazyDataLayer:
+    """
+    Stand-in for the Chainlit data layer while it is being provisioned.
+
+    Attribute access is forwarded to the real data layer once it exists.
+    Before that, coroutine methods are wrapped so that awaiting them builds
+    (or waits for) the data layer in a worker thread instead of blocking
+    the event loop.
+    """
+
+    def __init__(self, warmup: WarmUp, name: str, cls_loader: Callable[[], type]) -> None:
+        """
+        Args:
+            warmup (WarmUp): Registry that builds the data layer
+            name (str): Name the data layer is registered under
+            cls_loader (Callable[[], type]): Returns the data layer class, used to inspect methods
+        """
+        self._warm_up = warmup
+        self._name = name
+        self._cls_loader = cls_loader
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._name in self._warm_up._resources:
+            return getattr(self._warm_up.get(self._name), attr)
+
+        if not asyncio.iscoroutinefunction(getattr(self._cls_loader(), attr, None)):
+            return getattr(self._warm_up.get(self._name), attr)
+
+        async def deferred(*args: Any, **kwargs: Any) -> Any:
+            layer = await asyncio.to_thread(self._warm_up.get, self._name)
+            return await getattr(layer, attr)(*args, **kwargs)
+
+        return deferred
@@ -0,0 +1,721 @@
+"""
+Storage backends for conversations, threads, steps and feedback.
+
+The application talks to two interfaces:
+- ConversationStore: conversation history sent to the Databricks endpoint,
+  with per-message feedback (implemented by cosmos_db.AzureCosmosClass)
+- ThreadStore: Chainlit threads, steps and feedback used by the data layer
+  (implemented by data_layer.CosmosThreadStore)
+
+SQLiteStorage implements both on an embedded SQLite database in WAL mode,
+for development, CI and single-node deployments without Azure.
+
+Set STORAGE_BACKEND to "cosmos" (default) or "sqlite"; SQLITE_PATH sets the
+database file for the SQLite backend. With CONTEXT_DEDUP_ENABLED, both
+backends store retrieval context by reference (see context_store.py).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from contextlib import contextmanager
+
+from utils import setup_logger
+from context_store import CONTEXT_DEDUP_ENABLED, ContextStore, externalize, hydrate
+
+logger = setup_logger("storage")
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cosmos").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "copilot_ui.db")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+class StorageNotFoundError(LookupError):
+    """Raised when an item to delete does not exist."""
+
+
+class ConversationStore(ABC):
+    """
+    Conversation history and per-message feedback.
+
+    Attributes:
+        context_store (Optional[ContextStore]): Blob store for retrieval context
+            saved by reference, or None to save it inline
+    """
+
+    context_store: Optional[ContextStore] = None
+
+    @abstractmethod
+    def upload_data(self, chat_id: str) -> None:
+        """Create an empty conversation."""
+
+    @abstractmethod
+    def get_data(self, conversation_id: str) -> Union[Dict, bool]:
+        """Return the conversation document, or False if it does not exist."""
+
+    @abstractmethod
+    def update_conversation(
+            self,
+            databricks_request_id: str,
+            chat_id: str,
+            message_id: str,
+            user_message: str,
+            rephrased_message: str,
+            check_query: str,
+            ai_answer: str,
+            context: str,
+            comparison_details: Optional[Dict],
+            translation: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Append a turn to an existing conversation."""
+
+    @abstractmethod
+    def upsert_feedback(
+            self,
+            chat_id: str,
+            message_id: str,
+            feedback_vote: str,
+            feedback_text: str
+    ) -> None:
+        """Set the feedback of a message; raises ValueError if the message is unknown."""
+
+    @abstractmethod
+    def reset_feedback(self, chat_id: str, message_id: str) -> None:
+        """Clear the feedback of a message; raises ValueError if the message is unknown."""
+
+    @abstractmethod
+    def iter_conversations(self, partition: Any = None) -> Iterator[Dict]:
+        """
+        Yield every conversation document (for offline jobs, not the request path).
+
+        Args:
+            partition (Any): One of conversation_partitions() to scan only
+                that part, or None for all conversations
+        """
+
+    def conversation_partitions(self) -> List[Any]:
+        """Return opaque partitions that iter_conversations can scan in parallel."""
+        return [None]
+
+    def hydrate_message(self, message: Dict) -> Dict:
+        """
+        Return a stored message with its context and comparison details resolved.
+
+        Messages keep only references to context saved by reference; call this
+        when the text is actually needed.
+
+        Args:
+            message (Dict): Message from a conversation document
+
+        Returns:
+            Dict: Message with "context" and "comparison_details" inline
+        """
+        return hydrate(message, self.context_store)
+
+    def get_chat_history(self, chat_id: str) -> List[Dict[str, str]]:
+        """
+        Retrieve conversation history for a given chat ID.
+
+        A new, empty conversation is created if none exists yet.
+
+        Args:
+            chat_id (str): The conversation identifier
+
+        Returns:
+            List[Dict[str, str]]: List of conversation messages
+
+        Raises:
+            Exception: If retrieval of chat history fails
+        """
+        try:
+            existing_data = self.get_data(chat_id)
+
+            if not existing_data:
+                self.upload_data(chat_id)
+                return []
+
+            chat_history = []
+            for msg in existing_data.get('conversation', []):
+                if msg.get('user_message'):
+                    chat_history.append({
+                        "role": "user",
+                        "content": msg['user_message']
+                    })
+                if msg.get('ai_answer'):
+                    chat_history.append({
+                        "role": "assistant",
+                        "content": msg['ai_answer']
+                    })
+
+            return chat_history
+
+        except Exception as e:
+            logger.error("Failed to retrieve chat history: %s", e)
+            raise
+
+
+class ThreadStore(ABC):
+    """Chainlit threads, steps and thread-level feedback."""
+
+    @abstractmethod
+    def get_thread(self, thread_id: str) -> Optional[Dict]:
+        """Return a thread document, or None."""
+
+    @abstractmethod
+    def upsert_thread(self, thread: Dict) -> None:
+        """Create or replace a thread document."""
+
+    @abstractmethod
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete a thread and its steps; raises StorageNotFoundError if missing."""
+
+    @abstractmethod
+    def find_thread_by_feedback(self, message_id: str) -> Optional[Dict]:
+        """Return the thread holding feedback for a message, or None."""
+
+    @abstractmethod
+    def list_threads(
+        self,
+        user_id: Optional[str],
+        tag: Optional[str],
+        offset: int,
+        limit: int
+    ) -> Tuple[List[Dict], int]:
+        """Return one page of threads matching the filters, and the total match count."""
+
+    @abstractmethod
+    def get_step(self, step_id: str, thread_id: Optional[str] = None) -> Optional[Dict]:
+        """Return a step document, or None; thread_id is a lookup hint."""
+
+    @abstractmethod
+    def upsert_step(self, step: Dict) -> None:
+        """Create or replace a step document."""
+
+    @abstractmethod
+    def delete_step(self, step_id: str, thread_id: Optional[str] = None) -> None:
+        """Delete a step; raises StorageNotFoundError if missing. thread_id is a lookup hint."""
+
+    @abstractmethod
+    def list_steps(self, thread_id: str) -> List[Dict]:
+        """Return the steps of a thread."""
+
+    def delete_thread_steps(self, thread_id: str) -> int:
+        """Delete the steps of a thread (even without a thread document) and return how many."""
+        steps = self.list_steps(thread_id)
+        for step in steps:
+            self.delete_step(step["id"], thread_id)
+        return len(steps)
+
+    def set_steps_ttl(self, thread_id: str, ttl: int) -> int:
+        """
+        Make the steps of a thread expire ttl seconds from now.
+
+        Args:
+            thread_id (str): Thread whose steps are updated
+            ttl (int): Seconds until expiry, or -1 to never expire
+
+        Returns:
+            int: Number of steps updated
+        """
+        steps = self.list_steps(thread_id)
+        for step in steps:
+            self.upsert_step({**step, "ttl": ttl})
+        return len(steps)
+
+    @abstractmethod
+    def set_thread_ttl(self, thread_id: str, ttl: int, archived_at: Optional[str] = None) -> None:
+        """
+        Make a thread expire ttl seconds from now, in one write.
+
+        Args:
+            thread_id (str): Thread to update
+            ttl (int): Seconds until expiry
+            archived_at (Optional[str]): Also record when the thread was archived ("archivedAt")
+
+        Raises:
+            StorageNotFoundError: If the thread does not exist
+        """
+
+    @abstractmethod
+    def archive_thread(self, record: Dict) -> None:
+        """Store an archive record (thread, steps and conversation) that never expires."""
+
+    def purge_expired(self) -> int:
+        """Delete expired items and return how many; backends with native TTL need not."""
+        return 0
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    message_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_id, seq);
+CREATE INDEX IF NOT EXISTS idx_messages_message ON messages (chat_id, message_id);
+
+CREATE TABLE IF NOT EXISTS threads (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_threads_user ON threads (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_threads_created ON threads (created_at);
+CREATE TABLE IF NOT EXISTS thread_tags (
+    tag TEXT NOT NULL,
+    thread_id TEXT NOT NULL REFERENCES threads(id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, thread_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_thread_tags_thread ON thread_tags (thread_id);
+CREATE TABLE IF NOT EXISTS thread_feedback (
+    message_id TEXT NOT NULL,
+    thread_id TEXT NOT NULL REFERENCES threads(id) ON DELETE CASCADE,
+    PRIMARY KEY (message_id, thread_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_thread_feedback_thread ON thread_feedback (thread_id);
+
+CREATE TABLE IF NOT EXISTS steps (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_steps_thread ON steps (thread_id, created_at);
+
+CREATE TABLE IF NOT EXISTS archived_threads (
+    id TEXT PRIMARY KEY,
+    archived_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS context_blobs (
+    id TEXT PRIMARY KEY,
+    encoding TEXT NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteStorage(ConversationStore, ThreadStore):
+    """
+    Embedded SQLite implementation of ConversationStore and ThreadStore.
+
+    Each thread gets its own connection (SQLite connections are not shared
+    across threads); WAL mode lets readers proceed while a write commits.
+    Conversation turns are rows of their own, so appending a turn is a
+    single insert rather than a read-modify-write of the whole document.
+
+    Attributes:
+        path (str): Database file
+    """
+
+    def __init__(self, path: str = SQLITE_PATH) -> None:
+        """
+        Args:
+            path (str): Database file, created if missing
+
+        Raises:
+            sqlite3.Error: If the database cannot be opened or initialized
+        """
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+        self.context_store = SQLiteContextStore(self) if CONTEXT_DEDUP_ENABLED else None
+        logger.info("SQLite storage ready at %s", path)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints; a power loss can drop only the last commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ConversationStore
+
+    def upload_data(self, chat_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO conversations (id, created_at) VALUES (?, ?)",
+                (chat_id, datetime.now(timezone.utc).isoformat())
+            )
+        logger.info("Created new conversation with chat_id: %s", chat_id)
+
+    def get_data(self, conversation_id: str) -> Union[Dict, bool]:
+        conn = self._connection()
+        if conn.execute(
+            "SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone() is None:
+            logger.info("No existing conversation found for ID: %s", conversation_id)
+            return False
+        rows = conn.execute(
+            "SELECT data FROM messages WHERE chat_id = ? ORDER BY seq", (conversation_id,)
+        ).fetchall()
+        return {
+            "id": conversation_id,
+            "conversation": [json.loads(row["data"]) for row in rows],
+        }
+
+    def iter_conversations(self, partition: Any = None) -> Iterator[Dict]:
+        # A single partition; a dedicated connection, so the caller can write while iterating
+        conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        try:
+            current: Optional[Dict] = None
+            for row in conn.execute(
+                "SELECT c.id, m.data FROM conversations c"
+                " LEFT JOIN messages m ON m.chat_id = c.id ORDER BY c.id, m.seq"
+            ):
+                if current is None or current["id"] != row["id"]:
+                    if current is not None:
+                        yield current
+                    current = {"id": row["id"], "conversation": []}
+                if row["data"] is not None:
+                    current["conversation"].append(json.loads(row["data"]))
+            if current is not None:
+                yield current
+        finally:
+            conn.close()
+
+    def update_conversation(
+            self,
+            databricks_request_id: str,
+            chat_id: str,
+            message_id: str,
+            user_message: str,
+            rephrased_message: str,
+            check_query: str,
+            ai_answer: str,
+            context: str,
+            comparison_details: Optional[Dict],
+            translation: Optional[Dict[str, str]] = None
+    ) -> None:
+        new_message = {
+            "databricks_request_id": databricks_request_id,
+            "message_id": message_id,
+            "user_message": user_message,
+            "rephrased_message": rephrased_message,
+            "check_query": check_query,
+            "comparison_details": comparison_details,
+            "ai_answer": ai_answer,
+            "context": context,
+            "feedback_vote": 0,
+            "feedback_text": "",
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+        if translation:
+            new_message["translation"] = translation
+        if self.context_store is not None:
+            externalize(new_message, self.context_store)
+
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM conversations WHERE id = ?", (chat_id,)).fetchone() is None:
+                raise ValueError(f"Conversation {chat_id} not found")
+            conn.execute(
+                "INSERT INTO messages (chat_id, message_id, data) VALUES (?, ?, ?)",
+                (chat_id, message_id, json.dumps(new_message))
+            )
+        logger.info("Successfully updated conversation for chat_id: %s", chat_id)
+
+    def _set_feedback(self, chat_id: str, message_id: str, vote: Any, text: str) -> None:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT seq FROM messages WHERE chat_id = ? AND message_id = ? ORDER BY seq LIMIT 1",
+                (chat_id, message_id)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Message ID {message_id} not found in conversation")
+            conn.execute(
+                "UPDATE messages SET data = json_set(data, '$.feedback_vote', json(?), "
+                "'$.feedback_text', ?) WHERE seq = ?",
+                (json.dumps(vote), text, row["seq"])
+            )
+
+    def upsert_feedback(
+            self,
+            chat_id: str,
+            message_id: str,
+            feedback_vote: str,
+            feedback_text: str
+    ) -> None:
+        self._set_feedback(chat_id, message_id, feedback_vote, feedback_text)
+        logger.info("Feedback updated for message %s in chat %s", message_id, chat_id)
+
+    def reset_feedback(self, chat_id: str, message_id: str) -> None:
+        self._set_feedback(chat_id, message_id, 0, "")
+        logger.info("Feedback reset for message %s in chat %s", message_id, chat_id)
+
+    # ThreadStore
+
+    @staticmethod
+    def _serialize(item: Dict) -> str:
+        # Mirrors Cosmos DB TTL: the item expires ttl seconds after its last write
+        if item.get("ttl", 0) > 0:
+            item = {**item, "_expires_at": time.time() + item["ttl"]}
+        return json.dumps(item, default=str)
+
+    def get_thread(self, thread_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT data FROM threads WHERE id = ?", (thread_id,)
+        ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def upsert_thread(self, thread: Dict) -> None:
+        thread_id = thread["id"]
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO threads (id, user_id, created_at, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET user_id = excluded.user_id, "
+                "created_at = excluded.created_at, data = excluded.data",
+                (thread_id, thread.get("userId"), thread.get("createdAt"), self._serialize(thread))
+            )
+            conn.execute("DELETE FROM thread_tags WHERE thread_id = ?", (thread_id,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO thread_tags (tag, thread_id) VALUES (?, ?)",
+                [(tag, thread_id) for tag in thread.get("tags") or []]
+            )
+            conn.execute("DELETE FROM thread_feedback WHERE thread_id = ?", (thread_id,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO thread_feedback (message_id, thread_id) VALUES (?, ?)",
+                [(fb["message_id"], thread_id) for fb in thread.get("feedback") or []]
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._transaction() as conn:
+            deleted = conn.execute("DELETE FROM threads WHERE id = ?", (thread_id,)).rowcount
+            if not deleted:
+                raise StorageNotFoundError(f"Thread not found: {thread_id}")
+            conn.execute("DELETE FROM steps WHERE thread_id = ?", (thread_id,))
+
+    def find_thread_by_feedback(self, message_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT t.data FROM thread_feedback f JOIN threads t ON t.id = f.thread_id "
+            "WHERE f.message_id = ? LIMIT 1",
+            (message_id,)
+        ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def list_threads(
+        self,
+        user_id: Optional[str],
+        tag: Optional[str],
+        offset: int,
+        limit: int
+    ) -> Tuple[List[Dict], int]:
+        where, params = ["1=1"], []
+        if user_id:
+            where.append("t.user_id = ?")
+            params.append(user_id)
+        if tag:
+            where.append("EXISTS (SELECT 1 FROM thread_tags g WHERE g.thread_id = t.id AND g.tag = ?)")
+            params.append(tag)
+        clause = " AND ".join(where)
+
+        conn = self._connection()
+        rows = conn.execute(
+            f"SELECT t.data FROM threads t WHERE {clause} "
+            "ORDER BY t.created_at DESC, t.id LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        total = conn.execute(f"SELECT COUNT(*) FROM threads t WHERE {clause}", params).fetchone()[0]
+        return [json.loads(row["data"]) for row in rows], total
+
+    def get_step(self, step_id: str, thread_id: Optional[str] = None) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT data FROM steps WHERE id = ?", (step_id,)
+        ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def upsert_step(self, step: Dict) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO steps (id, thread_id, created_at, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET thread_id = excluded.thread_id, "
+                "created_at = excluded.created_at, data = excluded.data",
+                (step["id"], step.get("threadId"), step.get("createdAt"), self._serialize(step))
+            )
+
+    def delete_step(self, step_id: str, thread_id: Optional[str] = None) -> None:
+        with self._transaction() as conn:
+            if not conn.execute("DELETE FROM steps WHERE id = ?", (step_id,)).rowcount:
+                raise StorageNotFoundError(f"Step not found: {step_id}")
+
+    def delete_thread_steps(self, thread_id: str) -> int:
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM steps WHERE thread_id = ?", (thread_id,)).rowcount
+
+    def set_steps_ttl(self, thread_id: str, ttl: int) -> int:
+        with self._transaction() as conn:
+            if ttl <= 0:
+                # Like Cosmos DB's ttl -1: never expire
+                return conn.execute(
+                    "UPDATE steps SET data = json_set(json_remove(data, '$._expires_at'), '$.ttl', ?) "
+                    "WHERE thread_id = ?",
+                    (ttl, thread_id)
+                ).rowcount
+            return conn.execute(
+                "UPDATE steps SET data = json_set(data, '$.ttl', ?, '$._expires_at', ?) WHERE thread_id = ?",
+                (ttl, time.time() + ttl, thread_id)
+            ).rowcount
+
+    def list_steps(self, thread_id: str) -> List[Dict]:
+        rows = self._connection().execute(
+            "SELECT data FROM steps WHERE thread_id = ? ORDER BY created_at", (thread_id,)
+        ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def set_thread_ttl(self, thread_id: str, ttl: int, archived_at: Optional[str] = None) -> None:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM threads WHERE id = ?", (thread_id,)).fetchone()
+            if row is None:
+                raise StorageNotFoundError(f"Thread not found: {thread_id}")
+            thread = json.loads(row["data"])
+            thread["ttl"] = ttl
+            if archived_at is not None:
+                thread["archivedAt"] = archived_at
+            conn.execute(
+                "UPDATE threads SET data = ? WHERE id = ?", (self._serialize(thread), thread_id)
+            )
+
+    def archive_thread(self, record: Dict) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO archived_threads (id, archived_at, data) VALUES (?, ?, ?)",
+                (record["id"], record["archived_at"], json.dumps(record, default=str))
+            )
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            purged = 0
+            for table in ("threads", "steps"):
+                purged += conn.execute(
+                    f"DELETE FROM {table} WHERE json_extract(data, '$._expires_at') < ?", (now,)
+                ).rowcount
+        return purged
+
+
+class SQLiteContextStore(ContextStore):
+    """Context blobs in the context_blobs table of a SQLiteStorage database."""
+
+    def __init__(self, storage: SQLiteStorage) -> None:
+        """
+        Args:
+            storage (SQLiteStorage): Database holding the blobs
+        """
+        super().__init__()
+        self._storage = storage
+
+    def _write(self, document: Dict[str, Any]) -> bool:
+        cursor = self._storage._connection().execute(
+            "INSERT OR IGNORE INTO context_blobs (id, encoding, data, size) VALUES (?, ?, ?, ?)",
+            (document["id"], document["encoding"], document["data"], document["size"])
+        )
+        return cursor.rowcount > 0
+
+    def _read(self, ref: str) -> Optional[Dict[str, Any]]:
+        row = self._storage._connection().execute(
+            "SELECT id, encoding, data, size FROM context_blobs WHERE id = ?", (ref,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+
+_sqlite_instances: Dict[str, SQLiteStorage] = {}
+_sqlite_lock = threading.Lock()
+
+
+def get_sqlite_storage(path: str = SQLITE_PATH) -> SQLiteStorage:
+    """
+    Return the process-wide SQLiteStorage for a database file.
+
+    Args:
+        path (str): Database file
+
+    Returns:
+        SQLiteStorage: Shared instance
+    """
+    with _sqlite_lock:
+        storage = _sqlite_instances.get(path)
+        if storage is None:
+            storage = SQLiteStorage(path)
+            _sqlite_instances[path] = storage
+        return storage
+
+
+def create_conversation_store(backend: str = STORAGE_BACKEND) -> ConversationStore:
+    """
+    Build the conversation store selected by STORAGE_BACKEND.
+
+    Args:
+        backend (str): "cosmos" or "sqlite"
+
+    Returns:
+        ConversationStore: Store instance
+
+    Raises:
+        ValueError: If the backend is unknown or its configuration is missing
+    """
+    if backend == "sqlite":
+        return get_sqlite_storage()
+    if backend == "cosmos":
+        from cosmos_db import AzureCosmosClass
+
+        return AzureCosmosClass()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+def create_thread_store(backend: str = STORAGE_BACKEND) -> ThreadStore:
+    """
+    Build the thread store selected by STORAGE_BACKEND.
+
+    Args:
+        backend (str): "cosmos" or "sqlite"
+
+    Returns:
+        ThreadStore: Store instance
+
+    Raises:
+        ValueError: If the backend is unknown or its configuration is missing
+    """
+    if backend == "sqlite":
+        return get_sqlite_storage()
+    if backend == "cosmos":
+        from data_layer import CosmosThreadStore
+
+        return CosmosThreadStore.from_env()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -0,0 +1,282 @@
+"""
+Span-based latency tracing for the chat pipeline.
+
+The tracer exposes the subset of the OpenTelemetry tracing API used by this
+application (start_as_current_span, set_attribute, set_status,
+record_exception, add_event), so instrumentation code works unchanged
+with either backend:
+
+- TRACING_EXPORTER=none (default): spans are created but not exported
+- TRACING_EXPORTER=console: finished spans are printed as JSON lines
+- TRACING_EXPORTER=file: finished spans are appended to TRACING_FILE
+- TRACING_EXPORTER=otel: the opentelemetry SDK tracer is used, configured
+  by the standard OTEL_* environment variables (optional dependency)
+
+Span records use OpenTelemetry field names (trace_id, span_id,
+parent_span_id, start_time_unix_nano, end_time_unix_nano, attributes).
+"""
+
+import os
+import sys
+import json
+import time
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils import setup_logger
+
+logger = setup_logger("tracing")
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "copilot_ui")
+
+STATUS_UNSET = "UNSET"
+STATUS_OK = "OK"
+STATUS_ERROR = "ERROR"
+
+
+class Span:
+    """
+    A timed operation within a trace.
+
+    Attributes:
+        name (str): Operation name
+        trace_id (str): 32-hex-digit trace identifier
+        span_id (str): 16-hex-digit span identifier
+        parent_span_id (Optional[str]): Parent span identifier
+        attributes (Dict[str, Any]): Span attributes
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str] = None) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_UNSET
+        self.status_description: Optional[str] = None
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano: Optional[int] = None
+        self._start_perf = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set a span attribute."""
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        """Set several span attributes."""
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        """Record a timestamped event on the span."""
+        self.events.append({
+            "name": name,
+            "time_unix_nano": time.time_ns(),
+            "attributes": attributes or {},
+        })
+
+    def set_status(self, status: str, description: Optional[str] = None) -> None:
+        """Set the span status ("OK" or "ERROR")."""
+        self.status = status
+        self.status_description = description
+
+    def record_exception(self, exception: BaseException) -> None:
+        """Record an exception as a span event."""
+        self.add_event("exception", {
+            "exception.type": type(exception).__name__,
+            "exception.message": str(exception),
+        })
+
+    def end(self) -> None:
+        """Finish the span."""
+        if self.end_time_unix_nano is None:
+            self.end_time_unix_nano = time.time_ns()
+            self.duration_ms = (time.perf_counter() - self._start_perf) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the span as an OpenTelemetry-style record."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "status": {"code": self.status, "description": self.status_description},
+            "attributes": self.attributes,
+            "events": self.events,
+            "resource": {"service.name": SERVICE_NAME},
+        }
+
+
+class SpanExporter:
+    """Base exporter; receives finished spans."""
+
+    def export(self, span: Span) -> None:
+        """Export a finished span."""
+
+    def shutdown(self) -> None:
+        """Flush and release resources."""
+
+
+class NoopExporter(SpanExporter):
+    """Discards spans."""
+
+
+class ConsoleExporter(SpanExporter):
+    """Writes spans to a stream as JSON lines."""
+
+    def __init__(self, stream: Any = None) -> None:
+        self.stream = stream or sys.stdout
+
+    def export(self, span: Span) -> None:
+        self.stream.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+class FileExporter(SpanExporter):
+    """Appends spans to a file as JSON lines."""
+
+    def __init__(self, path: str = TRACING_FILE) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps finished spans in a list, for tests and benchmarks."""
+
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Tracer:
+    """
+    Minimal tracer with OpenTelemetry-compatible span API.
+
+    The current span is tracked in a context variable, so nesting works
+    across awaits and into asyncio.to_thread() workers.
+
+    Attributes:
+        exporter (SpanExporter): Destination for finished spans
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None) -> None:
+        self.exporter = exporter or NoopExporter()
+
+    @contextmanager
+    def start_as_current_span(
+        self, name: str, attributes: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Span]:
+        """
+        Start a span as a child of the current span and make it current.
+
+        Args:
+            name (str): Operation name
+            attributes (Optional[Dict[str, Any]]): Initial attributes
+
+        Yields:
+            Span: The started span; it ends when the block exits
+        """
+        parent = _current_span.get()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            parent_span_id=parent.span_id if parent else None,
+        )
+        if attributes:
+            span.set_attributes(attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            span.set_status(STATUS_ERROR, str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logger.warning("Span export failed: %s", e)
+
+
+def get_current_span() -> Optional[Span]:
+    """Return the active span of the built-in tracer, if any."""
+    return _current_span.get()
+
+
+def _build_tracer() -> Any:
+    """Create the tracer selected by TRACING_EXPORTER."""
+    if TRACING_EXPORTER == "otel":
+        try:
+            from opentelemetry import trace
+
+            return trace.get_tracer(SERVICE_NAME)
+        except ImportError:
+            logger.warning("opentelemetry is not installed; falling back to no-op tracing")
+            return Tracer()
+    if TRACING_EXPORTER == "console":
+        return Tracer(ConsoleExporter())
+    if TRACING_EXPORTER == "file":
+        return Tracer(FileExporter())
+    return Tracer()
+
+
+tracer = _build_tracer()
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Start a span on the configured tracer and make it current.
+
+    Args:
+        name (str): Operation name
+        attributes (Optional[Dict[str, Any]]): Initial attributes
+
+    Returns:
+        Any: Context manager yielding the span
+
+    Example:
+        >>> with start_span("cosmos.get_chat_history", {"chat.id": chat_id}) as span:
+        ...     history = client.get_chat_history(chat_id)
+        ...     span.set_attribute("chat.history_length", len(history))
+    """
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def set_exporter(exporter: SpanExporter) -> None:
+    """
+    Replace the exporter of the built-in tracer (e.g. InMemoryExporter in tests).
+
+    Args:
+        exporter (SpanExporter): New exporter
+    """
+    global tracer
+    if not isinstance(tracer, Tracer):
+        tracer = Tracer(exporter)
+    else:
+        tracer.exporter = exporter
@@ -1,32 +1,326 @@
+"""
+Azure Translator client for the Copilot UI application.
+
+This module provides an asynchronous, pooled client for the Azure
+Translator Text API with:
+- A shared HTTP connection pool reused across requests
+- A fresh X-ClientTraceId for every request
+- Per-request timeouts and exponential backoff on throttling/server errors
+- A concurrency cap on in-flight translation requests
+- Multi-target fan-out (one text into many languages in a single call)
+
+Results are returned as structured dictionaries rather than JSON strings.
+"""
+
 import os
-import logging
-import requests
 import uuid
-import json
-from typing import Any, Dict, List
+import random
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
 from dotenv import load_dotenv
 
+from utils import setup_logger
+
 load_dotenv()
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+logger = setup_logger("translation")
 
 AZURE_TRANSLATE_API_ENDPOINT = os.getenv("AZURE_TRANSLATE_API_ENDPOINT")
 AZURE_TRANSLATE_API_KEY = os.getenv("AZURE_TRANSLATE_API_KEY")
 AZURE_TRANSLATE_API_REGION = os.getenv("AZURE_TRANSLATE_API_REGION")
 
-headers = {
-    "Ocp-Apim-Subscription-Key": AZURE_TRANSLATE_API_KEY,
-    "Ocp-Apim-Subscription-Region": AZURE_TRANSLATE_API_REGION,
-    "Content-type": "application/json",
-    "X-ClientTraceId": str(uuid.uuid4()),
-}
+API_VERSION = "3.0"
+DEFAULT_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT_SECONDS", "10"))
+DEFAULT_MAX_RETRIES = int(os.getenv("TRANSLATE_MAX_RETRIES", "3"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("TRANSLATE_MAX_CONCURRENCY", "8"))
+DEFAULT_BACKOFF_SECONDS = 0.5
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Translator v3 limits per request: 1000 array elements and 50,000 characters
+# of text in total (including spaces)
+MAX_TEXTS_PER_REQUEST = 1000
+MAX_CHARS_PER_REQUEST = 50000
+
+
+class TranslationError(Exception):
+    """Raised when a translation request fails after all retries."""
+
+
+def chunk_texts(
+    texts: List[str],
+    max_texts: int = MAX_TEXTS_PER_REQUEST,
+    max_chars: int = MAX_CHARS_PER_REQUEST,
+) -> List[List[str]]:
+    """
+    Split texts into consecutive request bodies within the API limits.
+
+    A text longer than max_chars on its own is sent alone; the API rejects it.
+
+    Args:
+        texts (List[str]): Texts to translate, in order
+        max_texts (int): Maximum elements per request
+        max_chars (int): Maximum total characters per request
+
+    Returns:
+        List[List[str]]: Chunks whose concatenation is texts
+    """
+    chunks: List[List[str]] = []
+    chunk: List[str] = []
+    chunk_chars = 0
+    for text in texts:
+        if chunk and (len(chunk) >= max_texts or chunk_chars + len(text) > max_chars):
+            chunks.append(chunk)
+            chunk, chunk_chars = [], 0
+        chunk.append(text)
+        chunk_chars += len(text)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class AsyncTranslatorClient:
+    """
+    Asynchronous client for the Azure Translator Text API.
+
+    A single instance owns one httpx.AsyncClient, so all translation calls
+    share its connection pool. Use get_translator() to obtain the
+    process-wide instance.
+
+    Attributes:
+        endpoint (str): Translator API endpoint URL
+        timeout (float): Per-request timeout in seconds
+        max_retries (int): Number of retries for retryable failures
+        max_concurrency (int): Maximum number of in-flight requests
+    """
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        api_key: Optional[str] = None,
+        region: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+    ) -> None:
+        """
+        Initialize the translator client.
+
+        Args:
+            endpoint (Optional[str]): Translator endpoint. Defaults to AZURE_TRANSLATE_API_ENDPOINT
+            api_key (Optional[str]): Subscription key. Defaults to AZURE_TRANSLATE_API_KEY
+            region (Optional[str]): Subscription region. Defaults to AZURE_TRANSLATE_API_REGION
+            timeout (float): Per-request timeout in seconds
+            max_retries (int): Retries on timeouts, throttling and 5xx responses
+            max_concurrency (int): Cap on concurrent requests to the API
+            backoff_seconds (float): Base delay for exponential backoff
+
+        Raises:
+            ValueError: If the endpoint or key is not configured
+        """
+        self.endpoint = endpoint or AZURE_TRANSLATE_API_ENDPOINT
+        self.api_key = api_key or AZURE_TRANSLATE_API_KEY
+        self.region = region or AZURE_TRANSLATE_API_REGION
+        if not self.endpoint or not self.api_key:
+            raise ValueError(
+                "AZURE_TRANSLATE_API_ENDPOINT and AZURE_TRANSLATE_API_KEY must be set"
+            )
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.backoff_seconds = backoff_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    def _headers(self) -> Dict[str, str]:
+        """Build request headers with a fresh trace id."""
+        headers = {
+            "Ocp-Apim-Subscription-Key": self.api_key,
+            "Content-type": "application/json",
+            "X-ClientTraceId": str(uuid.uuid4()),
+        }
+        if self.region:
+            headers["Ocp-Apim-Subscription-Region"] = self.region
+        return headers
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """
+        Compute the delay before the next retry.
+
+        Honors a Retry-After header when the API sends one, otherwise uses
+        exponential backoff with jitter.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+
+    async def _post(self, params: Dict[str, Any], body: List[Dict[str, str]]) -> Any:
+        """
+        POST a translation request with concurrency cap, timeout and retries.
+
+        Args:
+            params (Dict[str, Any]): Query parameters
+            body (List[Dict[str, str]]): Request body
 
+        Returns:
+            Any: Decoded JSON response
 
-def translate(
+        Raises:
+            TranslationError: If the request fails after all retries
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            response: Optional[httpx.Response] = None
+            headers = self._headers()
+            try:
+                async with self._semaphore:
+                    response = await self._get_client().post(
+                        self.endpoint, params=params, headers=headers, json=body
+                    )
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                last_error = TranslationError(
+                    f"Translator returned {response.status_code}: {response.text}"
+                )
+            except httpx.HTTPStatusError as e:
+                raise TranslationError(
+                    f"Translator returned {e.response.status_code}: {e.response.text} "
+                    f"(trace id {headers['X-ClientTraceId']})"
+                ) from e
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response)
+                logger.warning(
+                    "Translation attempt %s failed (trace id %s): %s. Retrying in %.2fs",
+                    attempt + 1, headers['X-ClientTraceId'], last_error, delay
+                )
+                await asyncio.sleep(delay)
+
+        raise TranslationError(
+            f"Translation failed after {self.max_retries + 1} attempts: {last_error}"
+        )
+
+    async def translate_batch(
+        self,
+        texts: List[str],
+        target_languages: List[str],
+        source_language: Optional[str] = "en",
+    ) -> List[Dict[str, str]]:
+        """
+        Translate several texts into one or more target languages.
+
+        Args:
+            texts (List[str]): Texts to translate
+            target_languages (List[str]): List of target language codes
+            source_language (Optional[str]): Source language code, or None to auto-detect
+
+        Returns:
+            List[Dict[str, str]]: One mapping of language code to translated text per input text
+
+        Raises:
+            TranslationError: If the API call fails
+        """
+        if not texts:
+            return []
+        if not target_languages:
+            return [{} for _ in texts]
+
+        params: Dict[str, Any] = {
+            "api-version": API_VERSION,
+            "to": list(target_languages),
+        }
+        if source_language:
+            params["from"] = source_language
+
+        chunks = chunk_texts(texts)
+        responses = await asyncio.gather(*[
+            self._post(params, [{"text": text} for text in chunk])
+            for chunk in chunks
+        ])
+
+        results: List[Dict[str, str]] = []
+        for response in responses:
+            for item in response:
+                results.append({
+                    translation["to"]: translation["text"]
+                    for translation in item.get("translations", [])
+                })
+        return results
+
+    async def translate(
+        self,
+        text: str,
+        target_languages: List[str],
+        source_language: Optional[str] = "en",
+    ) -> Dict[str, str]:
+        """
+        Translate one text into one or more target languages in a single call.
+
+        Args:
+            text (str): The text to be translated
+            target_languages (List[str]): List of target language codes
+            source_language (Optional[str]): Source language code. Default is 'en' (English)
+
+        Returns:
+            Dict[str, str]: Mapping of target language code to translated text
+
+        Raises:
+            TranslationError: If the API call fails
+        """
+        results = await self.translate_batch([text], target_languages, source_language)
+        return results[0] if results else {}
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+_translator: Optional[AsyncTranslatorClient] = None
+
+
+def get_translator() -> AsyncTranslatorClient:
+    """
+    Return the process-wide translator client.
+
+    Returns:
+        AsyncTranslatorClient: Shared client instance
+
+    Raises:
+        ValueError: If the translator is not configured
+    """
+    global _translator
+    if _translator is None:
+        _translator = AsyncTranslatorClient()
+    return _translator
+
+
+async def translate(
     text: str, target_languages: List[str], source_language: str = "en"
-) -> str:
+) -> Dict[str, str]:
     """
     Translates the given text from the source language to the target language(s).
 
@@ -36,60 +330,58 @@ def translate(
         source_language (str): Source language code. Default is 'en' (English).
 
     Returns:
-        str: The translated text in JSON format.
+        Dict[str, str]: Mapping of target language code to translated text.
     """
-    params = {
-        "api-version": "3.0",
-        "from": source_language,
-        "to": ",".join(target_languages),
-    }
-
-    body = [{"text": text}]
-    response = requests.post(
-        AZURE_TRANSLATE_API_ENDPOINT, params=params, headers=headers, json=body
-    )
-    json_response = json.dumps(
-        response.json(),
-        sort_keys=True,
-        ensure_ascii=False,
-        indent=4,
-        separators=(",", ": "),
-    )
-    return json_response
-
-
-def translate_json(json_data: Dict[str, Any], target_language: str) -> Dict[str, Any]:
+    return await get_translator().translate(text, target_languages, source_language)
+
+
+async def translate_json(
+    json_data: Dict[str, Any], target_language: str, source_language: str = "en"
+) -> Dict[str, Any]:
     """
     Translates the values in the provided JSON data into the specified target language.
 
+    All string values are collected and sent in batched requests instead of
+    one request per value.
+
     Args:
         json_data (dict): The JSON data to be translated.
         target_language (str): The target language code.
+        source_language (str): Source language code. Default is 'en' (English).
 
     Returns:
         dict: The translated JSON data.
     """
-    translated_data = {}
+    strings: List[str] = []
 
-    def traverse(obj: Any) -> Any:
+    def collect(obj: Any) -> None:
         if isinstance(obj, dict):
-            translated_obj = {}
-            for key, value in obj.items():
-                # translated_key = json.loads(translate(key, [target_language]))[0]['translations'][0]['text']
-                translated_obj[key] = traverse(value)
-            return translated_obj
+            for value in obj.values():
+                collect(value)
         elif isinstance(obj, list):
-            return [traverse(item) for item in obj]
+            for item in obj:
+                collect(item)
         elif isinstance(obj, str):
-            return json.loads(translate(obj, [target_language]))[0]["translations"][0][
-                "text"
-            ]
-        else:
-            return obj
+            strings.append(obj)
 
     try:
-        translated_data = traverse(json_data)
-        return translated_data
+        collect(json_data)
+        translations = await get_translator().translate_batch(
+            strings, [target_language], source_language
+        )
+        translated = iter(t.get(target_language, s) for s, t in zip(strings, translations))
+
+        def rebuild(obj: Any) -> Any:
+            if isinstance(obj, dict):
+                return {key: rebuild(value) for key, value in obj.items()}
+            elif isinstance(obj, list):
+                return [rebuild(item) for item in obj]
+            elif isinstance(obj, str):
+                return next(translated)
+            else:
+                return obj
+
+        return rebuild(json_data)
     except Exception as e:
         logger.error(f"An error occurred during translation: {e}")
         raise
@@ -1,9 +1,16 @@
 import os
 from dotenv import load_dotenv
-import azure.cognitiveservices.speech as speechsdk
+
+from startup import lazy_import
+from utils import setup_logger
+
+# The Speech SDK loads native libraries, so defer it until synthesis is used
+speechsdk = lazy_import("azure.cognitiveservices.speech")
 
 load_dotenv()
 
+logger = setup_logger("tts")
+
 # """
 #   For more samples please visit https://github.com/Azure-Samples/cognitive-services-speech-sdk
 # """
@@ -11,18 +18,29 @@ load_dotenv()
 SPEECH_API_KEY = os.getenv("SPEECH_API_KEY")
 SPEECH_API_SERVICE_REGION = os.getenv("SPEECH_API_SERVICE_REGION")
 file_name = "outputaudio.wav"
-file_config = speechsdk.audio.AudioOutputConfig(filename=file_name)
-speech_config = speechsdk.SpeechConfig(
-    subscription=SPEECH_API_KEY, region=SPEECH_API_SERVICE_REGION
-)
+_speech_configs = None
+
+
+def get_speech_configs():
+    """Create the speech and audio output configs on first use."""
+    global _speech_configs
+    if _speech_configs is None:
+        file_config = speechsdk.audio.AudioOutputConfig(filename=file_name)
+        speech_config = speechsdk.SpeechConfig(
+            subscription=SPEECH_API_KEY, region=SPEECH_API_SERVICE_REGION
+        )
+        speech_config.speech_synthesis_voice_name = "en-US-AvaMultilingualNeural"
+        _speech_configs = (speech_config, file_config)
+    return _speech_configs
+
 
 # speech_synthesizer = speechsdk.SpeechSynthesizer(
 #     speech_config=speech_config, audio_config=file_config
 # )
-speech_config.speech_synthesis_voice_name = "en-US-AvaMultilingualNeural"
 
 
 async def text_to_speech(text):
+    speech_config, file_config = get_speech_configs()
     # use the default speaker as audio output.
     speech_synthesizer = speechsdk.SpeechSynthesizer(
         speech_config=speech_config, audio_config=file_config
@@ -30,9 +48,9 @@ async def text_to_speech(text):
     result = speech_synthesizer.speak_text_async(text).get()
     # Check result
     if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-        print("Speech synthesized for text [{}]".format(text))
+        logger.info("Speech synthesized for text [%s]", text)
     elif result.reason == speechsdk.ResultReason.Canceled:
         cancellation_details = result.cancellation_details
-        print("Speech synthesis canceled: {}".format(cancellation_details.reason))
+        logger.warning("Speech synthesis canceled: %s", cancellation_details.reason)
         if cancellation_details.reason == speechsdk.CancellationReason.Error:
-            print("Error details: {}".format(cancellation_details.error_details))
+            logger.error("Error details: %s", cancellation_details.error_details)
@@ -7,12 +7,43 @@ This module provides helper functions for:
 - System-wide utilities
 
 All functions include error handling and logging capabilities.
+
+Logging is configured through environment variables:
+- LOG_MODE: "sync" (default) writes from the calling thread; "async" hands
+  records to a QueueHandler and a background QueueListener writes them,
+  so stdout back-pressure never blocks the event loop (when the queue is
+  full, errors are written synchronously and other records are dropped,
+  with a periodic warning on stderr)
+- LOG_FORMAT: "text" (default) or "json" for one JSON object per line
+- LOG_SAMPLE_RATES: JSON object mapping logger names to the fraction of
+  INFO/DEBUG records to keep, e.g. {"data_layer": 0.1}; warnings and
+  errors are never sampled
 """
 
 import os
-import logging
 import sys
-from typing import Optional
+import json
+import queue
+import atexit
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+LOG_MODE = os.getenv("LOG_MODE", "sync").lower()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Bounded so a stalled stdout sheds records instead of growing memory
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Minimum seconds between stderr warnings about dropped log records
+LOG_DROP_WARNING_INTERVAL = float(os.getenv("LOG_DROP_WARNING_INTERVAL", "60"))
+
+# Attributes present on every LogRecord; anything else was passed via extra=
+_RESERVED_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime"
+}
 
 
 def delete_audio_file(audio_file_path: str) -> bool:
@@ -48,12 +79,153 @@ def delete_audio_file(audio_file_path: str) -> bool:
         return False
 
 
+def _load_sample_rates() -> Dict[str, float]:
+    """Parse LOG_SAMPLE_RATES, ignoring invalid values."""
+    try:
+        rates = json.loads(os.getenv("LOG_SAMPLE_RATES", "{}"))
+        return {str(name): float(rate) for name, rate in rates.items()}
+    except (ValueError, AttributeError, TypeError):
+        logging.warning("Invalid LOG_SAMPLE_RATES; sampling disabled")
+        return {}
+
+
+LOG_SAMPLE_RATES = _load_sample_rates()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of INFO and DEBUG records.
+
+    Args:
+        rate (float): Fraction of low-severity records to keep (0.0 - 1.0)
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats each record in the calling thread; here the
+    record is queued as-is and the message is only built by the background
+    writer. When the queue is full, ERROR and CRITICAL records are written
+    synchronously through the fallback handler; lower levels are dropped
+    rather than blocking the caller, counted in dropped and reported on
+    stderr at most once per LOG_DROP_WARNING_INTERVAL.
+
+    Attributes:
+        fallback (logging.Handler): Handler writing errors when the queue is full
+        dropped (int): Records dropped since startup
+    """
+
+    def __init__(
+        self,
+        log_queue: "queue.Queue[logging.LogRecord]",
+        fallback: logging.Handler,
+        warning_interval: float = LOG_DROP_WARNING_INTERVAL,
+    ) -> None:
+        super().__init__(log_queue)
+        self.fallback = fallback
+        self.warning_interval = warning_interval
+        self.dropped = 0
+        self._reported = 0
+        self._last_warning = 0.0
+        self._drop_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.ERROR:
+                self.fallback.handle(record)
+            else:
+                self._record_drop()
+
+    def _record_drop(self) -> None:
+        with self._drop_lock:
+            self.dropped += 1
+            now = time.monotonic()
+            if now - self._last_warning < self.warning_interval:
+                return
+            total = self.dropped
+            newly_dropped, self._reported = total - self._reported, total
+            self._last_warning = now
+        sys.stderr.write(
+            f"Log queue full: dropped {newly_dropped} records "
+            f"({total} since startup, LOG_QUEUE_SIZE={self.queue.maxsize})\n"
+        )
+
+
+def _build_formatter() -> logging.Formatter:
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(
+        fmt='%(asctime)s | %(name)-12s | %(levelname)-8s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+
+_queue_handler: Optional[QueueHandler] = None
+_queue_listener: Optional[QueueListener] = None
+_queue_lock = threading.Lock()
+
+
+def _get_queue_handler() -> QueueHandler:
+    """Return the shared queue handler, starting the background writer on first use."""
+    global _queue_handler, _queue_listener
+    with _queue_lock:
+        if _queue_handler is None:
+            log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(_build_formatter())
+            _queue_listener = QueueListener(
+                log_queue, console_handler, respect_handler_level=True
+            )
+            _queue_listener.start()
+            atexit.register(_queue_listener.stop)
+            _queue_handler = _DeferredQueueHandler(log_queue, console_handler)
+        return _queue_handler
+
+
 def setup_logger(name: str = "copilot_ui") -> Optional[logging.Logger]:
     """
     Configure and return a logger with console output.
 
     Sets up a logger with consistent formatting and console output handling.
-    Clears any existing handlers to prevent duplicate logging.
+    Clears any existing handlers to prevent duplicate logging. Output mode,
+    format and sampling follow LOG_MODE, LOG_FORMAT and LOG_SAMPLE_RATES.
 
     Args:
         name (str): Name of the logger instance. Defaults to "copilot_ui"
@@ -75,24 +247,28 @@ def setup_logger(name: str = "copilot_ui") -> Optional[logging.Logger]:
         logger = logging.getLogger(name)
         logger.setLevel(logging.INFO)
         
-        # Remove any existing handlers to prevent duplicates
+        # Remove any existing handlers and filters to prevent duplicates
         if logger.handlers:
             logger.handlers.clear()
-        
-        # Create console handler with stdout stream
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)
-        
-        # Create detailed formatter
-        formatter = logging.Formatter(
-            fmt='%(asctime)s | %(name)-12s | %(levelname)-8s | %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        console_handler.setFormatter(formatter)
-        
-        # Add handler to logger
-        logger.addHandler(console_handler)
-        
+        logger.filters.clear()
+
+        if LOG_MODE == "async":
+            # Records are written to stdout by the background listener
+            logger.addHandler(_get_queue_handler())
+            logger.propagate = False
+        else:
+            # Create console handler with stdout stream
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setLevel(logging.INFO)
+            console_handler.setFormatter(_build_formatter())
+
+            # Add handler to logger
+            logger.addHandler(console_handler)
+
+        sample_rate = LOG_SAMPLE_RATES.get(name)
+        if sample_rate is not None and sample_rate < 1:
+            logger.addFilter(SamplingFilter(sample_rate))
+
         return logger
 
     except Exception as e: